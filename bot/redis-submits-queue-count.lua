@@ -1 +1,13 @@
-return tonumber(redis.call('mget', 'submit.queue:last.put.id')[1]) -  tonumber(redis.call('mget', 'submit.queue:last.get.id')[1])
+-- Count of submits in all lanes of submit queue, the same as SubmitQueue.depth().
+-- last.put.id - last.get.id is not used: lanes are taken out of order
+local depth = 0
+for _, key in ipairs({'submit.queue', 'submit.queue:lane:contest', 'submit.queue:lane:rejudge'}) do
+    depth = depth + redis.call('LLEN', key)
+end
+-- Streams of StreamSubmitQueue (SUBMIT_QUEUE_BACKEND=stream)
+for _, key in ipairs({'submit.queue:stream', 'submit.queue:stream:contest', 'submit.queue:stream:rejudge'}) do
+    if redis.call('EXISTS', key) == 1 then
+        depth = depth + redis.call('XLEN', key)
+    end
+end
+return depth
@@ -4,10 +4,16 @@ from flask import Flask
 from werkzeug.exceptions import HTTPException
 
 from rmatics import cli
+from rmatics.ejudge.ejudge_session import ejudge_sessions
+from rmatics.ejudge.serve_internal import contest_cfg_registry
 from rmatics.model.base import db
 from rmatics.model.base import mongo
 from rmatics.model.base import redis
-from rmatics.plugins import monitor_cacher, invalidator
+from rmatics.model.source_store import source_store
+from rmatics.plugins import monitor_cacher, invalidator, monitor_runs_cacher, redis_invalidator, \
+    run_statuses, sample_tests_cache, submissions_count_cacher
+from rmatics.utils.cacher.local_cache import LocalCache
+from rmatics.utils.cacher.serializers import get_serializer
 from rmatics.utils.centrifugo import centrifugo_client
 from rmatics.view import handle_api_exception
 from rmatics.view.monitors.route import monitor_blueprint
@@ -30,14 +36,58 @@ def create_app(config=None, config_logger=True):
     redis.init_app(app)
 
     monitor_caching_time = app.config.get('MONITOR_CACHING_TIME_HOURS', 1) * 60 * 60
-    monitor_cacher.init_app(app, redis, period=monitor_caching_time, autocommit=False)
+    monitor_stale_caching_time = app.config.get('MONITOR_STALE_CACHING_TIME_SECONDS', 0)
+    monitor_local_cache_size = app.config.get('MONITOR_LOCAL_CACHE_SIZE', 0)
+    monitor_local_cache = None
+    if monitor_local_cache_size:
+        monitor_local_cache = LocalCache(size=monitor_local_cache_size,
+                                         ttl=app.config.get('MONITOR_LOCAL_CACHE_TTL_SECONDS', 10))
 
-    invalidator.init_app(remove_cache_func=redis.delete)
+    monitor_serializer = get_serializer(app.config.get('MONITOR_CACHE_SERIALIZER', 'json'),
+                                        app.config.get('MONITOR_CACHE_COMPRESSION'))
+
+    use_redis_invalidator = app.config.get('MONITOR_CACHE_INVALIDATOR') == 'redis'
+    monitor_invalidator = redis_invalidator if use_redis_invalidator else invalidator
+
+    monitor_cacher.init_app(app, redis, period=monitor_caching_time, autocommit=False,
+                            stale_period=monitor_stale_caching_time,
+                            local_cache=monitor_local_cache,
+                            serializer=monitor_serializer,
+                            cache_invalidator=monitor_invalidator)
+
+    # Cacher.remove also drops entry from local caches of all processes
+    if use_redis_invalidator:
+        redis_invalidator.init_app(remove_cache_func=monitor_cacher.remove, store=redis)
+    else:
+        invalidator.init_app(remove_cache_func=monitor_cacher.remove)
+
+    submissions_count_caching_time = app.config.get('SUBMISSIONS_COUNT_CACHING_TIME_SECONDS', 60)
+    submissions_count_cacher.init_app(app, redis, period=submissions_count_caching_time)
+
+    monitor_runs_cacher.init_app(redis, period=monitor_caching_time,
+                                 enabled=app.config.get('MONITOR_INCREMENTAL_CACHE', False))
+
+    run_statuses.init_app(redis, ttl=app.config.get('TRANSIENT_RUN_STATUS_TTL_SECONDS'),
+                          enabled=app.config.get('TRANSIENT_RUN_STATUSES', False))
+
+    sample_tests_cache.init_app(redis, ttl=app.config.get('SAMPLE_TESTS_CACHE_TTL_SECONDS'),
+                                enabled=app.config.get('SAMPLE_TESTS_CACHE', False))
+
+    source_store.init_app(compression=app.config.get('SOURCE_STORE_COMPRESSION'),
+                          enabled=app.config.get('SOURCE_STORE_ENABLED', False))
+
+    ejudge_sessions.init_app(pool_size=app.config.get('EJUDGE_HTTP_POOL_SIZE'))
+
+    contest_cfg_registry.init_app(max_size=app.config.get('EJUDGE_CONTEST_CFG_CACHE_SIZE'),
+                                  preload=app.config.get('EJUDGE_CONTEST_CFG_PRELOAD', False),
+                                  fast_parser=app.config.get('EJUDGE_CONTEST_CFG_FAST_PARSER', False),
+                                  snapshot_dir=app.config.get('EJUDGE_CONTEST_CFG_SNAPSHOT_DIR'))
 
     # Centrifugo
     cent_url = app.config.get('CENTRIFUGO_URL')
     cent_api_key = app.config.get('CENTRIFUGO_API_KEY')
-    centrifugo_client.init_app(cent_url, cent_api_key)
+    centrifugo_client.init_app(cent_url, cent_api_key,
+                               enabled=app.config.get('CENTRIFUGO_ENABLED', False))
 
     app.register_error_handler(HTTPException, handle_api_exception)
 
@@ -65,9 +65,55 @@ class BaseConfig:
     EJUDGE_NEW_CLIENT_URL = os.getenv('EJUDGE_NEW_CLIENT_URL', 'http://localhost/cgi-bin/new-client')
     EJUDGE_USER = os.getenv('EJUDGE_USER', 'user')
     EJUDGE_PASSWORD = os.getenv('EJUDGE_PASSWORD', 'pass')
+    # Keep-alive connections to ejudge shared by submit workers
+    EJUDGE_HTTP_POOL_SIZE = int(os.getenv('EJUDGE_HTTP_POOL_SIZE', 10))
+    # Parsed serve.cfg of contests kept in process; preload parses all of them on start
+    EJUDGE_CONTEST_CFG_CACHE_SIZE = int(os.getenv('EJUDGE_CONTEST_CFG_CACHE_SIZE', 256))
+    EJUDGE_CONTEST_CFG_PRELOAD = bool_(os.getenv('EJUDGE_CONTEST_CFG_PRELOAD', False))
+    # Single-pass serve.cfg parser; parsed tables are saved to snapshot dir if it is set
+    EJUDGE_CONTEST_CFG_FAST_PARSER = bool_(os.getenv('EJUDGE_CONTEST_CFG_FAST_PARSER', False))
+    EJUDGE_CONTEST_CFG_SNAPSHOT_DIR = os.getenv('EJUDGE_CONTEST_CFG_SNAPSHOT_DIR') or None
+    # 'list' - redis list, 'stream' - redis stream with consumer group (redis >= 6.2)
+    SUBMIT_QUEUE_BACKEND = os.getenv('SUBMIT_QUEUE_BACKEND', 'list')
+    # Share of submits taken from each lane, e.g. 'contest:6,practice:3,rejudge:1'
+    SUBMIT_LANE_WEIGHTS = os.getenv('SUBMIT_LANE_WEIGHTS', '')
+    # Submits sent to ejudge at the same time by all workers, 0 - no limit
+    SUBMIT_CONTEST_CONCURRENCY = int(os.getenv('SUBMIT_CONTEST_CONCURRENCY', 5))
+    SUBMIT_URL_CONCURRENCY = int(os.getenv('SUBMIT_URL_CONCURRENCY', 20))
+    # Slot of crashed worker is released after this time
+    SUBMIT_LEASE_TIMEOUT_SECONDS = int(os.getenv('SUBMIT_LEASE_TIMEOUT_SECONDS', 60))
+
+    # caching
+    # Keep all runs of problem in single entry and patch it on run update
+    # instead of invalidating every monitor entry of problem
+    MONITOR_INCREMENTAL_CACHE = bool_(os.getenv('MONITOR_INCREMENTAL_CACHE', False))
+    # 'db' - MonitorCacheMeta table, 'redis' - inverted index in redis
+    MONITOR_CACHE_INVALIDATOR = os.getenv('MONITOR_CACHE_INVALIDATOR', 'db')
+    # Expired monitor is still returned for this time while it is being refreshed
+    MONITOR_STALE_CACHING_TIME_SECONDS = int(os.getenv('MONITOR_STALE_CACHING_TIME_SECONDS', 60))
+    # In-process cache of decoded monitors, 0 to disable
+    MONITOR_LOCAL_CACHE_SIZE = int(os.getenv('MONITOR_LOCAL_CACHE_SIZE', 0))
+    MONITOR_LOCAL_CACHE_TTL_SECONDS = int(os.getenv('MONITOR_LOCAL_CACHE_TTL_SECONDS', 10))
+    # json, msgpack or runs_columns; compression: zlib, lz4 or empty
+    MONITOR_CACHE_SERIALIZER = os.getenv('MONITOR_CACHE_SERIALIZER', 'json')
+    MONITOR_CACHE_COMPRESSION = os.getenv('MONITOR_CACHE_COMPRESSION') or None
+    # Stream monitor response made of cached runs JSON without decoding it
+    MONITOR_STREAMING_RESPONSE = bool_(os.getenv('MONITOR_STREAMING_RESPONSE', False))
+    # Keep compiling/running statuses of runs in redis, write only terminal ones to MySQL
+    TRANSIENT_RUN_STATUSES = bool_(os.getenv('TRANSIENT_RUN_STATUSES', False))
+    TRANSIENT_RUN_STATUS_TTL_SECONDS = int(os.getenv('TRANSIENT_RUN_STATUS_TTL_SECONDS', 600))
+    # Sample tests of problems are kept in redis until test files are changed
+    SAMPLE_TESTS_CACHE = bool_(os.getenv('SAMPLE_TESTS_CACHE', False))
+    SAMPLE_TESTS_CACHE_TTL_SECONDS = int(os.getenv('SAMPLE_TESTS_CACHE_TTL_SECONDS', 24 * 60 * 60))
+    # Store each distinct source once by its hash; compression: zlib, zstd or empty
+    SOURCE_STORE_ENABLED = bool_(os.getenv('SOURCE_STORE_ENABLED', False))
+    SOURCE_STORE_COMPRESSION = os.getenv('SOURCE_STORE_COMPRESSION', 'zlib') or None
+    SUBMISSIONS_COUNT_CACHING_TIME_SECONDS = int(os.getenv('SUBMISSIONS_COUNT_CACHING_TIME_SECONDS', 60))
 
     CENTRIFUGO_URL = os.getenv('CENTRIFUGO_URL', 'http://localhost:1377')
     CENTRIFUGO_API_KEY = os.getenv('CENTRIFUGO_API_KEY', 'foo')
+    # Publish run updates by background batches, nothing is published if disabled
+    CENTRIFUGO_ENABLED = bool_(os.getenv('CENTRIFUGO_ENABLED', False))
 
 
 class DevConfig(BaseConfig):
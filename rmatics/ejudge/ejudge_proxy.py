@@ -1,7 +1,8 @@
 import codecs
-import requests
-import re
 import json
+from typing import Optional
+
+from rmatics.ejudge.ejudge_session import ejudge_sessions
 
 DEFAULT_ERROR_STR = 'Ошибка отправки задачи'
 
@@ -17,6 +18,12 @@ STATUS_REPR = {
 1000: 'Отправляемый файл превышает допустимый размер. Требуется отправить исходный код или текстовый файл',
 }
 
+# Error codes of ejudge which mean that session can't be used anymore,
+# invalid SID itself is answered with html page
+SESSION_ERROR_CODES = {
+    28,  # NEW_SRV_ERR_PERMISSION_DENIED
+}
+
 
 def report_error(code, login_data, submit_data, file, filename, user_id, addon = ''):
     t = str({'info' : addon, 'login_data' : login_data, 'submit_data' : submit_data, 'filename' : filename})
@@ -26,40 +33,47 @@ def report_error(code, login_data, submit_data, file, filename, user_id, addon =
     log.close()
 
 
-def submit(run_file, contest_id, prob_id, lang_id, login, password, filename, url):
-    login_data = {
-        'contest_id' : contest_id,
-        'role' : '0',
-        'login' : login,
-        'password' : password,
-        'locale_id' : '1',
-    }
+def _parse_response(response) -> Optional[dict]:
+    try:
+        return json.loads(response.text)
+    except ValueError:
+        return None
 
-    c = requests.post(url, data = login_data)
-    res = re.search('SID="([^"]*)";', c.text)
 
-    if (res):
-        SID = res.group(1)
-    else:
-        return {
-            'code': None,
-            'message': DEFAULT_ERROR_STR
-        }
+def _is_session_expired(response) -> bool:
+    """ Ejudge answers with html (login page) or session error code if session is not valid anymore
+
+        Other errors are returned to caller as is: submit could be accepted already,
+        so it must not be sent again
+    """
+    resp = _parse_response(response)
+    if resp is None:
+        return True
+    code = resp.get('error_code')
+    return isinstance(code, int) and abs(code) in SESSION_ERROR_CODES
 
-    cookies = c.cookies
+
+def submit(run_file, contest_id, prob_id, lang_id, login, password, filename, url):
     files = {'file' : (filename, run_file)}
 
     submit_data = {
-        'SID' : SID,
         'prob_id' : prob_id,
         'lang_id' : lang_id,
         'action_40' : 'action_40',
         'json' : 1,
     }
 
-    c = requests.post(url, data=submit_data, cookies=cookies, files=files)
+    # Session is reused between submits, it is renewed if ejudge says it is expired
+    c = ejudge_sessions.post(url, contest_id, login, password,
+                             data=submit_data, files=files,
+                             is_expired=_is_session_expired)
 
-    resp = json.loads(c.text)
+    resp = _parse_response(c) if c is not None else None
+    if resp is None:
+        return {
+            'code': None,
+            'message': DEFAULT_ERROR_STR
+        }
 
     if 'run_id' in resp:
         return {
@@ -68,8 +82,13 @@ def submit(run_file, contest_id, prob_id, lang_id, login, password, filename, ur
             **resp
         }
 
-    code = resp["error_code"]
-    if code in STATUS_REPR:
+    code = resp.get("error_code")
+    if not isinstance(code, int):
+        return {
+            'code': None,
+            'message': DEFAULT_ERROR_STR
+        }
+    elif code in STATUS_REPR:
         return {
             'code': code,
             'message': STATUS_REPR[code]
@@ -0,0 +1,114 @@
+import re
+import threading
+from collections import defaultdict, namedtuple
+from http.cookiejar import DefaultCookiePolicy
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SID_RE = re.compile('SID="([^"]*)";')
+
+EjudgeSession = namedtuple('EjudgeSession', ('sid', 'cookies'))
+
+
+class EjudgeSessionManager:
+    """ Keeps ejudge sessions (SID and cookies) per (ejudge url, contest id)
+        and sends requests over pooled keep-alive connections
+
+        Session is created by login on first request to contest
+        and renewed only if response says that it is expired.
+        Instance is shared between SubmitWorker greenlets.
+
+    Usage:
+    ------
+        ejudge_sessions.init_app(pool_size=10)
+
+        response = ejudge_sessions.post(url, contest_id, login, password,
+                                        data={'action_40': 'action_40', ...},
+                                        is_expired=lambda response: ...)
+    """
+    def __init__(self, pool_size=10, timeout=30):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._http = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._login_locks = defaultdict(threading.Lock)
+
+    def init_app(self, pool_size: int = None, timeout: int = None):
+        self.pool_size = pool_size or self.pool_size
+        self.timeout = timeout or self.timeout
+        self._http = None
+        self._sessions.clear()
+
+    @property
+    def http(self) -> requests.Session:
+        if self._http is None:
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            http.mount('http://', adapter)
+            http.mount('https://', adapter)
+            # Connections are shared between contests; cookies are passed for each request
+            http.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            self._http = http
+        return self._http
+
+    def _login(self, url: str, contest_id: int, login: str, password: str) -> Optional[EjudgeSession]:
+        login_data = {
+            'contest_id': contest_id,
+            'role': '0',
+            'login': login,
+            'password': password,
+            'locale_id': '1',
+        }
+        response = self.http.post(url, data=login_data, timeout=self.timeout)
+        res = SID_RE.search(response.text)
+        if not res:
+            return None
+        return EjudgeSession(res.group(1), response.cookies)
+
+    def get_session(self, url: str, contest_id: int, login: str, password: str,
+                    expired: EjudgeSession = None) -> Optional[EjudgeSession]:
+        """ Returns cached session or logins; expired session is replaced by new one """
+        key = (url, contest_id)
+        with self._lock:
+            login_lock = self._login_locks[key]
+
+        # Only one greenlet logins to contest, the others get its session
+        with login_lock:
+            session = self._sessions.get(key)
+            if session is not None and session is not expired:
+                return session
+
+            session = self._login(url, contest_id, login, password)
+            if session is None:
+                self._sessions.pop(key, None)
+            else:
+                self._sessions[key] = session
+            return session
+
+    def post(self, url: str, contest_id: int, login: str, password: str,
+             data: dict, files: dict = None,
+             is_expired: Callable[[requests.Response], bool] = None) -> Optional[requests.Response]:
+        """ Sends request with contest session
+
+            If is_expired(response) is True, session is renewed and request is sent once again.
+            Returns None if login failed
+        """
+        session = self.get_session(url, contest_id, login, password)
+        for attempt in range(2):
+            if session is None:
+                return None
+
+            response = self.http.post(url, data={'SID': session.sid, **data},
+                                      cookies=session.cookies, files=files,
+                                      timeout=self.timeout)
+            if attempt or is_expired is None or not is_expired(response):
+                return response
+
+            session = self.get_session(url, contest_id, login, password, expired=session)
+        return response
+
+
+ejudge_sessions = EjudgeSessionManager()
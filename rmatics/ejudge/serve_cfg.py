@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from rmatics.ejudge.serve_internal import EjudgeContestCfg, normalizeMemoryLimit
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+COMMENT_PREFIXES = ('#', ';')
+
+PROBLEM_FIELDS = (
+    'id', 'short_name', 'internal_name', 'long_name', 'abstract', 'output_only',
+    'time_limit', 'memory_limit', 'test_dir', 'corr_dir', 'tests_dir', 'test_pat', 'corr_pat',
+)
+
+
+def parse_serve_cfg(lines) -> List[Tuple[str, dict]]:
+    """ Single pass over serve.cfg lines
+
+        Returns [(section name, {option: [values] | None})] in order of file,
+        options before the first header are in 'default' section.
+        Options are parsed as configparser.ConfigParser(allow_no_value=True)
+        used by EjudgeContestCfg does: repeated options and indented
+        continuation lines add values, option without value is None.
+    """
+    current = {}
+    sections = [('default', current)]
+    option = None
+    option_indent = 0
+
+    for line in lines:
+        value = line.strip()
+        if not value or value.startswith(COMMENT_PREFIXES):
+            continue
+
+        indent = len(line) - len(line.lstrip())
+        if option is not None and indent > option_indent and current[option] is not None:
+            current[option].append(value)
+            continue
+
+        if value[0] == '[' and ']' in value:
+            current = {}
+            sections.append((value[1:value.index(']')], current))
+            option = None
+            continue
+
+        delimiters = [index for index in (value.find('='), value.find(':')) if index >= 0]
+        if delimiters:
+            delimiter = min(delimiters)
+            option = value[:delimiter].rstrip().lower()
+            current.setdefault(option, []).append(value[delimiter + 1:].strip())
+        else:
+            option = value.lower()
+            current[option] = None
+        option_indent = indent
+
+    return sections
+
+
+def _first(options: dict, name: str) -> Optional[str]:
+    values = options.get(name)
+    return values[0].strip('"') if values else None
+
+
+class ServeCfgProblem:
+    """ Resolved problem of serve.cfg, has the same attributes as EjudgeProblemCfg """
+    __slots__ = PROBLEM_FIELDS
+
+    def __init__(self, **fields):
+        for field in PROBLEM_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    def getInfo(self):
+        return {"long_name": self.long_name, "id": self.id, "short_name": self.short_name,
+                "timelimit": self.time_limit, "abstract": self.abstract}
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in PROBLEM_FIELDS}
+
+
+class ServeCfg:
+    """ Problem table of contest built by parse_serve_cfg in one step
+
+        Has the same interface as EjudgeContestCfg used by EjudgeProblem,
+        problems inherit fields of their super abstract problems on parsing.
+        Table can be saved to JSON snapshot and loaded without parsing (see load_serve_cfg).
+    """
+    def __init__(self, contest_path: str, advanced_layout: bool, test_dir: str,
+                 problems: Dict[int, ServeCfgProblem], abstract: List[str]):
+        self.contest_path = contest_path
+        self.st_path = contest_path + 'conf/'
+        self.advanced_layout = advanced_layout
+        self.test_dir = test_dir
+        self.problems = problems
+        self.abstract = abstract
+
+    @classmethod
+    def parse(cls, lines, contest_path: str) -> 'ServeCfg':
+        sections = parse_serve_cfg(lines)
+        default = sections[0][1]
+        advanced_layout = 'advanced_layout' in default
+        test_dir = _first(default, 'test_dir') or ''
+
+        abstract = OrderedDict()
+        problem_sections = []
+        for name, options in sections:
+            if name != 'problem':
+                continue
+            if 'abstract' in options:
+                abstract[_first(options, 'short_name')] = options
+            else:
+                problem_sections.append(options)
+
+        problems = OrderedDict()
+        last_id = 0
+        for options in problem_sections:
+            problem_id = int(last_id) + 1
+            if 'id' in options:
+                problem_id = options['id'][0]
+            last_id = problem_id
+            problems[int(problem_id)] = cls._resolve_problem(options, problem_id, abstract,
+                                                             contest_path, advanced_layout, test_dir)
+
+        return cls(contest_path, advanced_layout, test_dir, problems, list(abstract))
+
+    @staticmethod
+    def _resolve_problem(options: dict, problem_id, abstract: dict, contest_path: str,
+                         advanced_layout: bool, contest_test_dir: str) -> ServeCfgProblem:
+        """ The same resolution as EjudgeProblemCfg.__init__ does """
+        super_name = _first(options, 'super')
+        parent = abstract.get(super_name, {}) if super_name is not None else {}
+
+        def inherited(name):
+            value = _first(options, name)
+            return value if value is not None else _first(parent, name)
+
+        short_name = _first(options, 'short_name') or str(problem_id).strip('"')
+        internal_name = _first(options, 'internal_name') or short_name
+
+        problem_type = _first(options, 'type') if 'type' in options else _first(parent, 'type')
+
+        if 'time_limit_millis' in options:
+            time_limit = float(options['time_limit_millis'][0]) / 1000
+        elif 'time_limit' in options:
+            time_limit = float(options['time_limit'][0])
+        elif 'time_limit' in parent:
+            time_limit = float(parent['time_limit'][0])
+        elif 'time_limit_millis' in parent:
+            time_limit = float(parent['time_limit_millis'][0]) / 1000
+        else:
+            time_limit = -1
+
+        max_vm_size = options.get('max_vm_size') or parent.get('max_vm_size')
+        test_dir = inherited('test_dir') or ''
+
+        if advanced_layout:
+            tests_dir = contest_path + 'problems/' + internal_name + '/tests/'
+        else:
+            problem_dir = contest_test_dir + '/' + \
+                test_dir.replace('%lPs', internal_name.lower()).replace('%Ps', internal_name)
+            tests_dir = contest_path + 'tests/' + problem_dir + '/'
+
+        return ServeCfgProblem(
+            id=problem_id,
+            short_name=short_name,
+            internal_name=internal_name,
+            long_name=_first(options, 'long_name') or '',
+            abstract=super_name,
+            output_only=problem_type == 'output-only',
+            time_limit=time_limit,
+            memory_limit=normalizeMemoryLimit(max_vm_size[0]) if max_vm_size else None,
+            test_dir=test_dir,
+            corr_dir=inherited('corr_dir'),
+            tests_dir=os.path.normpath(tests_dir) + '/',
+            test_pat=inherited('test_pat'),
+            corr_pat=inherited('corr_pat'),
+        )
+
+    def getProblemsCount(self):
+        return len(self.problems)
+
+    def getAbstractProblemsCount(self):
+        return len(self.abstract)
+
+    def getProblem(self, id):
+        return self.problems[int(id)]
+
+    def to_snapshot(self) -> dict:
+        return {
+            'version': SNAPSHOT_VERSION,
+            'contest_path': self.contest_path,
+            'advanced_layout': self.advanced_layout,
+            'test_dir': self.test_dir,
+            'abstract': self.abstract,
+            'problems': [problem.to_dict() for problem in self.problems.values()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> 'ServeCfg':
+        problems = OrderedDict(
+            (int(problem['id']), ServeCfgProblem(**problem))
+            for problem in snapshot['problems']
+        )
+        return cls(snapshot['contest_path'], snapshot['advanced_layout'], snapshot['test_dir'],
+                   problems, snapshot['abstract'])
+
+
+def _snapshot_path(snapshot_dir: str, contest_id: int) -> str:
+    return os.path.join(snapshot_dir, f'{contest_id:06d}.json')
+
+
+def load_serve_cfg(contest_id: int, snapshot_dir: str = None) -> ServeCfg:
+    """ Parses serve.cfg of contest or loads it from snapshot made for the same mtime of serve.cfg
+
+        raises IOError if there is no serve.cfg, as EjudgeContestCfg does
+    """
+    contest_path = EjudgeContestCfg.get_contest_path(contest_id)
+    path = EjudgeContestCfg.get_contest_path_conf(contest_id) + 'serve.cfg'
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        raise IOError("File not found '" + path + "'")
+
+    if snapshot_dir:
+        try:
+            with open(_snapshot_path(snapshot_dir, contest_id)) as file:
+                snapshot = json.load(file)
+            if snapshot.get('version') == SNAPSHOT_VERSION and snapshot.get('mtime_ns') == mtime:
+                return ServeCfg.from_snapshot(snapshot)
+        except (OSError, ValueError):
+            pass
+
+    # serve.cfg is written by ejudge in koi8-r or utf-8, names of options are ascii
+    with open(path, encoding='utf-8', errors='replace') as file:
+        config = ServeCfg.parse(file, contest_path)
+
+    if snapshot_dir:
+        try:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            snapshot_path = _snapshot_path(snapshot_dir, contest_id)
+            with open(snapshot_path + '.tmp', 'w') as file:
+                json.dump({**config.to_snapshot(), 'mtime_ns': mtime}, file)
+            os.replace(snapshot_path + '.tmp', snapshot_path)
+        except OSError:
+            log.exception(f'Cannot save serve.cfg snapshot of contest {contest_id}')
+
+    return config
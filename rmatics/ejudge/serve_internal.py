@@ -1,8 +1,13 @@
 from . import configparser
+import logging
 import os
+import threading
 from collections import OrderedDict
-     
-__all__ = ["EjudgeContestCfg", "all_contests", "HOME_JUDGES", "SPECIAL_CONTEST"]     
+
+__all__ = ["EjudgeContestCfg", "EjudgeContestCfgRegistry", "contest_cfg_registry",
+           "all_contests", "HOME_JUDGES", "SPECIAL_CONTEST"]
+
+log = logging.getLogger(__name__)
      
 HOME_JUDGES = '/home/judges/'
 SPECIAL_CONTEST = [14, 1651]  # contests with special configs
@@ -196,3 +201,82 @@ class EjudgeContestCfg:
         
     def getProblem(self, id):
         return self.problems[int(id)]
+
+
+class EjudgeContestCfgRegistry:
+    """ Process-wide cache of parsed serve.cfg by contest id
+
+        Cached config is reparsed when mtime of serve.cfg changes,
+        least recently used configs are evicted above max_size.
+        With fast_parser configs are serve_cfg.ServeCfg tables, optionally
+        saved to snapshot_dir to skip parsing in other processes.
+
+    Usage:
+    ------
+        conf = contest_cfg_registry.get(ejudge_contest_id)
+        contest_cfg_registry.preload()  # parse configs of all contests
+    """
+    def __init__(self, max_size=256, fast_parser=False, snapshot_dir=None):
+        self.max_size = max_size
+        self.fast_parser = fast_parser
+        self.snapshot_dir = snapshot_dir
+        self._configs = OrderedDict()  # contest_id -> (mtime_ns, EjudgeContestCfg)
+        self._lock = threading.Lock()
+
+    def init_app(self, max_size=None, preload=False, fast_parser=False, snapshot_dir=None):
+        self.max_size = max_size or self.max_size
+        self.fast_parser = fast_parser
+        self.snapshot_dir = snapshot_dir
+        self.clear()
+        if preload:
+            loaded = self.preload()
+            log.info(f'Preloaded serve.cfg of {loaded} contests')
+
+    def _load(self, contest_id: int):
+        if self.fast_parser:
+            # serve_cfg imports this module
+            from rmatics.ejudge.serve_cfg import load_serve_cfg
+            return load_serve_cfg(contest_id, snapshot_dir=self.snapshot_dir)
+        return EjudgeContestCfg(number=contest_id)
+
+    def get(self, contest_id) -> EjudgeContestCfg:
+        """ raises IOError if there is no serve.cfg, as EjudgeContestCfg does """
+        contest_id = int(contest_id)
+        path = EjudgeContestCfg.get_contest_path_conf(contest_id) + 'serve.cfg'
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            raise IOError("File not found '" + path + "'")
+
+        with self._lock:
+            cached = self._configs.get(contest_id)
+            if cached is not None and cached[0] == mtime:
+                self._configs.move_to_end(contest_id)
+                return cached[1]
+
+        config = self._load(contest_id)
+
+        with self._lock:
+            self._configs[contest_id] = (mtime, config)
+            self._configs.move_to_end(contest_id)
+            while len(self._configs) > self.max_size:
+                self._configs.popitem(last=False)
+        return config
+
+    def preload(self, contest_ids=None) -> int:
+        """ Parses configs of contest_ids (all contests by default), returns count of loaded """
+        loaded = 0
+        for contest_id in contest_ids if contest_ids is not None else all_contests():
+            try:
+                self.get(contest_id)
+                loaded += 1
+            except Exception:
+                log.exception(f'Cannot load serve.cfg of contest {contest_id}')
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._configs.clear()
+
+
+contest_cfg_registry = EjudgeContestCfgRegistry()
@@ -1,7 +1,42 @@
+from flask import current_app
+
+from .lanes import parse_lane_weights, PRACTICE_LANE
 from .queue import SubmitQueue
+from .stream_queue import StreamSubmitQueue
+
+
+SUBMIT_QUEUE_BACKENDS = {
+    'list': SubmitQueue,
+    'stream': StreamSubmitQueue,
+}
+
+_submit_queues = {}
+
+
+def create_submit_queue(backend: str = None):
+    backend = backend or current_app.config['SUBMIT_QUEUE_BACKEND']
+    if backend not in SUBMIT_QUEUE_BACKENDS:
+        raise ValueError(f'Unknown submit queue backend {backend}')
+    lane_weights = parse_lane_weights(current_app.config['SUBMIT_LANE_WEIGHTS'])
+    return SUBMIT_QUEUE_BACKENDS[backend](lane_weights=lane_weights)
+
+
+def get_submit_queue():
+    """ Queue of backend from config; queue object is shared by requests """
+    backend = current_app.config['SUBMIT_QUEUE_BACKEND']
+    if backend not in _submit_queues:
+        _submit_queues[backend] = create_submit_queue(backend)
+    return _submit_queues[backend]
+
+
+def queue_submit(run_id, ejudge_url, ejudge_contest_id=None, lane=PRACTICE_LANE):
+    return get_submit_queue().submit(run_id, ejudge_url, ejudge_contest_id, lane=lane)
+
 
+def queue_submit_many(items, lane=PRACTICE_LANE):
+    """ items: (run_id, ejudge_url, ejudge_contest_id) """
+    return get_submit_queue().submit_many(items, lane=lane)
 
-submit_queue = SubmitQueue()
-queue_submit = submit_queue.submit
 
-get_last_get_id = submit_queue.get_last_get_id
+def get_last_get_id():
+    return get_submit_queue().get_last_get_id()
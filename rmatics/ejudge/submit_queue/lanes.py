@@ -0,0 +1,71 @@
+import time
+from typing import Dict, List, Optional
+
+from rmatics.model.base import db
+from rmatics.model.statement import Statement
+
+CONTEST_LANE = 'contest'
+PRACTICE_LANE = 'practice'
+REJUDGE_LANE = 'rejudge'
+
+# Share of submits taken from lane while all lanes are not empty
+DEFAULT_LANE_WEIGHTS = {
+    CONTEST_LANE: 6,
+    PRACTICE_LANE: 3,
+    REJUDGE_LANE: 1,
+}
+
+
+def parse_lane_weights(value: Optional[str]) -> Dict[str, int]:
+    """ 'contest:6,practice:3,rejudge:1' -> dict; missing lanes get default weights """
+    weights = dict(DEFAULT_LANE_WEIGHTS)
+    for item in filter(None, (value or '').split(',')):
+        lane, weight = item.split(':')
+        lane = lane.strip()
+        if lane not in DEFAULT_LANE_WEIGHTS:
+            raise ValueError(f'Unknown submit lane {lane}')
+        weights[lane] = int(weight)
+    return weights
+
+
+def get_submit_lane(statement_id: Optional[int]) -> str:
+    """ Submits to running olympiad or virtual olympiad go first """
+    if not statement_id:
+        return PRACTICE_LANE
+
+    statement = db.session.query(Statement) \
+        .filter(Statement.id == statement_id) \
+        .with_entities(Statement.olympiad, Statement.virtual_olympiad,
+                       Statement.time_start, Statement.time_stop) \
+        .one_or_none()
+    if statement is None:
+        return PRACTICE_LANE
+
+    olympiad, virtual_olympiad, time_start, time_stop = statement
+    if virtual_olympiad:
+        return CONTEST_LANE
+    now = time.time()
+    if olympiad and (time_start or 0) <= now < (time_stop or now + 1):
+        return CONTEST_LANE
+    return PRACTICE_LANE
+
+
+class LaneScheduler:
+    """ Smooth weighted round robin over lanes
+
+        order() returns lanes to try one by one: the scheduled lane first,
+        the others by weight. So empty lanes don't leave workers idle,
+        and with weights 6:3:1 busy contest lane gets 6 of each 10 gets.
+    """
+    def __init__(self, weights: Dict[str, int] = None):
+        self.weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        self.lanes = sorted(self.weights, key=self.weights.get, reverse=True)
+        self._current = {lane: 0 for lane in self.lanes}
+
+    def order(self) -> List[str]:
+        total = sum(self.weights.values())
+        for lane in self.lanes:
+            self._current[lane] += self.weights[lane]
+        scheduled = max(self.lanes, key=self._current.get)
+        self._current[scheduled] -= total
+        return [scheduled] + [lane for lane in self.lanes if lane != scheduled]
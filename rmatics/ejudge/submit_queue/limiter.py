@@ -0,0 +1,87 @@
+import time
+import uuid
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+from rmatics.model.base import redis
+
+DEFAULT_LIMITER_PREFIX = 'submit.limit'
+
+# KEYS: lease sets; ARGV: now, lease expire time, lease ttl, token, limits
+ACQUIRE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[1])
+    if redis.call('ZCARD', key) >= tonumber(ARGV[4 + i]) then
+        return 0
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[2], ARGV[4])
+    redis.call('EXPIRE', key, ARGV[3])
+end
+return 1
+"""
+
+Lease = namedtuple('Lease', ('token', 'keys'))
+
+
+class SubmitConcurrencyLimiter:
+    """ Limits count of submits sent to ejudge at the same time
+        by all workers of all processes and hosts
+
+        Each scope (ejudge contest, ejudge url) is a sorted set of leases
+        scored by expire time. Lease of crashed worker expires after lease_timeout,
+        so its slot is not lost forever.
+
+    Usage:
+    ------
+        lease = limiter.acquire(submit)
+        if lease is None:
+            # Too many submits of this contest are being sent, try later
+            ...
+        try:
+            submit.send()
+        finally:
+            limiter.release(lease)
+    """
+    def __init__(self, contest_limit=5, url_limit=20, lease_timeout=60,
+                 prefix=DEFAULT_LIMITER_PREFIX):
+        self.contest_limit = contest_limit
+        self.url_limit = url_limit
+        self.lease_timeout = lease_timeout
+        self.prefix = prefix
+        self._acquire_script = None
+
+    def _scopes(self, submit) -> List[Tuple[str, int]]:
+        scopes = []
+        if self.contest_limit and submit.ejudge_contest_id is not None:
+            scopes.append((f'{self.prefix}:contest:{submit.ejudge_contest_id}', self.contest_limit))
+        if self.url_limit and submit.ejudge_url:
+            scopes.append((f'{self.prefix}:url:{submit.ejudge_url}', self.url_limit))
+        return scopes
+
+    def acquire(self, submit) -> Optional[Lease]:
+        """ Takes slot in every scope of submit or nothing; returns None if any scope is full """
+        scopes = self._scopes(submit)
+        lease = Lease(uuid.uuid4().hex, [key for key, _ in scopes])
+        if not scopes:
+            return lease
+
+        if self._acquire_script is None:
+            self._acquire_script = redis.register_script(ACQUIRE_SCRIPT)
+
+        now = time.time()
+        acquired = self._acquire_script(
+            keys=lease.keys,
+            args=[now, now + self.lease_timeout, self.lease_timeout, lease.token,
+                  *(limit for _, limit in scopes)],
+        )
+        return lease if acquired else None
+
+    def release(self, lease: Lease):
+        if not lease.keys:
+            return
+        pipe = redis.pipeline(transaction=False)
+        for key in lease.keys:
+            pipe.zrem(key, lease.token)
+        pipe.execute()
@@ -0,0 +1,106 @@
+import logging
+import math
+import multiprocessing
+import signal
+import sys
+import time
+from typing import Callable
+
+from flask import current_app
+from gevent import Greenlet, sleep
+
+from rmatics.utils.centrifugo import centrifugo_client
+from .worker import BatchSubmitWorker, GET_TIMEOUT, SubmitWorker
+
+log = logging.getLogger(__name__)
+
+SCALE_INTERVAL = 5
+RESTART_DELAY = 1
+
+
+class SubmitWorkerPool(Greenlet):
+    """ Group of SubmitWorkers of one process, scaled by queue depth
+
+        Count of workers is kept between min_workers and max_workers:
+        one worker per submits_per_worker submits waiting in queue.
+        Extra workers are stopped after they handle current submit.
+        With batch_size > 1 workers are BatchSubmitWorkers.
+    """
+    def __init__(self, queue, min_workers=2, max_workers=2, submits_per_worker=5,
+                 scale_interval=SCALE_INTERVAL, limiter=None, stats=None, batch_size=1):
+        super(SubmitWorkerPool, self).__init__()
+        self.queue = queue
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, min_workers)
+        self.submits_per_worker = submits_per_worker
+        self.scale_interval = scale_interval
+        self.limiter = limiter
+        self.stats = stats
+        self.batch_size = batch_size
+        self.workers = []
+        self._ctx = current_app.app_context()
+
+    def _spawn(self):
+        kwargs = {'limiter': self.limiter, 'stats': self.stats, 'get_timeout': GET_TIMEOUT}
+        if self.batch_size > 1:
+            worker = BatchSubmitWorker(self.queue, batch_size=self.batch_size, **kwargs)
+        else:
+            worker = SubmitWorker(self.queue, **kwargs)
+        worker.start()
+        self.workers.append(worker)
+
+    def desired_workers(self, depth: int) -> int:
+        desired = math.ceil(depth / (self.submits_per_worker * self.batch_size))
+        return min(max(desired, self.min_workers), self.max_workers)
+
+    def scale(self):
+        self.workers = [worker for worker in self.workers if not worker.dead]
+        active = [worker for worker in self.workers if not worker.stopping]
+        desired = self.desired_workers(self.queue.depth())
+
+        for _ in range(desired - len(active)):
+            self._spawn()
+        for worker in active[desired:]:
+            worker.stop()
+
+        if desired != len(active):
+            current_app.logger.info(f'Submit workers: {len(active)} -> {desired}')
+        if self.stats is not None:
+            self.stats.set_workers(desired)
+            if centrifugo_client.publisher is not None:
+                self.stats.set_centrifugo(centrifugo_client.publisher.stats())
+
+    def _run(self):
+        with self._ctx:
+            while True:
+                try:
+                    self.scale()
+                except Exception:
+                    current_app.logger.exception('Failed to scale submit workers')
+                sleep(self.scale_interval)
+
+
+def run_supervisor(target: Callable[[], None], processes: int, restart_delay=RESTART_DELAY):
+    """ Runs target in several processes and restarts the dead ones """
+    def terminate(*_):
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+
+    running = [None] * processes
+    try:
+        while True:
+            for i, process in enumerate(running):
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    log.warning(f'Submit worker process {process.pid} exited '
+                                f'with code {process.exitcode}; restarting')
+                process = multiprocessing.Process(target=target)
+                process.start()
+                running[i] = process
+            time.sleep(restart_delay)
+    finally:
+        for process in running:
+            if process is not None and process.is_alive():
+                process.terminate()
@@ -1,5 +1,7 @@
 import pickle
+from typing import Dict, Iterable, List, Tuple
 
+from .lanes import LaneScheduler, PRACTICE_LANE
 from .submit import Submit
 from rmatics.model.base import redis
 from rmatics.utils.redis.queue import RedisQueue
@@ -7,6 +9,29 @@ from rmatics.utils.redis.queue import RedisQueue
 
 DEFAULT_SUBMIT_QUEUE = 'submit.queue'
 
+# KEYS: last get id; ARGV: submit id. Submits taken out of order must not move it back
+SET_LAST_GET_ID_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: lanes in order; ARGV: count
+POP_MANY_SCRIPT = """
+local values = {}
+for _, key in ipairs(KEYS) do
+    while #values < tonumber(ARGV[1]) do
+        local value = redis.call('LPOP', key)
+        if not value then
+            break
+        end
+        table.insert(values, value)
+    end
+end
+return values
+"""
+
 
 def last_put_id_key(key):
     return f'{key}:last.put.id'
@@ -20,50 +45,144 @@ def user_submits_key(key, user_id):
     return f'{key}:user:{user_id}'
 
 
+def lane_key(key, lane):
+    # Practice lane is the list used before lanes were added
+    if lane == PRACTICE_LANE:
+        return key
+    return f'{key}:lane:{lane}'
+
+
 class SubmitQueue(RedisQueue):
     """
     Очередь сабмитов.
     Кроме самих сабмитов поддерживает id последнего добавленного в очередь и
     id последнего полученного из очереди.
+
+    Сабмиты лежат в нескольких списках (lanes, см. lanes.py),
+    get берёт из них по очереди с весами.
     """
 
-    def __init__(self, key=DEFAULT_SUBMIT_QUEUE):
+    def __init__(self, key=DEFAULT_SUBMIT_QUEUE, lane_weights=None):
         super(SubmitQueue, self).__init__(key=key)
+        self.scheduler = LaneScheduler(lane_weights)
+        self._scripts = {}
+
+    def _script(self, script: str):
+        if script not in self._scripts:
+            self._scripts[script] = redis.register_script(script)
+        return self._scripts[script]
 
     def get_last_get_id(self):
         return int(redis.get(last_get_id_key(self.key)) or '0')
 
-    def submit(self, run_id, ejudge_url):
+    def depths(self) -> Dict[str, int]:
+        pipe = redis.pipeline(transaction=False)
+        for lane in self.scheduler.lanes:
+            pipe.llen(lane_key(self.key, lane))
+        return dict(zip(self.scheduler.lanes, pipe.execute()))
+
+    def depth(self) -> int:
+        return sum(self.depths().values())
+
+    def _watched_keys(self):
+        return [
+            *(lane_key(self.key, lane) for lane in self.scheduler.lanes),
+            last_get_id_key(self.key),
+            last_put_id_key(self.key),
+        ]
+
+    def _put(self, submit, pipe=None):
+        if pipe is None:
+            pipe = redis
+        pipe.rpush(lane_key(self.key, submit.lane), pickle.dumps(submit.encode()))
+
+    def submit(self, run_id, ejudge_url, ejudge_contest_id=None, lane=PRACTICE_LANE):
         def _submit(pipe):
             submit = Submit(
                 id=pipe.incr(last_put_id_key(self.key)),
                 run_id=run_id,
-                ejudge_url=ejudge_url
+                ejudge_url=ejudge_url,
+                ejudge_contest_id=ejudge_contest_id,
+                lane=lane,
             )
-            self.put(submit.encode(), pipe=pipe)
+            self._put(submit, pipe=pipe)
             return submit
         submit = redis.transaction(
             _submit,
-            self.key,
-            last_get_id_key(self.key),
-            last_put_id_key(self.key),
+            *self._watched_keys(),
             value_from_callable=True
         )
         return submit
 
-    def get(self):
+    def submit_many(self, items: Iterable[Tuple[int, str, int]], lane=PRACTICE_LANE) -> List[Submit]:
+        """ Puts submits of (run_id, ejudge_url, ejudge_contest_id) by one RPUSH """
+        items = list(items)
+        if not items:
+            return []
+
+        last_id = redis.incrby(last_put_id_key(self.key), len(items))
+        submits = [
+            Submit(
+                id=last_id - len(items) + i + 1,
+                run_id=run_id,
+                ejudge_url=ejudge_url,
+                ejudge_contest_id=ejudge_contest_id,
+                lane=lane,
+            )
+            for i, (run_id, ejudge_url, ejudge_contest_id) in enumerate(items)
+        ]
+        redis.rpush(lane_key(self.key, lane), *(pickle.dumps(submit.encode()) for submit in submits))
+        return submits
+
+    def ack(self, submit):
+        """ Submit is removed from list on get, nothing to acknowledge """
+
+    def put_back(self, submit):
+        """ Returns submit to the end of its lane, e.g. if it can't be sent now """
+        self._put(submit)
+
+    def get(self, timeout=0):
+        """ Returns None if queue is still empty after timeout seconds (0 - wait forever) """
+        keys = [lane_key(self.key, lane) for lane in self.scheduler.order()]
+
         def _get(pipe):
-            submit_encoded = super(SubmitQueue, self).get_blocking(pipe=pipe)
-            submit = Submit.decode(submit_encoded)
-            pipe.set(last_get_id_key(self.key), submit.id)
+            # BLPOP takes from the first not empty list
+            value = pipe.blpop(keys, timeout=timeout)
+            if value is None:
+                return None
+            submit = Submit.decode(pickle.loads(value[1]))
+            # Lanes are taken out of order, so last get id is only moved forward
+            self._script(SET_LAST_GET_ID_SCRIPT)(
+                keys=[last_get_id_key(self.key)],
+                args=[submit.id],
+                client=pipe,
+            )
             return submit
 
         submit = redis.transaction(
             _get,
-            self.key,
-            last_get_id_key(self.key),
-            last_put_id_key(self.key),
+            *self._watched_keys(),
             value_from_callable=True,
         )
 
         return submit
+
+    def get_many(self, count, timeout=0) -> List[Submit]:
+        """ Waits for the first submit as get does, the rest are taken if they are already in queue """
+        submit = self.get(timeout=timeout)
+        if submit is None:
+            return []
+        if count == 1:
+            return [submit]
+
+        values = self._script(POP_MANY_SCRIPT)(
+            keys=[lane_key(self.key, lane) for lane in self.scheduler.order()],
+            args=[count - 1],
+        )
+        submits = [submit, *(Submit.decode(pickle.loads(value)) for value in values)]
+        if values:
+            self._script(SET_LAST_GET_ID_SCRIPT)(
+                keys=[last_get_id_key(self.key)],
+                args=[max(submit.id for submit in submits)],
+            )
+        return submits
@@ -0,0 +1,82 @@
+import os
+import socket
+import time
+from typing import List
+
+from rmatics.model.base import redis
+
+DEFAULT_STATS_PREFIX = 'submit.workers:stats'
+STATS_TTL = 60
+
+
+class SubmitWorkerStats:
+    """ Throughput and latency of submit workers of current process
+
+        Stored in redis hash {prefix}:{host}:{pid}, so stats of all processes
+        can be read by any of them (see get_all). Hash of dead process expires.
+
+        Fields:
+            handled, failed, limited - counters of submits
+            send_seconds - total time of sending to ejudge
+            wait_seconds - total time submits spent in queue
+            handled:{lane}, wait_seconds:{lane} - the same for each lane
+            workers - current count of worker greenlets
+            centrifugo:{counter} - counters of CentrifugoPublisher of process
+            updated_at - timestamp of the last update
+    """
+    def __init__(self, prefix=DEFAULT_STATS_PREFIX, ttl=STATS_TTL):
+        self.prefix = prefix
+        self.ttl = ttl
+
+    @property
+    def key(self) -> str:
+        # pid is taken on each call because stats object is created before fork
+        return f'{self.prefix}:{socket.gethostname()}:{os.getpid()}'
+
+    def _update(self, increments: dict = None, values: dict = None):
+        pipe = redis.pipeline(transaction=False)
+        for field, amount in (increments or {}).items():
+            if isinstance(amount, float):
+                pipe.hincrbyfloat(self.key, field, amount)
+            else:
+                pipe.hincrby(self.key, field, amount)
+        pipe.hmset(self.key, {**(values or {}), 'updated_at': time.time()})
+        pipe.expire(self.key, self.ttl)
+        pipe.execute()
+
+    def handled(self, wait_seconds: float, send_seconds: float, failed=False, lane=None):
+        increments = {
+            'handled': 1,
+            'failed': int(failed),
+            'wait_seconds': wait_seconds,
+            'send_seconds': send_seconds,
+        }
+        if lane is not None:
+            increments[f'handled:{lane}'] = 1
+            increments[f'wait_seconds:{lane}'] = wait_seconds
+        self._update(increments)
+
+    def limited(self):
+        self._update({'limited': 1})
+
+    def set_workers(self, count: int):
+        self._update(values={'workers': count})
+
+    def set_centrifugo(self, counters: dict):
+        self._update(values={f'centrifugo:{name}': value for name, value in counters.items()})
+
+    def get_all(self) -> List[dict]:
+        """ Stats of all alive processes """
+        keys = sorted(redis.scan_iter(match=f'{self.prefix}:*'))
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+
+        result = []
+        for key, stats in zip(keys, pipe.execute()):
+            if not stats:
+                continue
+            stats = {field.decode(): float(value) for field, value in stats.items()}
+            stats['process'] = key.decode()[len(self.prefix) + 1:]
+            result.append(stats)
+        return result
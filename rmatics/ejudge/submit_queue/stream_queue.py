@@ -0,0 +1,240 @@
+import json
+import os
+import socket
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import redis as redis_lib
+
+from .lanes import LaneScheduler, PRACTICE_LANE
+from .queue import DEFAULT_SUBMIT_QUEUE, last_get_id_key, last_put_id_key, SET_LAST_GET_ID_SCRIPT
+from .submit import Submit
+from rmatics.model.base import redis
+
+DEFAULT_GROUP = 'submit.workers'
+
+# KEYS: stream, last put id; ARGV: submit data, max stream length
+PUT_SCRIPT = """
+local id = redis.call('INCR', KEYS[2])
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '*', 'id', id, 'data', ARGV[1])
+return id
+"""
+
+# KEYS: stream, last put id; ARGV: max stream length, submits data
+PUT_MANY_SCRIPT = """
+local count = #ARGV - 1
+local first_id = redis.call('INCRBY', KEYS[2], count) - count + 1
+for i = 2, #ARGV do
+    redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'id', first_id + i - 2, 'data', ARGV[i])
+end
+return first_id
+"""
+
+# KEYS: stream; ARGV: group, entry id, submit id, submit data, max stream length
+PUT_BACK_SCRIPT = """
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[5], '*', 'id', ARGV[3], 'data', ARGV[4])
+redis.call('XACK', KEYS[1], ARGV[1], ARGV[2])
+redis.call('XDEL', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class StreamSubmitQueue:
+    """ Очередь сабмитов на Redis Streams с consumer group
+
+        Has the same interface as SubmitQueue. Worker reads only submits
+        it handles right away; submit stays pending in group until
+        worker calls ack. Submits pending longer than claim_idle seconds
+        (worker died) are claimed by another consumer, so submits are not
+        buffered: buffered ones could be claimed and sent twice.
+
+        last.put.id and last.get.id keys are the same as SubmitQueue has,
+        so queue position is still computed as last.put.id - last.get.id.
+
+        Each lane has its own stream; batch is read from lanes
+        in order given by LaneScheduler.
+    """
+
+    def __init__(self, key=DEFAULT_SUBMIT_QUEUE, group=DEFAULT_GROUP,
+                 claim_idle=300, max_length=100000, lane_weights=None):
+        self.key = key
+        self.scheduler = LaneScheduler(lane_weights)
+        self.group = group
+        self.claim_idle = claim_idle
+        self.max_length = max_length
+        self._group_created = False
+        self._claimed_at = 0
+        self._scripts = {}
+
+    def stream_key(self, lane=PRACTICE_LANE) -> str:
+        if lane == PRACTICE_LANE:
+            return f'{self.key}:stream'
+        return f'{self.key}:stream:{lane}'
+
+    @property
+    def stream_keys(self) -> List[str]:
+        return [self.stream_key(lane) for lane in self.scheduler.lanes]
+
+    @property
+    def consumer(self) -> str:
+        # pid is taken on each call because queue object is created before fork
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _script(self, script: str):
+        if script not in self._scripts:
+            self._scripts[script] = redis.register_script(script)
+        return self._scripts[script]
+
+    def _ensure_group(self):
+        if self._group_created:
+            return
+        for stream_key in self.stream_keys:
+            try:
+                redis.execute_command('XGROUP', 'CREATE', stream_key, self.group, '0', 'MKSTREAM')
+            except redis_lib.exceptions.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+        self._group_created = True
+
+    def get_last_get_id(self):
+        return int(redis.get(last_get_id_key(self.key)) or '0')
+
+    def depths(self) -> Dict[str, int]:
+        # Acknowledged entries are deleted, so it's waiting and pending submits
+        pipe = redis.pipeline(transaction=False)
+        for stream_key in self.stream_keys:
+            pipe.execute_command('XLEN', stream_key)
+        return dict(zip(self.scheduler.lanes, pipe.execute()))
+
+    def depth(self) -> int:
+        return sum(self.depths().values())
+
+    def submit(self, run_id, ejudge_url, ejudge_contest_id=None, lane=PRACTICE_LANE):
+        submit = Submit(
+            id=None,
+            run_id=run_id,
+            ejudge_url=ejudge_url,
+            ejudge_contest_id=ejudge_contest_id,
+            lane=lane,
+        )
+        submit.id = self._script(PUT_SCRIPT)(
+            keys=[self.stream_key(lane), last_put_id_key(self.key)],
+            args=[self._dump(submit), self.max_length],
+        )
+        return submit
+
+    def submit_many(self, items: Iterable[Tuple[int, str, int]], lane=PRACTICE_LANE) -> List[Submit]:
+        """ Puts submits of (run_id, ejudge_url, ejudge_contest_id) by one script call """
+        submits = [
+            Submit(
+                id=None,
+                run_id=run_id,
+                ejudge_url=ejudge_url,
+                ejudge_contest_id=ejudge_contest_id,
+                lane=lane,
+            )
+            for run_id, ejudge_url, ejudge_contest_id in items
+        ]
+        if not submits:
+            return []
+
+        first_id = self._script(PUT_MANY_SCRIPT)(
+            keys=[self.stream_key(lane), last_put_id_key(self.key)],
+            args=[self.max_length, *(self._dump(submit) for submit in submits)],
+        )
+        for i, submit in enumerate(submits):
+            submit.id = first_id + i
+        return submits
+
+    def put_back(self, submit):
+        self._script(PUT_BACK_SCRIPT)(
+            keys=[self.stream_key(submit.lane)],
+            args=[self.group, submit.stream_id, submit.id, self._dump(submit), self.max_length],
+        )
+
+    def ack(self, submit):
+        pipe = redis.pipeline(transaction=False)
+        stream_key = self.stream_key(submit.lane)
+        pipe.execute_command('XACK', stream_key, self.group, submit.stream_id)
+        pipe.execute_command('XDEL', stream_key, submit.stream_id)
+        pipe.execute()
+
+    def get(self, timeout=0):
+        """ Returns None if queue is still empty after timeout seconds (0 - wait forever) """
+        submits = self.get_many(1, timeout=timeout)
+        return submits[0] if submits else None
+
+    def get_many(self, count, timeout=0) -> List[Submit]:
+        """ Waits for the first submit as get does, up to count submits are taken """
+        self._ensure_group()
+        return self._claim(count) or self._read(count, timeout)
+
+    def _read_group(self, stream_keys: List[str], count: int, block=None) -> List[Submit]:
+        block_args = ['BLOCK', int(block * 1000)] if block is not None else []
+        response = redis.execute_command(
+            'XREADGROUP', 'GROUP', self.group, self.consumer,
+            'COUNT', count, *block_args,
+            'STREAMS', *stream_keys, *('>' for _ in stream_keys),
+        )
+        submits = []
+        for _, entries in response or []:
+            submits.extend(self._load_entries(entries))
+        return submits
+
+    def _read(self, count: int, timeout) -> List[Submit]:
+        for lane in self.scheduler.order():
+            submits = self._read_group([self.stream_key(lane)], count)
+            if submits:
+                break
+        else:
+            submits = self._read_group(self.stream_keys, count, block=timeout)
+            # COUNT is applied to each stream, extra submits are returned to their streams
+            for submit in submits[count:]:
+                self.put_back(submit)
+            submits = submits[:count]
+        if submits:
+            self._script(SET_LAST_GET_ID_SCRIPT)(
+                keys=[last_get_id_key(self.key)],
+                args=[max(submit.id for submit in submits)],
+            )
+        return submits
+
+    def _claim(self, count: int) -> List[Submit]:
+        """ Takes submits of dead consumers; checked once per claim_idle / 2 """
+        now = time.time()
+        if now - self._claimed_at < self.claim_idle / 2:
+            return []
+        self._claimed_at = now
+
+        submits = []
+        for stream_key in self.stream_keys:
+            if len(submits) >= count:
+                break
+            response = redis.execute_command(
+                'XAUTOCLAIM', stream_key, self.group, self.consumer,
+                int(self.claim_idle * 1000), '0-0', 'COUNT', count - len(submits),
+            )
+            submits.extend(self._load_entries(response[1]))
+        return submits
+
+    @staticmethod
+    def _dump(submit: Submit) -> str:
+        data = submit.encode()
+        del data['id']
+        return json.dumps(data)
+
+    @staticmethod
+    def _load_entries(entries) -> List[Submit]:
+        submits = []
+        for entry_id, fields in entries:
+            # Entry could be deleted while it was pending
+            if not fields:
+                continue
+            fields = dict(zip(fields[::2], fields[1::2]))
+            submit = Submit.decode({
+                **json.loads(fields[b'data']),
+                'id': int(fields[b'id']),
+            })
+            submit.stream_id = entry_id
+            submits.append(submit)
+        return submits
@@ -1,12 +1,15 @@
 import functools
-from typing import Optional
+import time
+from typing import Dict, List, Optional
 
 from flask import current_app
+from gevent.pool import Pool
 from sqlalchemy import exc as sa_exc
 from sqlalchemy.orm import joinedload
 
 from rmatics import centrifugo_client
 from rmatics.ejudge.ejudge_proxy import submit
+from rmatics.ejudge.submit_queue.lanes import PRACTICE_LANE
 from rmatics.model.base import db
 from rmatics.model.run import Run
 from rmatics.utils.functions import attrs_to_dict
@@ -33,30 +36,48 @@ def retry_on_exception(exception_class: Exception, times=5):
 
 
 class Submit:
-    def __init__(self, id, run_id: int, ejudge_url: str):
+    def __init__(self, id, run_id: int, ejudge_url: str,
+                 ejudge_contest_id: int = None, created_at: float = None,
+                 lane: str = PRACTICE_LANE):
         self.id = id
         self.run_id = run_id
         self.ejudge_url = ejudge_url
+        # Is known before run is loaded, used for concurrency limits
+        self.ejudge_contest_id = ejudge_contest_id
+        self.created_at = created_at or time.time()
+        self.lane = lane
         self.ejudge_user = current_app.config.get('EJUDGE_USER')
         self.ejudge_password = current_app.config.get('EJUDGE_PASSWORD')
 
     @retry_on_exception(sa_exc.OperationalError, times=4)
     def _get_run(self) -> Optional[Run]:
         run: Run = db.session.query(Run) \
-            .options(joinedload(Run.problem)) \
+            .options(joinedload(Run.problem),
+                     joinedload(Run.user).load_only('id', 'firstname', 'lastname')) \
             .get(self.run_id)
 
         return run
 
+    @staticmethod
+    @retry_on_exception(sa_exc.OperationalError, times=4)
+    def _get_runs(run_ids: List[int]) -> Dict[int, Run]:
+        runs = db.session.query(Run) \
+            .options(joinedload(Run.problem),
+                     joinedload(Run.user).load_only('id', 'firstname', 'lastname')) \
+            .filter(Run.id.in_(run_ids)) \
+            .all()
+        return {run.id: run for run in runs}
+
     @retry_on_exception(sa_exc.OperationalError, times=4)
     def _add_info_from_ejudge(self, run, ejudge_run_id,
-                              ejudge_url, status: EjudgeStatuses):
+                              ejudge_url, status: EjudgeStatuses, commit=True):
         run.ejudge_status = status.value
         run.ejudge_run_id = ejudge_run_id
         run.ejudge_url = ejudge_url
 
         db.session.add(run)
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
     @retry_on_exception(sa_exc.OperationalError, times=4)
     def _remove_run(self, run: Run):
@@ -76,6 +97,44 @@ class Submit:
             'run_id': self.run_id
         }
 
+    def _send_to_ejudge(self, run: Run, problem, file: bytes, ejudge_url: str):
+        """ Doesn't use application context, so it can be called from another greenlet """
+        return submit(
+            run_file=file,
+            contest_id=problem.ejudge_contest_id,
+            prob_id=problem.problem_id,
+            lang_id=run.ejudge_language_id,
+            login=self.ejudge_user,
+            password=self.ejudge_password,
+            filename='common_filename',
+            url=ejudge_url,
+        )
+
+    def _apply_ejudge_response(self, run: Run, ejudge_response, ejudge_url: str,
+                               commit=True) -> Optional[dict]:
+        """ Updates run by ejudge response
+
+            Returns error protocol which should be saved after commit or None
+        """
+        try:
+            code = ejudge_response['code']
+            if code != 0:
+                raise ValueError(f'Ejudge returned status code {code}')
+            ejudge_run_id = ejudge_response.get('run_id')
+            self._add_info_from_ejudge(run, ejudge_run_id, ejudge_url, EjudgeStatuses(run.status),
+                                       commit=commit)
+            current_app.logger.info(f'Run #{self.run_id} successfully updated')
+            return None
+        except (TypeError, KeyError, ValueError):
+            # If Ejudge can't process submit, set generic error code for run
+            self._add_info_from_ejudge(run, None, ejudge_url, EjudgeStatuses.RMATICS_SUBMIT_ERROR,
+                                       commit=commit)
+
+            # Proxy actual ejudge output to generic template protocol for client
+            ejudge_compiler_output = ejudge_response.get('message', 'Ошибка отправки посылки')
+            current_app.logger.error(f'Ejudge retunred error for submit #{self.run_id}')
+            return self.build_submit_error_protocol(ejudge_compiler_output)
+
     def send(self, ejudge_url=None):
         current_app.logger.info(f'Trying to send run #{self.run_id} to ejudge')
 
@@ -90,57 +149,93 @@ class Submit:
         problem = run.problem
         db.session.expunge(problem)
 
-        ejudge_language_id = run.ejudge_language_id
-
         file = run.source
 
         centrifugo_client.send_problem_run_updates(run.problem_id, run)
 
         try:
-            ejudge_response = submit(
-                run_file=file,
-                contest_id=problem.ejudge_contest_id,
-                prob_id=problem.problem_id,
-                lang_id=ejudge_language_id,
-                login=self.ejudge_user,
-                password=self.ejudge_password,
-                filename='common_filename',
-                url=ejudge_url,
-            )
+            ejudge_response = self._send_to_ejudge(run, problem, file, ejudge_url)
         except Exception:
             current_app.logger.exception('Unknown Ejudge submit error')
             return
 
-        try:
-            code = ejudge_response['code']
-            if code != 0:
-                raise ValueError(f'Ejudge returned status code {code}')
-            ejudge_run_id = ejudge_response.get('run_id')
-            self._add_info_from_ejudge(run, ejudge_run_id, ejudge_url, EjudgeStatuses(run.status))
-            current_app.logger.info(f'Run #{self.run_id} successfully updated')
-        except (TypeError, KeyError, ValueError):
-            # If Ejudge can't process submit, set generic error code for run
-            self._add_info_from_ejudge(run, None, ejudge_url, EjudgeStatuses.RMATICS_SUBMIT_ERROR)
-
-            # Proxy actual ejudge output to generic template protocol for client
-            ejudge_compiler_output = ejudge_response.get('message', 'Ошибка отправки посылки')
-            run.protocol = self.build_submit_error_protocol(ejudge_compiler_output)
+        error_protocol = self._apply_ejudge_response(run, ejudge_response, ejudge_url)
+        if error_protocol is not None:
+            run.protocol = error_protocol
 
-            current_app.logger.error(f'Ejudge retunred error for submit #{self.run_id}')
+    @staticmethod
+    def send_many(submits: List['Submit'], ejudge_url=None, concurrency=10):
+        """ Does the same as send for each submit, but
+            runs are loaded by one query, sources by one mongo request,
+            submits are sent to ejudge concurrently
+        """
+        if not submits:
+            return
+        current_app.logger.info(f'Trying to send runs {[s.run_id for s in submits]} to ejudge')
+
+        runs = Submit._get_runs([queued_submit.run_id for queued_submit in submits])
+        sources = Run.get_sources(list(runs))
+
+        to_send = []
+        for queued_submit in submits:
+            run = runs.get(queued_submit.run_id)
+            if run is None:
+                current_app.logger.error(f'Run #{queued_submit.run_id} is not found')
+                continue
+            centrifugo_client.send_problem_run_updates(run.problem_id, run)
+            to_send.append((queued_submit, run, sources.get(run.id)))
+
+        def send_one(item):
+            queued_submit, run, file = item
+            try:
+                ejudge_response = queued_submit._send_to_ejudge(run, run.problem, file,
+                                                                ejudge_url or queued_submit.ejudge_url)
+                return ejudge_response, None
+            except Exception as e:
+                return None, e
+
+        responses = Pool(concurrency).map(send_one, to_send)
+
+        error_protocols = {}
+        for (queued_submit, run, _), (ejudge_response, error) in zip(to_send, responses):
+            if error is not None:
+                current_app.logger.error('Unknown Ejudge submit error', exc_info=error)
+                continue
+            # Runs are committed one by one, so runs accepted by ejudge
+            # are linked to ejudge runs even if another run can't be updated
+            try:
+                error_protocol = queued_submit._apply_ejudge_response(
+                    run, ejudge_response, ejudge_url or queued_submit.ejudge_url)
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception(f'Run #{run.id} is not updated by ejudge response')
+                continue
+            if error_protocol is not None:
+                error_protocols[run.id] = error_protocol
+
+        if error_protocols:
+            Run.set_protocols(error_protocols)
 
     def encode(self):
         return {
             'id': self.id,
             'run_id': self.run_id,
             'ejudge_url': self.ejudge_url,
+            'ejudge_contest_id': self.ejudge_contest_id,
+            'created_at': self.created_at,
+            'lane': self.lane,
         }
 
     @staticmethod
     def decode(encoded):
+        # Submits queued by previous versions have no ejudge_contest_id and created_at
         return Submit(
             id=encoded['id'],
             run_id=encoded['run_id'],
-            ejudge_url=encoded['ejudge_url']
+            ejudge_url=encoded['ejudge_url'],
+            ejudge_contest_id=encoded.get('ejudge_contest_id'),
+            created_at=encoded.get('created_at'),
+            lane=encoded.get('lane', PRACTICE_LANE),
         )
 
     def serialize(self, attributes=None):
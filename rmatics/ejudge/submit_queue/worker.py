@@ -1,41 +1,150 @@
+import time
+
 from flask import current_app
 from gevent import Greenlet, sleep
 from sqlalchemy import exc as sa_exc
 
+from .submit import Submit
 from rmatics.model.base import db
 
+# Worker wakes up this often to check whether it is stopped
+GET_TIMEOUT = 5
+# Pause before taking next submit if previous one was put back by limiter
+LIMITED_SLEEP = 0.5
+
 
 class SubmitWorker(Greenlet):
-    def __init__(self, queue):
+    """ Takes submits from queue and sends them to ejudge
+
+        limiter: SubmitConcurrencyLimiter, submit that doesn't fit limits is put back to queue
+        stats: SubmitWorkerStats
+    """
+    def __init__(self, queue, limiter=None, stats=None, get_timeout=0):
         super(SubmitWorker, self).__init__()
         self.queue = queue
+        self.limiter = limiter
+        self.stats = stats
+        self.get_timeout = get_timeout
+        self.stopping = False
         self._ctx = current_app.app_context()
         self.ejudge_url = None
 
+    def stop(self):
+        """ Worker exits after current submit is handled """
+        self.stopping = True
+
+    def _acquire(self, submit):
+        """ Returns (False, None) if submit doesn't fit limits and is put back to queue """
+        if self.limiter is None:
+            return True, None
+        lease = self.limiter.acquire(submit)
+        if lease is None:
+            self.queue.put_back(submit)
+            if self.stats is not None:
+                self.stats.limited()
+            return False, None
+        return True, lease
+
     def handle_submit(self):
-        submit = self.queue.get()
+        submit = self.queue.get(timeout=self.get_timeout)
+        if submit is None:
+            return
+
+        acquired, lease = self._acquire(submit)
+        if not acquired:
+            sleep(LIMITED_SLEEP)
+            return
+
+        started_at = time.time()
+        failed = False
         try:
             submit.send(ejudge_url=self.ejudge_url)
+            self.queue.ack(submit)
         except sa_exc.OperationalError:
+            # Not acknowledged submit is taken again by another worker, if queue supports it
             current_app.logger.exception('Something was wrong with MySQL')
+            failed = True
             raise
         except Exception:
             current_app.logger.exception('Submit worker caught exception and skipped submit without notifying user')
+            self.queue.ack(submit)
+            failed = True
 
         finally:
             # handle_submit вызывается внутри контекста;
             # rollback помогает избегать ошибок с незакрытыми транзакциями
             db.session.rollback()
+            if lease is not None:
+                self.limiter.release(lease)
+            if self.stats is not None:
+                self.stats.handled(wait_seconds=started_at - submit.created_at,
+                                   send_seconds=time.time() - started_at,
+                                   failed=failed,
+                                   lane=submit.lane)
 
     def _run(self):
-        while True:
+        while not self.stopping:
             try:
                 with self._ctx:
                     self.ejudge_url = current_app.config['EJUDGE_NEW_CLIENT_URL']
                     current_app.logger.info('Worker started')
-                    while True:
+                    while not self.stopping:
                         self.handle_submit()
             except sa_exc.OperationalError:
                 with self._ctx:
                     current_app.logger.warning('Something was wrong with MySQL; trying to restart worker')
                 sleep(1)
+
+
+class BatchSubmitWorker(SubmitWorker):
+    """ Takes up to batch_size submits at once and sends them by Submit.send_many:
+        runs and sources are loaded by one query each, submits are sent concurrently
+    """
+    def __init__(self, queue, batch_size=10, **kwargs):
+        super(BatchSubmitWorker, self).__init__(queue, **kwargs)
+        self.batch_size = batch_size
+
+    def handle_submit(self):
+        submits = self.queue.get_many(self.batch_size, timeout=self.get_timeout)
+        if not submits:
+            return
+
+        to_send = []
+        leases = []
+        for submit in submits:
+            acquired, lease = self._acquire(submit)
+            if acquired:
+                to_send.append(submit)
+                leases.append(lease)
+        if not to_send:
+            sleep(LIMITED_SLEEP)
+            return
+
+        started_at = time.time()
+        failed = False
+        try:
+            Submit.send_many(to_send, ejudge_url=self.ejudge_url, concurrency=len(to_send))
+            for submit in to_send:
+                self.queue.ack(submit)
+        except sa_exc.OperationalError:
+            current_app.logger.exception('Something was wrong with MySQL')
+            failed = True
+            raise
+        except Exception:
+            current_app.logger.exception('Submit worker caught exception and skipped submits without notifying users')
+            for submit in to_send:
+                self.queue.ack(submit)
+            failed = True
+
+        finally:
+            db.session.rollback()
+            for lease in leases:
+                if lease is not None:
+                    self.limiter.release(lease)
+            if self.stats is not None:
+                send_seconds = time.time() - started_at
+                for submit in to_send:
+                    self.stats.handled(wait_seconds=started_at - submit.created_at,
+                                       send_seconds=send_seconds,
+                                       failed=failed,
+                                       lane=submit.lane)
@@ -1,12 +1,11 @@
-import xml.dom.minidom
-import xml
 import zipfile
 from flask import g
 
 from rmatics.model.base import db
-from rmatics.utils.ejudge_archive import EjudgeArchiveReader
+from rmatics.utils.ejudge_archive import get_archive_reader
 from rmatics.utils.functions import attrs_to_dict
 from rmatics.utils.run import *
+from rmatics.utils.testing_report import get_testing_report, parse_testing_report
 
 
 class EjudgeRun(db.Model):
@@ -108,31 +107,24 @@ class EjudgeRun(db.Model):
     @lazy
     def get_sources(self):
         data = safe_open(submit_path(sources_path, self.contest_id, self.run_id), 'rb').read()
-        for encoding in ['utf-8', 'ascii', 'windows-1251']:
-            try:
-                data = data.decode(encoding)
-            except:
-                print('decoded:', encoding)
-                pass
-            else:
-                break
-        else:
+        text, _ = decode_source(data)
+        if text is None:
             return 'Ошибка кодировки'
-        return data
+        return text
 
     def get_output_file(self, test_num, tp="o", size=None): #tp: o - output, e - stderr, c - checker
-        data = self.get_output_archive().getfile("{0:06}.{1}".format(test_num, tp)).decode('ascii')
+        name = "{0:06}.{1}".format(test_num, tp)
         if size is not None:
-            data = data[:size]
-        return data
+            # Output is ascii, so size in bytes is size in characters
+            return self.get_output_archive().read_prefix(name, size).decode('ascii')
+        return self.get_output_archive().getfile(name).decode('ascii')
 
     def get_output_file_size(self, test_num, tp="o"): #tp: o - output, e - stderr, c - checker
-        data = self.get_output_archive().getfile("{0:06}.{1}".format(test_num, tp)).decode('ascii')
-        return len(data)
+        return self.get_output_archive().getsize("{0:06}.{1}".format(test_num, tp))
 
     def get_output_archive(self):
         if "output_archive" not in self.__dict__:
-            self.output_archive = EjudgeArchiveReader(submit_path(output_path, self.contest_id, self.run_id))
+            self.output_archive = get_archive_reader(submit_path(output_path, self.contest_id, self.run_id))
         return self.output_archive
 
     def get_test_full_protocol(self, test_num):
@@ -198,75 +190,20 @@ class EjudgeRun(db.Model):
 
     def parsetests(self):
         """
-        Parse tests data from xml archive
+        Parse tests data from testing report, parsed report is cached until report file is changed
         """
-        self.test_count = 0
-        self.tests = {}
-        self.judge_tests_info = {}
-        self.status_string = None
-        self.compiler_output = None
-        self.host = None
-        self.maxtime = None
-
-        if self.xml:
-            rep = self.xml.getElementsByTagName('testing-report')[0]
-            self.tests_count = int(rep.getAttribute('run-tests'))
-            self.status_string = rep.getAttribute('status')
-
-            compiler_output_elements = self.xml.getElementsByTagName('compiler_output')
-            if compiler_output_elements:
-                self.compiler_output = getattr(compiler_output_elements[0].firstChild, 'nodeValue', '')
-
-            host_elements = self.xml.getElementsByTagName('host')
-            if host_elements:
-                self.host = host_elements[0].firstChild.nodeValue
-
-            for node in self.xml.getElementsByTagName('test'):
-                number = node.getAttribute('num')
-                status = node.getAttribute('status')
-                time = node.getAttribute('time')
-                real_time = node.getAttribute('real-time')
-                max_memory_used = node.getAttribute('max-memory-used')
-                self.test_count += 1
-
-                try:
-                   time = int(time)
-                except ValueError:
-                   time = 0
-
-                try:
-                   real_time = int(real_time)
-                except ValueError:
-                   real_time = 0
-
-                test = {
-                    'status': status,
-                    'string_status': get_string_status(status),
-                    'real_time': real_time,
-                    'time': time,
-                    'max_memory_used' : max_memory_used,
-                }
-                judge_info = {}
-
-                for _type in ('input', 'output', 'correct', 'stderr', 'checker'):
-                    lst = node.getElementsByTagName(_type)
-                    if lst and lst[0].firstChild:
-                        judge_info[_type] = lst[0].firstChild.nodeValue
-                    else:
-                        judge_info[_type] = ''
-
-                if node.hasAttribute('term-signal'):
-                    judge_info['term-signal'] = int(node.getAttribute('term-signal'))
-                if node.hasAttribute('exit-code'):
-                    judge_info['exit-code'] = int(node.getAttribute('exit-code'))
-
-                self.judge_tests_info[number] = judge_info
-                self.tests[number] = test
-            try:
-                #print([test['time'] for test in self.tests.values()] + [test['real_time'] for test in self.tests.values()])
-                self.maxtime = max([test['time'] for test in self.tests.values()] + [test['real_time'] for test in self.tests.values()])
-            except ValueError:
-                pass
+        report = get_testing_report(self.contest_id, self.run_id)
+        if report is None:
+            report = parse_testing_report(str(self.protocol))
+
+        self.tests_count = report['tests_count']
+        self.test_count = report['test_count']
+        self.status_string = report['status_string']
+        self.compiler_output = report['compiler_output']
+        self.host = report['host']
+        self.maxtime = report['maxtime']
+        self.tests = report['tests']
+        self.judge_tests_info = report['judge_tests_info']
 
     @staticmethod
     def get_by(run_id, contest_id):
@@ -321,7 +258,6 @@ class EjudgeRun(db.Model):
 
     @lazy
     def fetch_tested_protocol_data(self):
-        self.xml = xml.dom.minidom.parseString(str(self.protocol))
         self.parsetests()
 
     def _set_output_archive(self, val):
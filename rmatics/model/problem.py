@@ -4,7 +4,7 @@ from zipfile import ZipFile
 
 from sqlalchemy.orm import relationship
 
-from rmatics.ejudge.serve_internal import EjudgeContestCfg
+from rmatics.ejudge.serve_internal import contest_cfg_registry
 from rmatics.model.base import db
 from rmatics.utils.decorators import deprecated
 from rmatics.utils.json_type import JsonType
@@ -126,7 +126,7 @@ class EjudgeProblem(Problem):
         return problem_dict
 
     def get_test(self, test_num, size=255):
-        conf = EjudgeContestCfg(number=self.ejudge_contest_id)
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
         prob = conf.getProblem(self.problem_id)
 
         test_file_name = (prob.tests_dir + prob.test_pat) % int(test_num)
@@ -137,15 +137,27 @@ class EjudgeProblem(Problem):
             res = test_file_name
         return res
 
+    def get_sample_tests_files(self) -> list:
+        """
+        Возвращает [(номер теста, файл теста, файл ответа)] для тестов из примеров
+        """
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
+        prob = conf.getProblem(self.problem_id)
+
+        return [
+            (test, (prob.tests_dir + prob.test_pat) % int(test), (prob.tests_dir + prob.corr_pat) % int(test))
+            for test in self.sample_tests.split(',')
+        ]
+
     def get_test_size(self, test_num):
-        conf = EjudgeContestCfg(number=self.ejudge_contest_id)
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
         prob = conf.getProblem(self.problem_id)
 
         test_file_name = (prob.tests_dir + prob.test_pat) % int(test_num)
         return os.stat(test_file_name).st_size
 
     def get_corr(self, test_num, size=255):
-        conf = EjudgeContestCfg(number = self.ejudge_contest_id)
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
         prob = conf.getProblem(self.problem_id)
 
         corr_file_name = (prob.tests_dir + prob.corr_pat) % int(test_num)
@@ -177,14 +189,14 @@ class EjudgeProblem(Problem):
         return test
 
     def get_corr_size(self, test_num):
-        conf = EjudgeContestCfg(number = self.ejudge_contest_id)
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
         prob = conf.getProblem(self.problem_id)
 
         corr_file_name = (prob.tests_dir + prob.corr_pat) % int(test_num)
         return os.stat(corr_file_name).st_size
 
     def get_checker(self):
-        conf = EjudgeContestCfg(number = self.ejudge_contest_id)
+        conf = contest_cfg_registry.get(self.ejudge_contest_id)
         prob = conf.getProblem(self.problem_id)
 
         #generate dir with checker
@@ -1,12 +1,14 @@
 import datetime
 import hashlib
 import logging
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 from flask import g
+from pymongo import ReplaceOne
 from sqlalchemy import MetaData, Table
 
 from rmatics.model.base import db, mongo
+from rmatics.model.source_store import source_store
 from rmatics.utils.decorators import deprecated
 from rmatics.utils.functions import attrs_to_dict
 
@@ -22,6 +24,15 @@ EJUDGE_COLUMNS = [
     'last_change_time',
 ]
 
+PROTOCOL_FULL = 'full'
+PROTOCOL_SUMMARY = 'summary'
+PROTOCOL_COMPILER = 'compiler'
+PROTOCOL_TESTS = 'tests'
+PROTOCOL_VIEWS = (PROTOCOL_FULL, PROTOCOL_SUMMARY, PROTOCOL_COMPILER, PROTOCOL_TESTS)
+
+# Fields of each test kept in summary, outputs are dropped
+PROTOCOL_TEST_SUMMARY_FIELDS = ('status', 'string_status', 'time', 'real_time', 'max_memory_used')
+
 
 class Run(db.Model):
     __table_args__ = (
@@ -58,14 +69,11 @@ class Run(db.Model):
     source_hash = db.Column(db.String(32))  # We are using md5 hex digest
 
     def update_source(self, blob: bytes):
-        mongo.db.source.insert_one({
-            'run_id': self.id,
-            'blob': blob,
-        })
+        source_store.put(self.id, blob, hash_=self.source_hash)
         return blob
 
     def remove_source(self):
-        mongo.db.source.find_one_and_delete({'run_id': self.id})
+        source_store.remove(self.id)
 
     def move_protocol_to_rejudge_collection(self, rejudge_id: int):
         protocol = mongo.db.protocol.find_one({'run_id': self.id})
@@ -75,15 +83,39 @@ class Run(db.Model):
             mongo.db.rejudge.insert_one(protocol)
             mongo.db.protocol.find_one_and_delete({'run_id': self.id})
 
+    @staticmethod
+    def move_protocols_to_rejudge_collection(rejudge_ids: Dict[int, int]):
+        """ The same as move_protocol_to_rejudge_collection for many runs
+
+            rejudge_ids: {run_id: rejudge_id}
+        """
+        protocols = list(mongo.db.protocol.find({'run_id': {'$in': list(rejudge_ids)}}))
+        if not protocols:
+            return
+        for protocol in protocols:
+            del protocol['_id']
+            protocol['rejudge_id'] = rejudge_ids[protocol['run_id']]
+        mongo.db.rejudge.insert_many(protocols, ordered=False)
+        mongo.db.protocol.delete_many({'run_id': {'$in': [protocol['run_id'] for protocol in protocols]}})
+
     @property
     def source(self) -> Optional[bytes]:
-        data = mongo.db.source.find_one({'run_id': self.id})
-        if data is None:
+        blob = source_store.get(self.id)
+        if blob is None:
             logging.error(f'Cannot find source for run #{self.id}')
-            return None
-        blob = data.get('blob')
         return blob
 
+    @property
+    def source_text(self) -> Optional[str]:
+        return source_store.get_text(self.id)
+
+    @staticmethod
+    def get_sources(run_ids: List[int]) -> Dict[int, bytes]:
+        sources = source_store.get_many(run_ids)
+        for run_id in set(run_ids) - sources.keys():
+            logging.error(f'Cannot find source for run #{run_id}')
+        return sources
+
     @property
     def protocol(self) -> Optional[dict]:
         return mongo.db.protocol.find_one({'run_id': self.id}, {'_id': False})
@@ -92,6 +124,47 @@ class Run(db.Model):
     def protocol(self, protocol_source: dict):
         mongo.db.protocol.update({'run_id': self.id}, protocol_source, upsert=True)
 
+    @staticmethod
+    def get_protocol(run_id: int, view=PROTOCOL_FULL, tests: Iterable[int] = None) -> Optional[dict]:
+        """ Part of protocol of run selected by mongo projection
+
+            full - the whole protocol
+            summary - protocol with status and time of tests, without outputs
+            compiler - compiler output only
+            tests - protocol with given tests only; tests of protocol are
+                    keyed by number, so they are selected by keys instead of $slice
+        """
+        if view == PROTOCOL_SUMMARY:
+            test_fields = {field: f'$$test.v.{field}' for field in PROTOCOL_TEST_SUMMARY_FIELDS}
+            pipeline = [
+                {'$match': {'run_id': run_id}},
+                {'$limit': 1},
+                {'$addFields': {'tests': {'$arrayToObject': {'$map': {
+                    'input': {'$objectToArray': {'$ifNull': ['$tests', {}]}},
+                    'as': 'test',
+                    'in': {'k': '$$test.k', 'v': test_fields},
+                }}}}},
+                {'$project': {'_id': False}},
+            ]
+            return next(mongo.db.protocol.aggregate(pipeline), None)
+
+        if view == PROTOCOL_COMPILER:
+            projection = {'_id': False, 'run_id': True, 'compiler_output': True}
+        elif view == PROTOCOL_TESTS:
+            projection = {'_id': False, 'run_id': True,
+                          **{f'tests.{test_num}': True for test_num in tests or ()}}
+        else:
+            projection = {'_id': False}
+        return mongo.db.protocol.find_one({'run_id': run_id}, projection)
+
+    @staticmethod
+    def set_protocols(protocols: Dict[int, dict]):
+        """ The same as protocol setter for many runs; protocols: {run_id: protocol} """
+        mongo.db.protocol.bulk_write([
+            ReplaceOne({'run_id': run_id}, protocol, upsert=True)
+            for run_id, protocol in protocols.items()
+        ], ordered=False)
+
     @staticmethod
     def generate_source_hash(blob: bytes) -> str:
         m = hashlib.md5()
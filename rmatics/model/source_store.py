@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import zlib
+from typing import Dict, Iterable, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from rmatics.model.base import mongo
+from rmatics.utils.run import decode_source
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def source_hash(blob: bytes) -> str:
+    """ The same md5 hex digest as Run.source_hash """
+    return hashlib.md5(blob).hexdigest()
+
+
+def compress(blob: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'zlib':
+        return zlib.compress(blob)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(blob)
+    return blob
+
+
+def decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class SourceStore:
+    """ Content-addressed storage of run sources in mongo
+
+        Each distinct source is stored once in collection source_blob:
+            {_id: md5 hex digest, blob: compressed source, compression, size, encoding, text}
+        and collection source maps run to it:
+            {run_id, hash}
+
+        Encoding of source is detected once when it is stored. text is compressed
+        UTF-8 copy of source for display, it is kept only when encoding is not UTF-8
+        (blob is the text itself otherwise).
+
+        Documents of source written before the store was enabled
+        keep {run_id, blob} and are read as is until migrated (see scripts/migrate_sources.py).
+        Blobs are never removed by remove, the same source can be used by other runs.
+
+    Usage:
+    ------
+        source_store.init_app(compression='zlib', enabled=True)
+
+        source_store.put(run_id, blob)
+        blob = source_store.get(run_id)
+    """
+    COMPRESSIONS = (None, 'zlib', 'zstd')
+
+    def __init__(self, compression='zlib'):
+        self.compression = compression
+        self.enabled = False
+
+    def init_app(self, compression: Optional[str] = 'zlib', enabled=True):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f'Unknown source compression {compression}')
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError('zstandard is not installed')
+        self.compression = compression
+        self.enabled = enabled
+
+    @staticmethod
+    def _text_fields(blob: bytes, compression: Optional[str]) -> dict:
+        text, encoding = decode_source(blob)
+        fields = {'encoding': encoding}
+        if text is not None and encoding != 'utf-8':
+            fields['text'] = compress(text.encode('utf-8'), compression)
+        return fields
+
+    def _blob_document(self, hash_: str, blob: bytes) -> dict:
+        return {
+            '_id': hash_,
+            'blob': compress(blob, self.compression),
+            'compression': self.compression,
+            'size': len(blob),
+            **self._text_fields(blob, self.compression),
+        }
+
+    @staticmethod
+    def _document_text(document: dict) -> Optional[str]:
+        """ Text of source or blob document """
+        compression = document.get('compression')
+        if document.get('text') is not None:
+            return decompress(document['text'], compression).decode('utf-8')
+
+        blob = decompress(document.get('blob') or b'', compression)
+        if 'encoding' not in document:
+            # Stored before encoding detection
+            text, _ = decode_source(blob)
+        elif document['encoding'] is not None:
+            text = blob.decode(document['encoding'])
+        else:
+            text = None
+        return text if text is not None else blob.decode('utf-8', errors='replace')
+
+    def put_blobs(self, blobs: Dict[str, bytes]):
+        """ Stores hash -> blob sources missing in source_blob """
+        if not blobs:
+            return
+        operations = [UpdateOne({'_id': hash_}, {'$setOnInsert': self._blob_document(hash_, blob)},
+                                upsert=True)
+                      for hash_, blob in blobs.items()]
+        try:
+            mongo.db.source_blob.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Concurrent upsert of the same source, it is stored anyway
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+                raise
+
+    def put(self, run_id: int, blob: bytes, hash_: str = None):
+        if not self.enabled:
+            mongo.db.source.insert_one({'run_id': run_id, 'blob': blob, **self._text_fields(blob, None)})
+            return
+
+        hash_ = hash_ or source_hash(blob)
+        try:
+            mongo.db.source_blob.update_one({'_id': hash_},
+                                            {'$setOnInsert': self._blob_document(hash_, blob)},
+                                            upsert=True)
+        except DuplicateKeyError:
+            pass
+        mongo.db.source.insert_one({'run_id': run_id, 'hash': hash_})
+
+    def remove(self, run_id: int):
+        mongo.db.source.find_one_and_delete({'run_id': run_id})
+
+    def get(self, run_id: int) -> Optional[bytes]:
+        return self.get_many([run_id]).get(run_id)
+
+    def _get_documents(self, run_ids: Iterable[int], projection: dict = None) -> Dict[int, dict]:
+        """ run_id -> legacy source document or blob document, by two queries """
+        documents = mongo.db.source.find({'run_id': {'$in': list(run_ids)}}, projection)
+
+        result = {}
+        hashes = {}
+        for document in documents:
+            if 'hash' in document:
+                hashes[document['run_id']] = document['hash']
+            else:
+                result[document['run_id']] = document
+
+        if hashes:
+            blobs = {
+                blob['_id']: blob
+                for blob in mongo.db.source_blob.find({'_id': {'$in': list(set(hashes.values()))}},
+                                                      projection)
+            }
+            for run_id, hash_ in hashes.items():
+                if hash_ not in blobs:
+                    log.error(f'Cannot find source blob {hash_} of run #{run_id}')
+                    continue
+                result[run_id] = blobs[hash_]
+
+        return result
+
+    def get_many(self, run_ids: Iterable[int]) -> Dict[int, bytes]:
+        """ run_id -> source for found sources """
+        return {
+            run_id: decompress(document.get('blob'), document.get('compression'))
+            if document.get('blob') is not None else None
+            for run_id, document in self._get_documents(run_ids, {'text': False}).items()
+        }
+
+    def get_text(self, run_id: int) -> Optional[str]:
+        """ Source decoded to text, encoding is not guessed for sources stored with it """
+        documents = self._get_documents([run_id])
+        if run_id not in documents:
+            return None
+        return self._document_text(documents[run_id])
+
+    def migrate(self, batch_size=1000, limit: int = None) -> int:
+        """ Moves blobs of legacy {run_id, blob} documents to source_blob
+
+            Returns count of migrated documents
+        """
+        migrated = 0
+        while limit is None or migrated < limit:
+            count = batch_size if limit is None else min(batch_size, limit - migrated)
+            documents = list(mongo.db.source.find({'blob': {'$exists': True}}).limit(count))
+            if not documents:
+                break
+
+            hashes = {document['_id']: source_hash(document['blob'] or b'') for document in documents}
+            self.put_blobs({hashes[document['_id']]: document['blob'] or b'' for document in documents})
+            mongo.db.source.bulk_write([
+                UpdateOne({'_id': document_id}, {'$set': {'hash': hash_}, '$unset': {'blob': ''}})
+                for document_id, hash_ in hashes.items()
+            ], ordered=False)
+
+            migrated += len(documents)
+            log.info(f'Migrated {migrated} sources')
+        return migrated
+
+    def stats(self) -> dict:
+        return {
+            'runs': mongo.db.source.count_documents({}),
+            'legacy': mongo.db.source.count_documents({'blob': {'$exists': True}}),
+            'blobs': mongo.db.source_blob.count_documents({}),
+        }
+
+
+source_store = SourceStore()
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Query
 from rmatics.model.base import db
 from rmatics.model.statement import StatementUser
 from rmatics.utils.functions import (
+    attrs_to_dict,
     hash_password,
     random_password,
 )
@@ -65,6 +66,16 @@ class SimpleUser(db.Model):
         self.password_md5 = hash_password(new_password)
         return new_password
 
+    def serialize(self, attributes=None):
+        if not attributes:
+            attributes = (
+                'id',
+                'firstname',
+                'lastname',
+            )
+        serialized = attrs_to_dict(self, *attributes)
+        return serialized
+
 
 class User(SimpleUser):
     __mapper_args__ = {'polymorphic_identity': 'user'}
@@ -1,8 +1,28 @@
-from rmatics.utils.cacher import FlaskCacher
-from rmatics.utils.cacher.cache_invalidators import MonitorCacheInvalidator
+from rmatics.utils.cacher import FlaskCacher, IncrementalCacher
+from rmatics.utils.cacher.cache_invalidators import MonitorCacheInvalidator, RedisIndexCacheInvalidator
+from rmatics.utils.redis.run_statuses import TransientRunStatuses
+from rmatics.utils.redis.sample_tests import SampleTestsCache
 
 invalidator = MonitorCacheInvalidator(autocommit=False)
 
+# Used instead of invalidator if MONITOR_CACHE_INVALIDATOR is 'redis'
+redis_invalidator = RedisIndexCacheInvalidator()
+
 monitor_cacher = FlaskCacher(prefix='monitor', cache_invalidator=invalidator,
                              allowed_kwargs=['problem_id', 'user_ids',
                                              'time_after', 'time_before'])
+
+# Runs of problem are stored as single entry, patched on every run update
+monitor_runs_cacher = IncrementalCacher(prefix='monitor_runs')
+
+# Counts of problem submissions are not invalidated, they just expire
+submissions_count_cacher = FlaskCacher(prefix='submissions_count',
+                                       allowed_kwargs=['problem_id', 'user_id', 'group_id',
+                                                       'lang_id', 'status_id', 'statement_id',
+                                                       'from_timestamp', 'to_timestamp'])
+
+# Compiling/running statuses are kept in redis, only terminal ones are written to runs table
+run_statuses = TransientRunStatuses()
+
+# Sample tests of problems are read from test files only when files are changed
+sample_tests_cache = SampleTestsCache()
@@ -0,0 +1,44 @@
+import click
+
+from rmatics.wsgi import application
+from rmatics.utils.cacher.serializers import get_serializer, measure_serializer
+from rmatics.view.monitors.monitor import get_runs
+
+SERIALIZERS = [
+    ('json', None),
+    ('json', 'zlib'),
+    ('msgpack', None),
+    ('msgpack', 'zlib'),
+    ('runs_columns', None),
+    ('runs_columns', 'zlib'),
+    ('runs_columns', 'lz4'),
+]
+
+
+@application.cli.command()
+@click.option('--problem-id', '-p', multiple=True, type=int, required=True)
+@click.option('--repeat', default=10)
+def main(problem_id, repeat):
+    """ Prints size and encoding time of monitor runs for each cache serializer """
+    with application.app_context():
+        problems_runs = [get_runs(problem_id=pid, cache=False) for pid in problem_id]
+
+    for name, compression in SERIALIZERS:
+        try:
+            serializer = get_serializer(name, compression)
+        except RuntimeError as e:
+            click.echo(f'{name}+{compression}: skipped, {e}')
+            continue
+
+        sizes = dumps_ms = loads_ms = 0
+        for runs in problems_runs:
+            result = measure_serializer(serializer, runs, repeat)
+            sizes += result['size']
+            dumps_ms += result['dumps_ms']
+            loads_ms += result['loads_ms']
+        click.echo(f'{serializer.name:>24}: {sizes:>10} bytes, '
+                   f'dumps {dumps_ms:8.2f} ms, loads {loads_ms:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import tempfile
+import time
+
+import click
+
+from rmatics.wsgi import application
+from rmatics.ejudge.serve_cfg import load_serve_cfg
+from rmatics.ejudge.serve_internal import EjudgeContestCfg, all_contests
+
+
+def measure(load, contest_ids, repeat) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for contest_id in contest_ids:
+            load(contest_id)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+@application.cli.command()
+@click.option('--contest-id', '-c', multiple=True, type=int, help='All contests by default')
+@click.option('--repeat', default=5)
+def main(contest_id, repeat):
+    """ Prints time of loading serve.cfg of contests by each parser """
+    contest_ids = list(contest_id) or [int(contest_id) for contest_id in all_contests()]
+    contest_ids = [contest_id for contest_id in contest_ids
+                   if _loads(lambda: EjudgeContestCfg(number=contest_id))]
+    click.echo(f'{len(contest_ids)} contests')
+
+    configparser_ms = measure(lambda c: EjudgeContestCfg(number=c), contest_ids, repeat)
+    fast_ms = measure(load_serve_cfg, contest_ids, repeat)
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        measure(lambda c: load_serve_cfg(c, snapshot_dir=snapshot_dir), contest_ids, 1)
+        snapshot_ms = measure(lambda c: load_serve_cfg(c, snapshot_dir=snapshot_dir), contest_ids, repeat)
+
+    for name, ms in (('configparser', configparser_ms), ('serve_cfg', fast_ms), ('snapshot', snapshot_ms)):
+        click.echo(f'{name:>14}: {ms:10.2f} ms, x{configparser_ms / ms if ms else 0:.1f}')
+
+
+def _loads(load) -> bool:
+    try:
+        load()
+        return True
+    except Exception as e:
+        click.echo(f'skipped: {e}')
+        return False
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import time
+
+import click
+from gevent import monkey
+
+monkey.patch_all()
+
+from gevent.pool import Pool
+
+from rmatics.ejudge.ejudge_proxy import submit
+from rmatics.ejudge.ejudge_session import ejudge_sessions
+
+
+@click.command()
+@click.option('--url', default='http://localhost:11111/', help='pseudoej or ejudge new-client url')
+@click.option('--contest-id', default=1)
+@click.option('--submits', default=200)
+@click.option('--workers', default=10)
+@click.option('--fresh-sessions', is_flag=True, default=False,
+              help='Login before every submit, as it was before sessions reuse')
+def main(url, contest_id, submits, workers, fresh_sessions):
+    """ Measures submits per second sent to ejudge by concurrent greenlets """
+    ejudge_sessions.init_app(pool_size=workers)
+
+    def send(_):
+        if fresh_sessions:
+            ejudge_sessions.get_session(url, contest_id, 'user', 'pass', expired=object())
+        return submit(run_file=b'print(1)', contest_id=contest_id, prob_id=1, lang_id=27,
+                      login='user', password='pass', filename='common_filename', url=url)
+
+    start = time.time()
+    results = Pool(workers).map(send, range(submits))
+    elapsed = time.time() - start
+
+    errors = sum(1 for result in results if result['code'] != 0)
+    click.echo(f'{submits} submits, {errors} errors in {elapsed:.2f} s: {submits / elapsed:.1f} submits/s')
+
+
+if __name__ == '__main__':
+    main()
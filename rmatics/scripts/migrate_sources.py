@@ -0,0 +1,23 @@
+import click
+
+from rmatics.wsgi import application
+from rmatics.model.source_store import source_store
+
+
+@application.cli.command()
+@click.option('--batch-size', default=1000)
+@click.option('--limit', default=None, type=int, help='Migrate at most this count of sources')
+def main(batch_size, limit):
+    """ Moves sources stored as {run_id, blob} to content-addressed source store
+
+        Can be run while application is working: legacy and migrated sources are read the same way
+    """
+    with application.app_context():
+        click.echo(f'Before: {source_store.stats()}')
+        migrated = source_store.migrate(batch_size=batch_size, limit=limit)
+        click.echo(f'Migrated {migrated} sources')
+        click.echo(f'After: {source_store.stats()}')
+
+
+if __name__ == '__main__':
+    main()
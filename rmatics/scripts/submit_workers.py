@@ -3,25 +3,73 @@ from gevent import monkey
 
 monkey.patch_all()
 
-from gevent.pool import Group
+from flask import current_app
 
 from rmatics.wsgi import application
-from rmatics.ejudge.submit_queue.queue import SubmitQueue
-from rmatics.ejudge.submit_queue.worker import SubmitWorker
+from rmatics.ejudge.submit_queue.limiter import SubmitConcurrencyLimiter
+from rmatics.ejudge.submit_queue.pool import SubmitWorkerPool, run_supervisor
+from rmatics.ejudge.submit_queue import create_submit_queue
+from rmatics.ejudge.submit_queue.stats import SubmitWorkerStats
 
 from rmatics import create_app
 from rmatics.config import CONFIG_MODULE
 
 
+def run_workers(workers, max_workers, batch_size):
+    app = create_app(config=CONFIG_MODULE, config_logger=False)
+    with app.app_context():
+        limiter = SubmitConcurrencyLimiter(
+            contest_limit=current_app.config['SUBMIT_CONTEST_CONCURRENCY'],
+            url_limit=current_app.config['SUBMIT_URL_CONCURRENCY'],
+            lease_timeout=current_app.config['SUBMIT_LEASE_TIMEOUT_SECONDS'],
+        )
+        pool = SubmitWorkerPool(create_submit_queue(),
+                                min_workers=workers,
+                                max_workers=max_workers or workers,
+                                limiter=limiter,
+                                stats=SubmitWorkerStats(),
+                                batch_size=batch_size)
+        pool.start()
+        pool.join()
+
+
 @application.cli.command()
-@click.option('--workers', default=2)
-def main(workers):
-    create_app(config=CONFIG_MODULE, config_logger=False)
-    queue = SubmitQueue()
-    worker_group = Group()
-    for _ in range(workers):
-        worker_group.start(SubmitWorker(queue))
-    worker_group.join()
+@click.option('--workers', default=2, help='Workers (greenlets) of each process')
+@click.option('--max-workers', default=None, type=int,
+              help='Workers of each process are added up to this count while queue grows')
+@click.option('--processes', default=1, help='Processes restarted on failure')
+@click.option('--batch-size', default=1, help='Submits taken by worker at once, 1 - one by one')
+def main(workers, max_workers, processes, batch_size):
+    if processes == 1:
+        run_workers(workers, max_workers, batch_size)
+    else:
+        run_supervisor(lambda: run_workers(workers, max_workers, batch_size), processes)
+
+
+@application.cli.command()
+def stats():
+    """ Prints queue depth by lanes, throughput and latency of all submit worker processes """
+    queue = create_submit_queue()
+    lanes = queue.scheduler.lanes
+    depths = queue.depths()
+    click.echo('depth: ' + ' '.join(f'{lane}={depths[lane]}' for lane in lanes))
+
+    def mean(process, field, count_field):
+        count = process.get(count_field, 0)
+        return process.get(field, 0) / count if count else 0
+
+    for process in SubmitWorkerStats().get_all():
+        lanes_wait = ' '.join(f'wait:{lane}={mean(process, f"wait_seconds:{lane}", f"handled:{lane}"):.3f}s'
+                              for lane in lanes)
+        click.echo(f'{process["process"]}: workers={process.get("workers", 0):.0f} '
+                   f'handled={process.get("handled", 0):.0f} failed={process.get("failed", 0):.0f} '
+                   f'limited={process.get("limited", 0):.0f} '
+                   f'wait={mean(process, "wait_seconds", "handled"):.3f}s '
+                   f'send={mean(process, "send_seconds", "handled"):.3f}s {lanes_wait}')
+        centrifugo = ' '.join(f'{field.split(":", 1)[1]}={value:.0f}'
+                              for field, value in sorted(process.items()) if field.startswith('centrifugo:'))
+        if centrifugo:
+            click.echo(f'    centrifugo: {centrifugo}')
 
 
 if __name__ == '__main__':
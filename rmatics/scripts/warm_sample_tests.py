@@ -0,0 +1,30 @@
+import click
+
+from rmatics.wsgi import application
+from rmatics.model.base import db
+from rmatics.model.problem import EjudgeProblem
+from rmatics.plugins import sample_tests_cache
+from rmatics.view import get_problems_by_statement_id
+
+
+@application.cli.command()
+@click.option('--statement-id', '-s', multiple=True, type=int, required=True)
+def main(statement_id):
+    """ Puts sample tests of problems of statements to cache """
+    with application.app_context():
+        if not sample_tests_cache.enabled:
+            click.echo('SAMPLE_TESTS_CACHE is disabled')
+            return
+
+        for current_statement_id in statement_id:
+            problem_ids = [problem.id for problem in
+                           get_problems_by_statement_id(current_statement_id, filter_hidden=False)]
+            problems = db.session.query(EjudgeProblem) \
+                .filter(EjudgeProblem.id.in_(problem_ids)) \
+                .all() if problem_ids else []
+            count = sample_tests_cache.warm(problems)
+            click.echo(f'Statement {current_statement_id}: cached samples of {count} problems')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import json
 from mock import MagicMock
 
 from rmatics.testutils import TestCase
-from rmatics.utils.cacher import Cacher
+from rmatics.utils.cacher import Cacher, LocalCache
 from rmatics.utils.cacher.locker import FakeLocker
 
 PREFIX = 'my_cache'
@@ -25,8 +25,8 @@ class TestCacher(TestCase):
 
         locker = FakeLocker()
 
-        self.locker_lock = MagicMock()
-        locker._lock = self.locker_lock
+        self.locker_lock = MagicMock(return_value=True)
+        locker._try_lock = self.locker_lock
 
         self.locker_unlock = MagicMock()
         locker._unlock = self.locker_unlock
@@ -52,7 +52,8 @@ class TestCacher(TestCase):
         res = self.cached_function(a=3)
 
         self.assertEqual(res, FUNC_RETURN_VALUE)
-        self.redis_get_mock.assert_called_once()
+        # Cache is checked again under lock
+        self.assertEqual(self.redis_get_mock.call_count, 2)
         self.redis_set_mock.assert_called_once()
 
         self.invalidator_subscribe_mock.assert_called_once()
@@ -67,8 +68,116 @@ class TestCacher(TestCase):
         res = self.cached_function(a=3)
 
         self.to_be_cached.assert_not_called()
-        self.locker_lock.assert_called_once()
-        self.locker_unlock.assert_called_once()
+        self.locker_lock.assert_not_called()
+        self.locker_unlock.assert_not_called()
 
         self.invalidator_subscribe_mock.assert_not_called()
         self.assertEqual(res, another_func_return)
+
+    def test_wait_for_filling(self):
+        self.redis_get_mock.side_effect = ['', json.dumps(FUNC_RETURN_VALUE)]
+        self.locker_lock.return_value = False
+
+        res = self.cached_function(a=3)
+
+        self.assertEqual(res, FUNC_RETURN_VALUE)
+        self.to_be_cached.assert_not_called()
+        self.redis_set_mock.assert_not_called()
+        self.cacher.store.brpoplpush.assert_called_once()
+        self.locker_unlock.assert_not_called()
+        self.invalidator_subscribe_mock.assert_not_called()
+
+    def test_get_stale_while_refreshing(self):
+        stale_return = {'result': 'stale'}
+        self.cacher.stale_period = 60
+        self.cacher.store.pipeline.return_value.execute.return_value = [json.dumps(stale_return), 30]
+        self.locker_lock.return_value = False
+
+        res = self.cached_function(a=3)
+
+        self.assertEqual(res, stale_return)
+        self.to_be_cached.assert_not_called()
+        self.locker_lock.assert_called_once()
+
+    def test_get_from_local_cache(self):
+        self.cacher.local_cache = LocalCache(size=10, ttl=10)
+        self.cacher.local_cache.subscribe = MagicMock()
+        self.redis_get_mock.return_value = json.dumps(FUNC_RETURN_VALUE)
+
+        self.cached_function(a=3)
+        res = self.cached_function(a=3)
+
+        self.assertEqual(res, FUNC_RETURN_VALUE)
+        self.redis_get_mock.assert_called_once()
+
+        key = list(self.cacher.local_cache._entries.keys())[0]
+        self.cacher.remove(key)
+        self.cacher.store.publish.assert_called_once_with(self.cacher.invalidate_channel, key)
+
+        self.cached_function(a=3)
+        self.assertEqual(self.redis_get_mock.call_count, 2)
+
+
+class TestCacherMany(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.redis = MagicMock()
+
+        locker = FakeLocker()
+        self.locker_lock = MagicMock(return_value=True)
+        locker._try_lock = self.locker_lock
+
+        self.cacher = Cacher(self.redis, locker, ['a', 'problem_id'], prefix='key_prefix',
+                             cache_invalidator=MagicMock(), fill_attempts=1)
+
+        self.to_be_cached = MagicMock()
+        self.to_be_cached.__name__ = FUNC_NAME
+
+        self.batch_func = MagicMock(side_effect=lambda problem_ids, a: {
+            problem_id: {'problem_id': problem_id} for problem_id in problem_ids
+        })
+        self.batch_func.__name__ = f'{FUNC_NAME}_many'
+
+        self.cached_function = self.cacher.many(self.to_be_cached, batch_kwarg='problem_ids',
+                                                item_kwarg='problem_id')(self.batch_func)
+
+    def test_fill_missing_by_single_call(self):
+        self.cacher.stale_period = 60
+        pipe = self.redis.pipeline.return_value
+        cached = json.dumps({'problem_id': 1})
+        # Read of all items, read under locks, write
+        pipe.execute.side_effect = [[cached, 100, None, -2, None, -2], [None, -2, None, -2], []]
+
+        res = self.cached_function(problem_ids=[1, 2, 3], a=5)
+
+        self.assertEqual(res, {problem_id: {'problem_id': problem_id} for problem_id in [1, 2, 3]})
+        self.batch_func.assert_called_once_with(problem_ids=[2, 3], a=5)
+        self.assertEqual(self.locker_lock.call_count, 2)
+        self.assertEqual(pipe.set.call_count, 2)
+        self.assertEqual(pipe.set.call_args[1]['ex'], self.cacher.period + self.cacher.stale_period)
+        self.assertEqual(pipe.rpush.call_count, 2)
+
+    def test_wait_for_filling(self):
+        self.locker_lock.return_value = False
+        self.redis.mget.side_effect = [[None, None], [None, json.dumps({'problem_id': 2})]]
+
+        res = self.cached_function(problem_ids=[1, 2], a=5)
+
+        self.assertEqual(res, {problem_id: {'problem_id': problem_id} for problem_id in [1, 2]})
+        self.redis.brpoplpush.assert_called_once()
+        # Filler is too slow for the first item, it is not cached by waiter
+        self.batch_func.assert_called_once_with(problem_ids=[1], a=5)
+        self.redis.pipeline.assert_not_called()
+
+    def test_get_stale_while_refreshing(self):
+        stale_return = {'result': 'stale'}
+        self.cacher.stale_period = 60
+        self.redis.pipeline.return_value.execute.return_value = [json.dumps(stale_return), 30]
+        self.locker_lock.return_value = False
+
+        res = self.cached_function(problem_ids=[1], a=5)
+
+        self.assertEqual(res, {1: stale_return})
+        self.batch_func.assert_not_called()
+        self.redis.brpoplpush.assert_not_called()
@@ -0,0 +1,119 @@
+from mock import MagicMock
+
+from rmatics.model.base import redis
+from rmatics.testutils import TestCase
+from rmatics.utils.cacher.cache_invalidators import RedisIndexCacheInvalidator
+
+PREFIX = 'my_cache'
+FUNC_NAME = 'my_func_name'
+FUNC_KEY = 'my_func_key'
+
+
+class TestRedisIndexCacheInvalidator(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.redis_delete_mock = MagicMock()
+
+        invalidate_by = ['any_other', 'problem_id', 'any_arg']
+
+        self.invalidator = RedisIndexCacheInvalidator(prefix=PREFIX)
+        self.invalidator.invalidate_by = invalidate_by
+        self.invalidator.init_app(remove_cache_func=self.redis_delete_mock, store=redis)
+
+    def test_create_index(self):
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': [2, 3],
+            'not_allowed_invalidate_arg': 'any',
+        }
+        self.invalidator.subscribe(FUNC_NAME, 10, FUNC_KEY, func_kwargs)
+
+        keys = {key.decode() for key in redis.keys(f'idx/{PREFIX}/{FUNC_NAME}/1/*')}
+        expected_keys = {
+            f'idx/{PREFIX}/{FUNC_NAME}/1/__all__',
+            f'idx/{PREFIX}/{FUNC_NAME}/1/any_arg_2',
+            f'idx/{PREFIX}/{FUNC_NAME}/1/any_arg_3',
+        }
+        self.assertEqual(keys, expected_keys)
+        for key in keys:
+            self.assertLessEqual(redis.ttl(key), 10)
+
+    def test_cache_invalidated(self):
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': 2,
+            'any_other': 'three',
+        }
+        self.invalidator.subscribe(FUNC_NAME, 10, FUNC_KEY, func_kwargs)
+
+        func_kwargs.pop('any_other')
+        all_of = func_kwargs
+
+        self.invalidator.invalidate(FUNC_NAME, all_of=all_of)
+        self.redis_delete_mock.assert_called_once_with(FUNC_KEY)
+
+        # Key was removed from index
+        self.invalidator.invalidate(FUNC_NAME, all_of={'problem_id': 1})
+        self.redis_delete_mock.assert_called_once()
+
+    def test_cache_invalidated_any_of(self):
+        self.invalidator.subscribe_many(FUNC_NAME, 10, [
+            ('first_key', {'problem_id': 1, 'any_arg': [1, 2], 'any_other': 'three'}),
+            ('second_key', {'problem_id': 1, 'any_arg': [3], 'any_other': 'three'}),
+            ('third_key', {'problem_id': 1, 'any_arg': [4], 'any_other': 'three'}),
+        ])
+
+        self.invalidator.invalidate(FUNC_NAME,
+                                    all_of={'problem_id': 1, 'any_other': 'three'},
+                                    any_of={'any_arg': [2, 3]})
+
+        removed_keys = {call[0][0] for call in self.redis_delete_mock.call_args_list}
+        self.assertEqual(removed_keys, {'first_key', 'second_key'})
+
+    def test_cache_not_invalidated(self):
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': 2,
+            'any_other': 'three',
+        }
+        self.invalidator.subscribe(FUNC_NAME, 10, FUNC_KEY, func_kwargs)
+
+        func_kwargs['any_arg'] = 1
+        self.invalidator.invalidate(FUNC_NAME, all_of=func_kwargs)
+
+        func_kwargs = {
+            'problem_id': 4,
+            'any_arg': 2,
+            'any_other': 'three',
+        }
+        self.invalidator.invalidate(FUNC_NAME, all_of=func_kwargs)
+
+        self.redis_delete_mock.assert_not_called()
+
+    def test_cache_invalidated_with_missing_group(self):
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': None,
+            'any_other': None,
+        }
+        self.invalidator.subscribe(FUNC_NAME, 10, FUNC_KEY, func_kwargs)
+
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': 'something',
+            'any_other': 'something else',
+        }
+        self.invalidator.invalidate(FUNC_NAME, all_of=func_kwargs)
+        self.redis_delete_mock.assert_called_once_with(FUNC_KEY)
+
+    def test_expired_keys_are_not_invalidated(self):
+        func_kwargs = {
+            'problem_id': 1,
+            'any_arg': 2,
+        }
+        # Already expired
+        self.invalidator.subscribe(FUNC_NAME, -1, FUNC_KEY, func_kwargs)
+
+        self.invalidator.invalidate(FUNC_NAME, all_of=func_kwargs)
+        self.redis_delete_mock.assert_not_called()
@@ -0,0 +1,33 @@
+import time
+from unittest import TestCase
+
+from rmatics.utils.cacher.local_cache import LocalCache
+
+
+class TestLocalCache(TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = LocalCache(size=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired(self):
+        cache = LocalCache(size=2, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+
+        self.assertEqual(cache.get('a', 'default'), 'default')
+
+    def test_pop(self):
+        cache = LocalCache(size=2, ttl=10)
+        cache.set('a', None)
+        self.assertIsNone(cache.get('a', 'default'))
+
+        cache.pop('a')
+        cache.pop('not_existing')
+        self.assertEqual(cache.get('a', 'default'), 'default')
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from rmatics.utils.cacher.serializers import CompressedSerializer, JsonSerializer, \
+    MonitorRunsSerializer, measure_serializer
+
+
+def make_run(run_id, user_id):
+    return {
+        'id': run_id,
+        'user': {
+            'id': user_id,
+            'firstname': f'first {user_id}',
+            'lastname': f'last {user_id}',
+        },
+        'problem_id': 1,
+        'create_time': '2019-01-01T10:00:00+0300',
+        'ejudge_score': 100,
+        'ejudge_status': 0,
+        'ejudge_test_num': 10,
+    }
+
+
+class TestMonitorRunsSerializer(TestCase):
+    def setUp(self):
+        self.runs = [make_run(run_id, run_id % 3) for run_id in range(10)]
+
+    def test_runs_restored(self):
+        serializer = MonitorRunsSerializer(JsonSerializer())
+        self.assertEqual(serializer.loads(serializer.dumps(self.runs)), self.runs)
+
+    def test_other_values_restored(self):
+        serializer = MonitorRunsSerializer(JsonSerializer())
+        for value in [[], {'a': 1}, [{'id': 1}], None]:
+            self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+
+    def test_compressed(self):
+        serializer = CompressedSerializer(MonitorRunsSerializer(), 'zlib')
+        self.assertEqual(serializer.loads(serializer.dumps(self.runs)), self.runs)
+
+        compressed_size = measure_serializer(serializer, self.runs, repeat=1)['size']
+        json_size = measure_serializer(JsonSerializer(), self.runs, repeat=1)['size']
+        self.assertLess(compressed_size, json_size)
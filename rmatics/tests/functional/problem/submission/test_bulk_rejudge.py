@@ -0,0 +1,122 @@
+from threading import Thread
+
+import mock
+from flask import url_for
+
+from rmatics import db, mongo
+from rmatics.ejudge.submit_queue.lanes import REJUDGE_LANE
+from rmatics.model import Run
+from rmatics.model.rejudge import Rejudge
+from rmatics.testutils import TestCase
+
+
+class TestBulkRejudgeAPI(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.create_ejudge_problems()
+        self.create_problems()
+        self.create_users()
+
+        self.runs = [
+            Run(user_id=self.users[0].id, problem_id=self.problems[1].id,
+                ejudge_status=1, ejudge_language_id=1, ejudge_contest_id=1,
+                ejudge_url='ej_url'),
+            Run(user_id=self.users[1].id, problem_id=self.problems[1].id,
+                ejudge_status=1, ejudge_language_id=1, ejudge_contest_id=1,
+                ejudge_url=None),
+            Run(user_id=self.users[0].id, problem_id=self.problems[2].id,
+                ejudge_status=1, ejudge_language_id=1, ejudge_contest_id=2,
+                ejudge_url='ej_url'),
+        ]
+        db.session.add_all(self.runs)
+        db.session.commit()
+
+    def send_request(self, **data):
+        """ Sends request and waits until background rejudge is finished """
+        threads = []
+
+        def make_thread(*args, **kwargs):
+            thread = Thread(*args, **kwargs)
+            threads.append(thread)
+            return thread
+
+        url = url_for('problem.bulk_rejudge')
+        with mock.patch('rmatics.view.problem.rejudge.threading.Thread', side_effect=make_thread):
+            resp = self.client.post(url, data=data)
+        for thread in threads:
+            thread.join()
+        return resp
+
+    def get_progress(self, job_id):
+        resp = self.client.get(url_for('problem.bulk_rejudge_progress', job_id=job_id))
+        self.assert200(resp)
+        return resp.json['data']
+
+    @mock.patch('rmatics.view.problem.rejudge.queue_submit_many')
+    def test_problem(self, queue_submit_many_mock):
+        judged_run, failed_run, _ = self.runs
+        protocol = {'my_protocol': 'data', 'run_id': judged_run.id}
+        mongo.db.protocol.insert_one(protocol)
+        del protocol['_id']
+
+        resp = self.send_request(problem_id=self.problems[1].id)
+        self.assert200(resp)
+        self.assertEqual(resp.json['data']['total'], 2)
+
+        queue_submit_many_mock.assert_called_once_with(
+            [(judged_run.id, 'ej_url', 1),
+             (failed_run.id, self.app.config['EJUDGE_NEW_CLIENT_URL'], 1)],
+            lane=REJUDGE_LANE,
+        )
+
+        rejudge = db.session.query(Rejudge).filter(Rejudge.run_id == judged_run.id).one()
+        self.assertIsNone(db.session.query(Rejudge).filter(Rejudge.run_id == failed_run.id).one_or_none())
+
+        old_protocol = mongo.db.rejudge.find_one({'rejudge_id': rejudge.id}, {'_id': False})
+        del old_protocol['rejudge_id']
+        self.assertEqual(old_protocol, protocol)
+        self.assertIsNone(mongo.db.protocol.find_one({'run_id': judged_run.id}))
+
+        db.session.refresh(failed_run)
+        self.assertEqual(failed_run.ejudge_url, self.app.config['EJUDGE_NEW_CLIENT_URL'])
+
+    @mock.patch('rmatics.view.problem.rejudge.queue_submit_many')
+    def test_ejudge_contest_and_progress(self, queue_submit_many_mock):
+        resp = self.send_request(ejudge_contest_id=2, job_id='job')
+        self.assert200(resp)
+
+        queue_submit_many_mock.assert_called_once_with([(self.runs[2].id, 'ej_url', 2)],
+                                                       lane=REJUDGE_LANE)
+
+        progress = self.get_progress('job')
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['total'], 1)
+        self.assertEqual(progress['queued'], 1)
+
+    @mock.patch('rmatics.view.problem.rejudge.BULK_REJUDGE_CHUNK_SIZE', 1)
+    @mock.patch('rmatics.view.problem.rejudge.queue_submit_many')
+    def test_chunks(self, queue_submit_many_mock):
+        resp = self.send_request(problem_id=self.problems[1].id, job_id='job')
+        self.assert200(resp)
+        self.assertEqual(resp.json['data']['total'], 2)
+
+        self.assertEqual(queue_submit_many_mock.call_count, 2)
+        self.assertEqual(self.get_progress('job')['queued'], 2)
+
+    @mock.patch('rmatics.view.problem.rejudge.queue_submit_many', side_effect=RuntimeError)
+    def test_failed(self, queue_submit_many_mock):
+        resp = self.send_request(problem_id=self.problems[1].id, job_id='job')
+        self.assert200(resp)
+
+        progress = self.get_progress('job')
+        self.assertEqual(progress['status'], 'failed')
+        self.assertIsNotNone(progress['finished_at'])
+
+    def test_without_filters(self):
+        resp = self.send_request()
+        self.assert400(resp)
+
+    def test_progress_not_found(self):
+        resp = self.client.get(url_for('problem.bulk_rejudge_progress', job_id='unknown'))
+        self.assert404(resp)
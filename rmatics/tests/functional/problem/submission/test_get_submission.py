@@ -232,4 +232,42 @@ class TestAPIProblemSubmission(TestCase):
 
         data = resp.get_json()
         self.assertEqual(data['result'], 'success')
-        self.assertEqual(len(data['data']), 1)
\ No newline at end of file
+        self.assertEqual(len(data['data']), 1)
+
+    def send_keyset_request(self, problem_id: int, **kwargs):
+        route = url_for('problem.problem_submissions', problem_id=problem_id)
+        return self.client.get(route, data=kwargs)
+
+    def test_keyset_pagination(self):
+        problem_id = self.problems[1].id
+
+        resp = self.send_keyset_request(problem_id, count=1)
+        self.assert200(resp)
+        data = resp.get_json()
+        self.assertEqual([run['id'] for run in data['data']], [self.run3.id])
+        self.assertNotIn('count', data['metadata'])
+        self.assertEqual(data['metadata']['before_id'], self.run3.id)
+        self.assertIsNone(data['metadata']['after_id'])
+
+        resp = self.send_keyset_request(problem_id, count=1,
+                                        before_id=data['metadata']['before_id'])
+        data = resp.get_json()
+        self.assertEqual([run['id'] for run in data['data']], [self.run1.id])
+        self.assertIsNone(data['metadata']['before_id'])
+        self.assertEqual(data['metadata']['after_id'], self.run1.id)
+
+        resp = self.send_keyset_request(problem_id, count=1,
+                                        after_id=data['metadata']['after_id'])
+        data = resp.get_json()
+        self.assertEqual([run['id'] for run in data['data']], [self.run3.id])
+        self.assertIsNone(data['metadata']['after_id'])
+
+    def test_count(self):
+        route = url_for('problem.problem_submissions_count', problem_id=self.problems[1].id)
+
+        resp = self.client.get(route, data={'user_id': self.user1.id})
+        self.assert200(resp)
+        self.assertEqual(resp.get_json()['data']['count'], 1)
+
+        resp = self.client.get(route)
+        self.assertEqual(resp.get_json()['data']['count'], 2)
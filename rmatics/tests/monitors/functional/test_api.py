@@ -2,10 +2,10 @@ import datetime
 
 import mock
 from flask import url_for
-from mock import MagicMock
 
 from rmatics import db, monitor_cacher
 from rmatics.model import Run, UserGroup, MonitorCourseModule, CourseModule
+from rmatics.model.base import redis
 from rmatics.model.monitor import MonitorStatement, Monitor
 from rmatics.testutils import TestCase
 
@@ -14,12 +14,6 @@ class TestContestBasedMonitorGetApi(TestCase):
     def setUp(self):
         super().setUp()
 
-        self.mock_cacher_get = MagicMock(return_value='')
-        self.mock_cacher_set = MagicMock()
-
-        monitor_cacher._instance.store.get = self.mock_cacher_get
-        monitor_cacher._instance.store.set = self.mock_cacher_set
-
         self.create_users()
         self.create_groups()
 
@@ -89,8 +83,9 @@ class TestContestBasedMonitorGetApi(TestCase):
                                  time_before=int(time_before.timestamp()), )
         self.assert200(resp)
 
-        self.assertEqual(self.mock_cacher_get.call_count, 3)
-        self.assertEqual(self.mock_cacher_set.call_count, 3)
+        # Runs of all problems are cached by single call
+        keys = redis.keys(f'{monitor_cacher.key_prefix}/get_runs_*')
+        self.assertEqual(len([key for key in keys if not key.endswith(b'/notify')]), 3)
 
         self.assertIn('data', resp.json)
         data = resp.json['data']
@@ -125,6 +120,20 @@ class TestContestBasedMonitorGetApi(TestCase):
         runs_lens = map(len, runs)
         self.assertEqual(sum(runs_lens), 3)
 
+    def test_streaming(self):
+        expected_data = self.send_request(contest_id=self.course_module_monitor.id).json['data']
+
+        self.app.config['MONITOR_STREAMING_RESPONSE'] = True
+        try:
+            resp = self.send_request(contest_id=self.course_module_monitor.id)
+        finally:
+            self.app.config['MONITOR_STREAMING_RESPONSE'] = False
+
+        self.assert200(resp)
+        self.assertTrue(resp.is_streamed)
+        self.assertEqual(resp.json['status'], 'success')
+        self.assertEqual(resp.json['data'], expected_data)
+
 
 class TestProblemBasedMonitorGetApi(TestCase):
     def setUp(self):
@@ -147,15 +156,18 @@ class TestProblemBasedMonitorGetApi(TestCase):
             'time_before': time_before,
             'time_after': time_after,
         }
-        with mock.patch('rmatics.view.monitors.monitor.get_runs') as mock_get_runs:
-            mock_get_runs.return_value = runs_data
+        with mock.patch('rmatics.view.monitors.monitor.get_runs_many') as mock_get_runs_many:
+            mock_get_runs_many.return_value = {
+                problem_id: runs_data
+                for problem_id in problem_ids
+            }
             resp = self.send_request(**data)
 
-        for problem_id in problem_ids:
-            mock_get_runs.assert_any_call(problem_id=problem_id,
-                                          user_ids=user_ids,
-                                          time_before=time_before,
-                                          time_after=time_after)
+        mock_get_runs_many.assert_called_once_with(problem_ids=problem_ids,
+                                                   user_ids=user_ids,
+                                                   time_before=time_before,
+                                                   time_after=time_after,
+                                                   raw=False)
         self.assert200(resp)
         response = resp.json.get('data')
 
@@ -1,15 +1,19 @@
 import datetime
+import json
 
-from mock import MagicMock
+from mock import MagicMock, patch
 from sqlalchemy import MetaData
 
 from rmatics import db
 from rmatics import monitor_cacher
 from rmatics.model import Run, MonitorCourseModule, CourseModule
+from rmatics.model.base import redis
 from rmatics.model.monitor import MonitorStatement, Monitor
 from rmatics.testutils import TestCase
 from rmatics.view import get_problems_by_statement_id
-from rmatics.view.monitors.monitor import get_runs, ContestBasedMonitorAPIView
+from rmatics.plugins import monitor_runs_cacher
+from rmatics.view.monitors.monitor import get_runs, get_runs_many, get_runs_incremental, \
+    ContestBasedMonitorAPIView
 
 
 MONITOR_GROUP_ID = 5
@@ -77,12 +81,6 @@ class TestGenerateMonitor(TestCase):
     def setUp(self):
         super().setUp()
 
-        self.mock_cacher_get = MagicMock(return_value='')
-        self.mock_cacher_set = MagicMock()
-
-        monitor_cacher._instance.store.get = self.mock_cacher_get
-        monitor_cacher._instance.store.set = self.mock_cacher_set
-
         self.create_users()
         self.create_statements()
         self.create_ejudge_problems()
@@ -95,6 +93,11 @@ class TestGenerateMonitor(TestCase):
 
         self.contest_id = self.course_module_statement.id
 
+    @staticmethod
+    def cached_keys():
+        keys = redis.keys(f'{monitor_cacher.key_prefix}/get_runs_*')
+        return [key for key in keys if not key.endswith(b'/notify')]
+
     def create_runs(self, creation_time=None):
         if not hasattr(self, 'runs'):
             self.runs = []
@@ -121,8 +124,7 @@ class TestGenerateMonitor(TestCase):
         serialized_runs = get_runs(problem_id=self.problems[0].id,
                                    user_ids=user_ids)
 
-        self.mock_cacher_get.assert_called_once()
-        self.mock_cacher_set.assert_called_once()
+        self.assertEqual(len(self.cached_keys()), 1)
 
         self.assertEqual(len(serialized_runs), 3)
 
@@ -176,3 +178,75 @@ class TestGenerateMonitor(TestCase):
                         time_before=int(time_before.timestamp()))
 
         self.assertEqual(len(runs), 3)
+
+    def test_get_runs_many(self):
+        user_ids = [user.id for user in self.users]
+        problem_ids = [self.problems[0].id, self.problems[1].id]
+        problems_runs = get_runs_many(problem_ids=problem_ids,
+                                      user_ids=user_ids)
+
+        # Entries live for period + stale period
+        keys = self.cached_keys()
+        self.assertEqual(len(keys), 2)
+        for key in keys:
+            self.assertGreater(redis.ttl(key), monitor_cacher.period)
+
+        self.assertEqual(list(problems_runs.keys()), problem_ids)
+        self.assertEqual(len(problems_runs[self.problems[0].id]), 3)
+        self.assertEqual(problems_runs[self.problems[1].id], [])
+
+        expected_runs = get_runs(problem_id=self.problems[0].id,
+                                 user_ids=user_ids, cache=False)
+        self.assertEqual(problems_runs[self.problems[0].id], expected_runs)
+
+    def test_get_runs_many_shares_cache_with_get_runs(self):
+        user_ids = [user.id for user in self.users]
+        cached_runs = [{'id': 1}]
+
+        get_runs(problem_id=self.problems[0].id, user_ids=user_ids)
+        key, = self.cached_keys()
+        redis.set(key, json.dumps(cached_runs))
+
+        problems_runs = get_runs_many(problem_ids=[self.problems[0].id],
+                                      user_ids=user_ids)
+
+        self.assertEqual(problems_runs, {self.problems[0].id: cached_runs})
+
+    def test_get_runs_incremental_fills_cache(self):
+        problem_id = self.problems[0].id
+        user_ids = [self.users[0].id, self.users[1].id]
+        get_many = MagicMock(return_value={problem_id: None})
+        fill_many = MagicMock()
+
+        with patch.object(monitor_runs_cacher, 'get_many', get_many), \
+                patch.object(monitor_runs_cacher, 'fill_many', fill_many):
+            problems_runs = get_runs_incremental(problem_ids=[problem_id],
+                                                 user_ids=user_ids)
+
+        expected_runs = get_runs(problem_id=problem_id, user_ids=user_ids, cache=False)
+        self.assertEqual(problems_runs[problem_id], expected_runs)
+
+        # Whole problem is cached regardless of user filter
+        filled = fill_many.call_args[0][0]
+        self.assertEqual(set(filled[problem_id].keys()), {run.id for run in self.runs})
+
+    def test_get_runs_incremental_filters_cached(self):
+        problem_id = self.problems[0].id
+        now = datetime.datetime.utcnow().timestamp()
+        cached = {
+            b'2': json.dumps([now, {'id': 2, 'user': {'id': 1}}]).encode(),
+            b'1': json.dumps([now - 100, {'id': 1, 'user': {'id': 1}}]).encode(),
+            b'3': json.dumps([now, {'id': 3, 'user': {'id': 2}}]).encode(),
+        }
+        get_many = MagicMock(return_value={problem_id: cached})
+        fill_many = MagicMock()
+
+        with patch.object(monitor_runs_cacher, 'get_many', get_many), \
+                patch.object(monitor_runs_cacher, 'fill_many', fill_many):
+            all_runs = get_runs_incremental(problem_ids=[problem_id])
+            filtered_runs = get_runs_incremental(problem_ids=[problem_id], user_ids=[1],
+                                                 time_after=int(now - 10))
+
+        fill_many.assert_not_called()
+        self.assertEqual([run['id'] for run in all_runs[problem_id]], [1, 2, 3])
+        self.assertEqual([run['id'] for run in filtered_runs[problem_id]], [2])
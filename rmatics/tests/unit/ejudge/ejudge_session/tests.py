@@ -0,0 +1,90 @@
+import mock
+
+from rmatics.ejudge.ejudge_proxy import submit
+from rmatics.ejudge.ejudge_session import EjudgeSessionManager
+from rmatics.testutils import TestCase
+
+URL = 'http://ejudge/new-client'
+
+
+def make_response(text):
+    response = mock.Mock()
+    response.text = text
+    response.cookies = {'EJSID': 'cookie'}
+    return response
+
+
+class TestEjudgeSessionManager(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = EjudgeSessionManager()
+        self.http = mock.Mock()
+        self.manager._http = self.http
+
+    def send_submit(self):
+        with mock.patch('rmatics.ejudge.ejudge_proxy.ejudge_sessions', self.manager):
+            return submit(run_file=b'source', contest_id=1, prob_id=2, lang_id=3,
+                          login='login', password='password',
+                          filename='common_filename', url=URL)
+
+    def test_session_reused(self):
+        self.http.post.side_effect = [
+            make_response('SID="sid";'),
+            make_response('{"run_id": 1}'),
+            make_response('{"run_id": 2}'),
+        ]
+
+        self.assertEqual(self.send_submit()['run_id'], 1)
+        self.assertEqual(self.send_submit()['run_id'], 2)
+
+        self.assertEqual(self.http.post.call_count, 3)
+        submit_call = self.http.post.call_args_list[2]
+        self.assertEqual(submit_call[1]['data']['SID'], 'sid')
+        self.assertEqual(submit_call[1]['cookies'], {'EJSID': 'cookie'})
+
+    def test_expired_session_renewed(self):
+        self.http.post.side_effect = [
+            make_response('SID="old";'),
+            make_response('<html>Invalid session</html>'),
+            make_response('SID="new";'),
+            make_response('{"run_id": 1}'),
+        ]
+
+        self.assertEqual(self.send_submit()['run_id'], 1)
+        self.assertEqual(self.http.post.call_args_list[3][1]['data']['SID'], 'new')
+
+    def test_known_error_does_not_renew_session(self):
+        self.http.post.side_effect = [
+            make_response('SID="sid";'),
+            make_response('{"error_code": 82}'),
+        ]
+
+        self.assertEqual(self.send_submit()['code'], 82)
+        self.assertEqual(self.http.post.call_count, 2)
+
+    def test_unknown_error_does_not_renew_session(self):
+        self.http.post.side_effect = [
+            make_response('SID="sid";'),
+            make_response('{"error_code": 3}'),
+        ]
+
+        result = self.send_submit()
+        self.assertIsNone(result['code'])
+        self.assertIn('(3)', result['message'])
+        self.assertEqual(self.http.post.call_count, 2)
+
+    def test_permission_denied_renews_session(self):
+        self.http.post.side_effect = [
+            make_response('SID="old";'),
+            make_response('{"error_code": -28}'),
+            make_response('SID="new";'),
+            make_response('{"run_id": 1}'),
+        ]
+
+        self.assertEqual(self.send_submit()['run_id'], 1)
+
+    def test_login_failed(self):
+        self.http.post.return_value = make_response('<html>Wrong password</html>')
+
+        self.assertIsNone(self.send_submit()['code'])
+        self.assertEqual(self.http.post.call_count, 1)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from rmatics.ejudge.serve_cfg import PROBLEM_FIELDS, ServeCfg, load_serve_cfg, parse_serve_cfg
+from rmatics.ejudge.serve_internal import EjudgeContestCfg
+
+CONTEST_ID = 1
+
+SERVE_CFG = '''# -*- coding: utf-8 -*-
+contest_id = 1
+test_dir = "../tests"
+advanced_layout
+
+[language]
+id = 1
+short_name = "gcc"
+
+[problem]
+abstract
+short_name = "Generic"
+test_pat = "%02d"
+corr_pat = "%02d.a"
+time_limit = 1
+max_vm_size = 64M
+
+[problem]
+super = "Generic"
+short_name = "A"
+internal_name = "a"
+long_name = "Problem A"
+time_limit_millis = 2500
+
+[problem]
+id = 5
+super = "Generic"
+short_name = "B"
+type = "output-only"
+test_pat = "%03d.in"
+max_vm_size = 256M
+'''
+
+
+class TestEjudge__serve_cfg(TestCase):
+    def setUp(self):
+        self.home_judges = tempfile.mkdtemp() + '/'
+        patcher = patch('rmatics.ejudge.serve_internal.HOME_JUDGES', self.home_judges)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.home_judges)
+
+        conf_dir = os.path.join(self.home_judges, f'{CONTEST_ID:06d}', 'conf')
+        os.makedirs(conf_dir)
+        self.path = os.path.join(conf_dir, 'serve.cfg')
+        with open(self.path, 'w') as file:
+            file.write(SERVE_CFG)
+
+    def assertSameProblems(self, config, expected):
+        self.assertEqual(config.advanced_layout, expected.advanced_layout)
+        self.assertEqual(config.test_dir, expected.test_dir)
+        self.assertEqual(list(config.problems), list(expected.problems))
+        for problem_id, problem in expected.problems.items():
+            for field in PROBLEM_FIELDS:
+                if field == 'abstract':
+                    continue
+                self.assertEqual(getattr(config.getProblem(problem_id), field),
+                                 getattr(problem, field, None), field)
+
+    def test_parse_serve_cfg(self):
+        sections = parse_serve_cfg(SERVE_CFG.splitlines())
+
+        self.assertEqual([name for name, _ in sections], ['default', 'language', 'problem', 'problem', 'problem'])
+        self.assertEqual(sections[0][1]['test_dir'], ['"../tests"'])
+        self.assertIsNone(sections[0][1]['advanced_layout'])
+
+    def test_same_as_ejudge_contest_cfg(self):
+        config = load_serve_cfg(CONTEST_ID)
+
+        self.assertSameProblems(config, EjudgeContestCfg(number=CONTEST_ID))
+        problem = config.getProblem(5)
+        self.assertTrue(problem.output_only)
+        self.assertEqual(problem.time_limit, 1)
+        self.assertEqual(problem.memory_limit, 256 * 1024 * 1024)
+        self.assertEqual(config.getProblem(1).time_limit, 2.5)
+
+    def test_snapshot(self):
+        snapshot_dir = os.path.join(self.home_judges, 'snapshots')
+        config = load_serve_cfg(CONTEST_ID, snapshot_dir=snapshot_dir)
+
+        with patch.object(ServeCfg, 'parse') as parse:
+            from_snapshot = load_serve_cfg(CONTEST_ID, snapshot_dir=snapshot_dir)
+        parse.assert_not_called()
+        self.assertSameProblems(from_snapshot, config)
+
+    def test_snapshot_of_changed_config_is_ignored(self):
+        snapshot_dir = os.path.join(self.home_judges, 'snapshots')
+        os.utime(self.path, (time.time() - 10, time.time() - 10))
+        load_serve_cfg(CONTEST_ID, snapshot_dir=snapshot_dir)
+
+        with open(self.path, 'w') as file:
+            file.write(SERVE_CFG.replace('time_limit_millis = 2500', 'time_limit_millis = 500'))
+
+        self.assertEqual(load_serve_cfg(CONTEST_ID, snapshot_dir=snapshot_dir).getProblem(1).time_limit, 0.5)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from rmatics.ejudge.serve_internal import EjudgeContestCfgRegistry
+
+SERVE_CFG = '''contest_id = {contest_id}
+test_dir = "../tests"
+
+[problem]
+short_name = "A"
+test_dir = "A"
+test_pat = "%02d"
+corr_pat = "%02d.a"
+time_limit = {time_limit}
+'''
+
+
+class TestEjudge__contest_cfg_registry(TestCase):
+    def setUp(self):
+        self.home_judges = tempfile.mkdtemp() + '/'
+        patcher = patch('rmatics.ejudge.serve_internal.HOME_JUDGES', self.home_judges)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.home_judges)
+
+        self.registry = EjudgeContestCfgRegistry(max_size=2)
+
+    def write_cfg(self, contest_id, time_limit=1, mtime=None):
+        conf_dir = os.path.join(self.home_judges, f'{contest_id:06d}', 'conf')
+        os.makedirs(conf_dir, exist_ok=True)
+        path = os.path.join(conf_dir, 'serve.cfg')
+        with open(path, 'w') as file:
+            file.write(SERVE_CFG.format(contest_id=contest_id, time_limit=time_limit))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_config_is_parsed_once(self):
+        self.write_cfg(1)
+
+        conf = self.registry.get(1)
+        self.assertIs(self.registry.get('1'), conf)
+        self.assertEqual(conf.getProblem(1).time_limit, 1)
+
+    def test_changed_config_is_reparsed(self):
+        self.write_cfg(1, time_limit=1, mtime=time.time() - 10)
+        self.assertEqual(self.registry.get(1).getProblem(1).time_limit, 1)
+
+        self.write_cfg(1, time_limit=2)
+        self.assertEqual(self.registry.get(1).getProblem(1).time_limit, 2)
+
+    def test_size_is_bounded(self):
+        for contest_id in (1, 2, 3):
+            self.write_cfg(contest_id)
+
+        first = self.registry.get(1)
+        self.registry.get(2)
+        self.registry.get(3)
+
+        self.assertIsNot(self.registry.get(1), first)
+
+    def test_missing_config(self):
+        with self.assertRaises(IOError):
+            self.registry.get(1)
+
+    def test_preload(self):
+        self.write_cfg(1)
+        self.write_cfg(2)
+
+        self.assertEqual(self.registry.preload([1, 2, 3]), 2)
@@ -0,0 +1,62 @@
+import time
+from collections import Counter
+
+from rmatics.ejudge.submit_queue.lanes import (
+    CONTEST_LANE,
+    get_submit_lane,
+    LaneScheduler,
+    parse_lane_weights,
+    PRACTICE_LANE,
+    REJUDGE_LANE,
+)
+from rmatics.ejudge.submit_queue.queue import SubmitQueue
+from rmatics.model.base import db
+from rmatics.testutils import TestCase
+
+EJUDGE_URL = 'ejudge-url'
+
+
+class TestEjudge__submit_queue_lanes(TestCase):
+    def setUp(self):
+        super(TestEjudge__submit_queue_lanes, self).setUp()
+        self.create_statements()
+
+    def test_scheduler_weights(self):
+        scheduler = LaneScheduler({CONTEST_LANE: 6, PRACTICE_LANE: 3, REJUDGE_LANE: 1})
+        first_lanes = Counter(scheduler.order()[0] for _ in range(10))
+        self.assertEqual(first_lanes, {CONTEST_LANE: 6, PRACTICE_LANE: 3, REJUDGE_LANE: 1})
+
+    def test_scheduler_order_has_all_lanes(self):
+        order = LaneScheduler().order()
+        self.assertEqual(sorted(order), sorted([CONTEST_LANE, PRACTICE_LANE, REJUDGE_LANE]))
+
+    def test_parse_lane_weights(self):
+        weights = parse_lane_weights('contest:10, rejudge:2')
+        self.assertEqual(weights, {CONTEST_LANE: 10, PRACTICE_LANE: 3, REJUDGE_LANE: 2})
+        with self.assertRaises(ValueError):
+            parse_lane_weights('unknown:1')
+
+    def test_get_submit_lane(self):
+        statement = self.statements[0]
+        self.assertEqual(get_submit_lane(None), PRACTICE_LANE)
+        self.assertEqual(get_submit_lane(statement.id), PRACTICE_LANE)
+
+        statement.olympiad = True
+        statement.time_start = int(time.time()) - 60
+        statement.time_stop = int(time.time()) + 60
+        db.session.commit()
+        self.assertEqual(get_submit_lane(statement.id), CONTEST_LANE)
+
+    def test_queue_takes_rejudge_after_contest(self):
+        queue = SubmitQueue(key='test.submit.queue',
+                            lane_weights={CONTEST_LANE: 1, PRACTICE_LANE: 0, REJUDGE_LANE: 0})
+        rejudge = queue.submit(1, EJUDGE_URL, lane=REJUDGE_LANE)
+        contest = queue.submit(2, EJUDGE_URL, lane=CONTEST_LANE)
+        self.assertEqual(queue.depths(), {CONTEST_LANE: 1, PRACTICE_LANE: 0, REJUDGE_LANE: 1})
+
+        self.assertEqual(queue.get(timeout=1).id, contest.id)
+        submit = queue.get(timeout=1)
+        self.assertEqual(submit.id, rejudge.id)
+        self.assertEqual(submit.lane, REJUDGE_LANE)
+        # Earlier submit taken later does not move last get id back
+        self.assertEqual(queue.get_last_get_id(), contest.id)
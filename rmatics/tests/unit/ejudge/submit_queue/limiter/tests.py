@@ -0,0 +1,38 @@
+from rmatics.ejudge.submit_queue.limiter import SubmitConcurrencyLimiter
+from rmatics.ejudge.submit_queue.submit import Submit
+from rmatics.testutils import TestCase
+
+EJUDGE_URL = 'ejudge-url'
+
+
+class TestEjudge__submit_queue_limiter(TestCase):
+    def setUp(self):
+        super(TestEjudge__submit_queue_limiter, self).setUp()
+        self.limiter = SubmitConcurrencyLimiter(contest_limit=1, url_limit=2)
+
+    def submit(self, ejudge_contest_id):
+        return Submit(id=None, run_id=1, ejudge_url=EJUDGE_URL, ejudge_contest_id=ejudge_contest_id)
+
+    def test_contest_limit(self):
+        lease = self.limiter.acquire(self.submit(1))
+        self.assertIsNotNone(lease)
+        self.assertIsNone(self.limiter.acquire(self.submit(1)))
+
+        self.limiter.release(lease)
+        self.assertIsNotNone(self.limiter.acquire(self.submit(1)))
+
+    def test_url_limit(self):
+        self.assertIsNotNone(self.limiter.acquire(self.submit(1)))
+        self.assertIsNotNone(self.limiter.acquire(self.submit(2)))
+        self.assertIsNone(self.limiter.acquire(self.submit(3)))
+
+    def test_failed_acquire_takes_no_slots(self):
+        self.assertIsNotNone(self.limiter.acquire(self.submit(1)))
+        self.assertIsNone(self.limiter.acquire(self.submit(1)))
+        # url scope still has one free slot
+        self.assertIsNotNone(self.limiter.acquire(self.submit(2)))
+
+    def test_expired_lease(self):
+        self.limiter.lease_timeout = -1
+        self.assertIsNotNone(self.limiter.acquire(self.submit(1)))
+        self.assertIsNotNone(self.limiter.acquire(self.submit(1)))
@@ -0,0 +1,61 @@
+from rmatics.ejudge.submit_queue.stream_queue import StreamSubmitQueue
+from rmatics.model.base import redis
+from rmatics.testutils import TestCase
+
+EJUDGE_URL = 'ejudge-url'
+
+
+class TestEjudge__submit_queue_stream_queue(TestCase):
+    def setUp(self):
+        super(TestEjudge__submit_queue_stream_queue, self).setUp()
+        self.queue = StreamSubmitQueue(key='test.submit.queue')
+
+    def test_submit_and_get(self):
+        first = self.queue.submit(1, EJUDGE_URL, ejudge_contest_id=10)
+        second = self.queue.submit(2, EJUDGE_URL)
+
+        submit = self.queue.get(timeout=1)
+        self.assertEqual(submit.id, first.id)
+        self.assertEqual(submit.run_id, 1)
+        self.assertEqual(submit.ejudge_contest_id, 10)
+        self.assertEqual(self.queue.get(timeout=1).id, second.id)
+        self.assertEqual(self.queue.get_last_get_id(), second.id)
+
+    def test_empty(self):
+        self.assertIsNone(self.queue.get(timeout=0.1))
+
+    def test_only_taken_submits_are_read(self):
+        for run_id in range(3):
+            self.queue.submit(run_id, EJUDGE_URL)
+
+        self.queue.get(timeout=1)
+        # Submits which are not read can't be claimed and sent by another consumer
+        pending = redis.execute_command('XPENDING', self.queue.stream_key(), self.queue.group)
+        self.assertEqual(pending[0], 1)
+
+        self.assertEqual(len(self.queue.get_many(5, timeout=1)), 2)
+
+    def test_ack(self):
+        self.queue.submit(1, EJUDGE_URL)
+        submit = self.queue.get(timeout=1)
+        self.assertEqual(self.queue.depth(), 1)
+
+        self.queue.ack(submit)
+        self.assertEqual(self.queue.depth(), 0)
+
+    def test_put_back(self):
+        self.queue.submit(1, EJUDGE_URL)
+        submit = self.queue.get(timeout=1)
+
+        self.queue.put_back(submit)
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertEqual(self.queue.get(timeout=1).id, submit.id)
+
+    def test_pending_submit_is_claimed(self):
+        self.queue.submit(1, EJUDGE_URL)
+        lost = self.queue.get(timeout=1)
+
+        # Another process with the same group
+        queue = StreamSubmitQueue(key='test.submit.queue', claim_idle=0)
+        submit = queue.get(timeout=0.1)
+        self.assertEqual(submit.id, lost.id)
@@ -0,0 +1,117 @@
+import mock
+
+from rmatics import centrifugo_client
+from rmatics.ejudge.submit_queue.submit import Submit
+from rmatics.ejudge.submit_queue.worker import BatchSubmitWorker
+from rmatics.model.base import db
+from rmatics.model.run import Run
+from rmatics.testutils import TestCase
+from rmatics.utils.run import EjudgeStatuses
+
+EJUDGE_URL = 'ejudge-url'
+
+
+class TestEjudge__submit_queue_submit_send_many(TestCase):
+    def setUp(self):
+        super(TestEjudge__submit_queue_submit_send_many, self).setUp()
+        self.create_users()
+        self.create_ejudge_problems()
+        self.create_runs()
+        for run in self.runs:
+            run.ejudge_status = EjudgeStatuses.COMPILING.value
+        db.session.commit()
+        for run in self.runs:
+            run.update_source(b'source')
+
+    def submits(self):
+        return [Submit(id=i, run_id=run.id, ejudge_url=EJUDGE_URL) for i, run in enumerate(self.runs)]
+
+    @mock.patch('rmatics.ejudge.submit_queue.submit.submit')
+    def test_simple(self, submit_method):
+        submit_method.side_effect = lambda **kwargs: {'code': 0, 'run_id': 100}
+
+        Submit.send_many(self.submits())
+
+        self.assertEqual(submit_method.call_count, len(self.runs))
+        self.assertEqual({call[1]['run_file'] for call in submit_method.call_args_list}, {b'source'})
+        for run in self.runs:
+            db.session.refresh(run)
+            self.assertEqual(run.ejudge_run_id, 100)
+            self.assertEqual(run.ejudge_url, EJUDGE_URL)
+
+    @mock.patch('rmatics.ejudge.submit_queue.submit.submit')
+    def test_errors(self, submit_method):
+        failed_run, error_run, _ = self.runs
+        sources = {run.id: f'source {run.id}'.encode() for run in self.runs}
+        responses = {
+            sources[failed_run.id]: Exception('Connection error'),
+            sources[error_run.id]: {'code': 105, 'message': 'Error submitting source'},
+        }
+
+        def ejudge_submit(run_file, **__):
+            response = responses.get(run_file, {'code': 0, 'run_id': 100})
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        submit_method.side_effect = ejudge_submit
+        with mock.patch.object(Run, 'get_sources', return_value=sources):
+            Submit.send_many(self.submits())
+
+        db.session.refresh(failed_run)
+        db.session.refresh(error_run)
+        self.assertIsNone(failed_run.ejudge_url)
+        self.assertEqual(error_run.ejudge_status, EjudgeStatuses.RMATICS_SUBMIT_ERROR.value)
+        self.assertEqual(error_run.protocol['compiler_output'], 'Error submitting source')
+
+    @mock.patch('rmatics.ejudge.submit_queue.submit.submit')
+    def test_run_update_error_does_not_affect_others(self, submit_method):
+        submit_method.side_effect = lambda **kwargs: {'code': 0, 'run_id': 100}
+        broken_run = self.runs[0]
+        add_info = Submit._add_info_from_ejudge
+
+        def add_info_from_ejudge(submit, run, *args, **kwargs):
+            if run.id == broken_run.id:
+                raise RuntimeError('Cannot update run')
+            return add_info(submit, run, *args, **kwargs)
+
+        with mock.patch.object(Submit, '_add_info_from_ejudge', add_info_from_ejudge):
+            Submit.send_many(self.submits())
+
+        for run in self.runs:
+            db.session.refresh(run)
+        self.assertIsNone(broken_run.ejudge_run_id)
+        for run in self.runs[1:]:
+            self.assertEqual(run.ejudge_run_id, 100)
+
+    @mock.patch('rmatics.ejudge.submit_queue.submit.submit')
+    def test_run_updates_are_published_with_user(self, submit_method):
+        submit_method.return_value = {'code': 0, 'run_id': 100}
+        db.session.expire_all()
+
+        with mock.patch.object(centrifugo_client, 'publisher') as publisher:
+            Submit.send_many(self.submits())
+
+        self.assertEqual(publisher.publish.call_count, len(self.runs))
+        for call, run in zip(publisher.publish.call_args_list, self.runs):
+            channel, run_id, data = call[0]
+            self.assertEqual(channel, f'problem.{run.problem_id}')
+            self.assertEqual(run_id, run.id)
+            self.assertEqual(data['run']['user'], {
+                'id': run.user.id,
+                'firstname': run.user.firstname,
+                'lastname': run.user.lastname,
+            })
+
+    @mock.patch('rmatics.ejudge.submit_queue.submit.submit')
+    def test_batch_worker(self, submit_method):
+        submit_method.return_value = {'code': 0, 'run_id': 100}
+        queue_mock = mock.Mock()
+        queue_mock.get_many.return_value = self.submits()
+
+        worker = BatchSubmitWorker(queue_mock, batch_size=3)
+        worker.handle_submit()
+
+        queue_mock.get_many.assert_called_once_with(3, timeout=0)
+        self.assertEqual(submit_method.call_count, len(self.runs))
+        self.assertEqual(queue_mock.ack.call_count, len(self.runs))
@@ -86,3 +86,32 @@ class TestEjudge__submit_queue_submit_worker_handle_submit(TestCase):
         db.session.refresh(run)
         assert run.protocol['run_id'] == run.id
         assert run.protocol['compiler_output'] == EJUDGE_RESPONSE_MESSAGE
+
+    def test_limited_submit_is_put_back(self):
+        limiter_mock = mock.Mock()
+        limiter_mock.acquire.return_value = None
+
+        worker = SubmitWorker(self.queue_mock, limiter=limiter_mock)
+        with mock.patch('rmatics.ejudge.submit_queue.worker.sleep'):
+            worker.handle_submit()
+
+        self.queue_mock.put_back.assert_called_once_with(self.submit_mock)
+        self.submit_mock.send.assert_not_called()
+
+    def test_lease_is_released(self):
+        self.submit_mock.send.side_effect = lambda **__: 1 / 0
+        limiter_mock = mock.Mock()
+
+        worker = SubmitWorker(self.queue_mock, limiter=limiter_mock)
+        worker.handle_submit()
+
+        self.submit_mock.send.assert_called_once()
+        limiter_mock.release.assert_called_once_with(limiter_mock.acquire.return_value)
+
+    def test_empty_queue(self):
+        self.queue_mock.get.return_value = None
+
+        worker = SubmitWorker(self.queue_mock, get_timeout=1)
+        worker.handle_submit()
+
+        self.queue_mock.get.assert_called_once_with(timeout=1)
@@ -0,0 +1,92 @@
+from rmatics.model.base import mongo
+from rmatics.model.source_store import SourceStore, source_hash
+from rmatics.testutils import TestCase
+
+
+class TestModel__source_store(TestCase):
+    def setUp(self):
+        super(TestModel__source_store, self).setUp()
+        self.store = SourceStore()
+        self.store.init_app(compression='zlib', enabled=True)
+
+    def test_same_source_is_stored_once(self):
+        self.store.put(1, b'print(1)')
+        self.store.put(2, b'print(1)')
+        self.store.put(3, b'print(2)')
+
+        self.assertEqual(mongo.db.source_blob.count_documents({}), 2)
+        self.assertEqual(self.store.get_many([1, 2, 3, 4]), {
+            1: b'print(1)',
+            2: b'print(1)',
+            3: b'print(2)',
+        })
+
+    def test_blob_is_compressed(self):
+        blob = b'a' * 1000
+        self.store.put(1, blob)
+
+        stored = mongo.db.source_blob.find_one({'_id': source_hash(blob)})
+        self.assertEqual(stored['compression'], 'zlib')
+        self.assertLess(len(stored['blob']), len(blob))
+        self.assertEqual(self.store.get(1), blob)
+
+    def test_remove_keeps_shared_blob(self):
+        self.store.put(1, b'source')
+        self.store.put(2, b'source')
+        self.store.remove(1)
+
+        self.assertIsNone(self.store.get(1))
+        self.assertEqual(self.store.get(2), b'source')
+
+    def test_migrate(self):
+        mongo.db.source.insert_many([
+            {'run_id': 1, 'blob': b'source'},
+            {'run_id': 2, 'blob': b'source'},
+            {'run_id': 3, 'blob': b'other'},
+        ])
+        # Legacy documents are readable before migration
+        self.assertEqual(self.store.get(1), b'source')
+
+        self.assertEqual(self.store.migrate(batch_size=2), 3)
+
+        self.assertEqual(self.store.stats(), {'runs': 3, 'legacy': 0, 'blobs': 2})
+        self.assertEqual(self.store.get_many([1, 2, 3]), {1: b'source', 2: b'source', 3: b'other'})
+
+    def test_disabled_store_writes_legacy_documents(self):
+        self.store.enabled = False
+        self.store.put(1, b'source')
+
+        self.assertEqual(mongo.db.source.find_one({'run_id': 1})['blob'], b'source')
+        self.assertEqual(self.store.get(1), b'source')
+
+    def test_encoding_is_detected_once(self):
+        blob = 'привет'.encode('cp1251')
+        self.store.put(1, blob)
+
+        stored = mongo.db.source_blob.find_one({'_id': source_hash(blob)})
+        self.assertEqual(stored['encoding'], 'cp1251')
+        self.assertEqual(self.store.get_text(1), 'привет')
+        self.assertEqual(self.store.get(1), blob)
+
+    def test_koi8r_encoding_is_detected(self):
+        blob = '# привет мир\nprint(1)'.encode('koi8-r')
+        self.store.put(1, blob)
+
+        stored = mongo.db.source_blob.find_one({'_id': source_hash(blob)})
+        self.assertEqual(stored['encoding'], 'koi8-r')
+        self.assertEqual(self.store.get_text(1), '# привет мир\nprint(1)')
+
+    def test_utf8_text_is_not_copied(self):
+        blob = 'привет'.encode('utf-8')
+        self.store.put(1, blob)
+
+        stored = mongo.db.source_blob.find_one({'_id': source_hash(blob)})
+        self.assertEqual(stored['encoding'], 'utf-8')
+        self.assertNotIn('text', stored)
+        self.assertEqual(self.store.get_text(1), 'привет')
+
+    def test_text_of_legacy_document(self):
+        mongo.db.source.insert_one({'run_id': 1, 'blob': 'привет'.encode('cp1251')})
+
+        self.assertEqual(self.store.get_text(1), 'привет')
+        self.assertIsNone(self.store.get_text(2))
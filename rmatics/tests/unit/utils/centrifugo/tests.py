@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from cent import CentException
+from mock import MagicMock, call
+
+from rmatics.utils.centrifugo import CentrifugoPublisher
+
+
+class TestUtils__centrifugo_publisher(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.publisher = CentrifugoPublisher(self.client, batch_size=2, max_pending=3)
+        # Greenlet is not needed, flush is called explicitly
+        self.publisher._greenlet = MagicMock(dead=False)
+
+    def test_updates_of_run_are_coalesced(self):
+        self.publisher.publish('problem.1', 1, {'status': 98})
+        self.publisher.publish('problem.1', 1, {'status': 0})
+        self.publisher.publish('problem.1', 2, {'status': 0})
+
+        self.publisher.flush()
+
+        self.assertEqual(self.client.add.call_args_list, [
+            call('publish', {'channel': 'problem.1', 'data': {'status': 0}}),
+            call('publish', {'channel': 'problem.1', 'data': {'status': 0}}),
+        ])
+        self.assertEqual(self.client.send.call_count, 1)
+        self.assertEqual(self.publisher.stats(), {'published': 2, 'coalesced': 1, 'dropped': 0,
+                                                  'delayed': 0, 'failed': 0, 'pending': 0})
+
+    def test_batches(self):
+        for run_id in range(3):
+            self.publisher.publish('problem.1', run_id, {})
+
+        self.publisher.flush()
+
+        self.assertEqual(self.client.send.call_count, 2)
+        self.assertEqual(self.publisher.stats()['published'], 3)
+
+    def test_dropped_when_full(self):
+        for run_id in range(4):
+            self.publisher.publish('problem.1', run_id, {})
+
+        self.assertEqual(self.publisher.stats()['dropped'], 1)
+        self.assertEqual(self.publisher.stats()['pending'], 3)
+
+    def test_failed(self):
+        self.client.send.side_effect = CentException('error')
+        self.publisher.publish('problem.1', 1, {})
+
+        self.publisher.flush()
+
+        self.assertEqual(self.publisher.stats()['failed'], 1)
+        self.assertEqual(self.publisher.stats()['pending'], 0)
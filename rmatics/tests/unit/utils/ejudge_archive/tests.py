@@ -0,0 +1,65 @@
+import io
+import os
+import struct
+import tempfile
+import zlib
+from unittest import TestCase
+
+from rmatics.utils.ejudge_archive import EjudgeArchiveReader, VersionError, get_archive_reader
+
+
+def build_archive(files: dict, version=1) -> bytes:
+    data = struct.pack(EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT, b'Ej. Ar.', version, b'')
+    for name, content in files.items():
+        compressed = zlib.compress(content) if content else b''
+        name = name.encode('ascii') + b'\x00'
+        header_size = struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT) + len(name)
+        data += struct.pack(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT,
+                            len(compressed), len(content), header_size, 0)
+        data += name + compressed
+        data += b'\x00' * (-len(data) % 16)
+    return data
+
+
+FILES = {
+    '000001.o': b'1 2 3\n',
+    '000002.o': b'x' * 100000,
+    '000002.e': b'',
+}
+
+
+class TestEjudgeArchiveReader(TestCase):
+    def setUp(self):
+        self.reader = EjudgeArchiveReader(io.BytesIO(build_archive(FILES)))
+
+    def test_getfile(self):
+        self.assertEqual(set(self.reader.namelist()), set(FILES))
+        for name, content in FILES.items():
+            self.assertEqual(self.reader.getfile(name), content)
+
+    def test_getsize(self):
+        for name, content in FILES.items():
+            self.assertEqual(self.reader.getsize(name), len(content))
+
+    def test_read_prefix(self):
+        self.assertEqual(self.reader.read_prefix('000002.o', 255), b'x' * 255)
+        self.assertEqual(self.reader.read_prefix('000001.o', 255), b'1 2 3\n')
+        self.assertEqual(self.reader.read_prefix('000002.e', 255), b'')
+
+    def test_missing_file(self):
+        with self.assertRaises(KeyError):
+            self.reader.getfile('000003.o')
+
+    def test_version(self):
+        with self.assertRaises(VersionError):
+            EjudgeArchiveReader(io.BytesIO(build_archive(FILES, version=2)))
+
+    def test_cached_reader_of_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive')
+            with open(path, 'wb') as file:
+                file.write(build_archive(FILES))
+
+            reader = get_archive_reader(path)
+            self.assertIs(get_archive_reader(path), reader)
+            self.assertEqual(reader.getfile('000001.o'), b'1 2 3\n')
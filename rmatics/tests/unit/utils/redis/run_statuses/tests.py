@@ -0,0 +1,92 @@
+import datetime
+import time
+
+from mock import patch
+
+from rmatics.model.base import redis
+from rmatics.testutils import TestCase
+from rmatics.utils.redis.run_statuses import TransientRunStatuses
+from rmatics.utils.run import EjudgeStatuses
+
+PROBLEM_ID = 1
+
+
+class TestUtils__transient_run_statuses(TestCase):
+    def setUp(self):
+        super(TestUtils__transient_run_statuses, self).setUp()
+        self.statuses = TransientRunStatuses(prefix='test_run_statuses')
+        self.statuses.init_app(redis, ttl=60, enabled=True)
+
+    def running(self, test_num, last_change_time=None):
+        return {
+            'ejudge_status': EjudgeStatuses.RUNNING.value,
+            'ejudge_test_num': test_num,
+            'ejudge_score': None,
+            'ejudge_last_change_time': last_change_time,
+        }
+
+    def test_is_transient(self):
+        self.assertTrue(self.statuses.is_transient(EjudgeStatuses.RUNNING.value))
+        self.assertTrue(self.statuses.is_transient(EjudgeStatuses.COMPILING.value))
+        self.assertFalse(self.statuses.is_transient(EjudgeStatuses.OK.value))
+
+        self.statuses.enabled = False
+        self.assertFalse(self.statuses.is_transient(EjudgeStatuses.RUNNING.value))
+
+    def test_set_and_get(self):
+        self.statuses.set(PROBLEM_ID, 1, self.running(1))
+        self.statuses.set(PROBLEM_ID, 1, self.running(2))
+        self.statuses.set(PROBLEM_ID, 2, self.running(1))
+
+        self.assertEqual(self.statuses.get_by_problems([PROBLEM_ID, 2]), {
+            PROBLEM_ID: {
+                1: {'ejudge_status': EjudgeStatuses.RUNNING.value, 'ejudge_test_num': 2},
+                2: {'ejudge_status': EjudgeStatuses.RUNNING.value, 'ejudge_test_num': 1},
+            },
+            2: {},
+        })
+        self.assertEqual(list(self.statuses.get_by_runs([(PROBLEM_ID, 2), (PROBLEM_ID, 3)])), [2])
+
+    def test_drop_many(self):
+        self.statuses.set_many([(PROBLEM_ID, 1, self.running(1)), (PROBLEM_ID, 2, self.running(1))])
+        self.statuses.drop_many([(PROBLEM_ID, 1, None)])
+
+        self.assertEqual(list(self.statuses.get_by_problems([PROBLEM_ID])[PROBLEM_ID]), [2])
+
+    def test_late_transient_status_is_ignored(self):
+        changed_at = datetime.datetime(2020, 1, 1, 10, 0, 0)
+        self.statuses.drop_many([(PROBLEM_ID, 1, changed_at)])
+        self.statuses.set(PROBLEM_ID, 1, self.running(1, changed_at - datetime.timedelta(seconds=1)))
+        self.statuses.set(PROBLEM_ID, 1, self.running(2))
+
+        self.assertEqual(self.statuses.get_by_problems([PROBLEM_ID]), {PROBLEM_ID: {}})
+
+        # Run is rejudged
+        self.statuses.set(PROBLEM_ID, 1, self.running(3, changed_at + datetime.timedelta(seconds=1)))
+        self.assertEqual(self.statuses.get_by_problems([PROBLEM_ID])[PROBLEM_ID][1]['ejudge_test_num'], 3)
+
+    def test_older_transient_status_is_ignored(self):
+        changed_at = datetime.datetime(2020, 1, 1, 10, 0, 0)
+        self.statuses.set(PROBLEM_ID, 1, self.running(2, changed_at))
+        self.statuses.set(PROBLEM_ID, 1, self.running(1, changed_at - datetime.timedelta(seconds=1)))
+
+        self.assertEqual(self.statuses.get_by_problems([PROBLEM_ID])[PROBLEM_ID][1]['ejudge_test_num'], 2)
+
+    def test_expired_entries_are_ignored(self):
+        self.statuses.set(PROBLEM_ID, 1, self.running(1))
+        with patch('rmatics.utils.redis.run_statuses.time.time', return_value=time.time() + 61):
+            self.assertEqual(self.statuses.get_by_problems([PROBLEM_ID]), {PROBLEM_ID: {}})
+        self.assertEqual(redis.hlen(self.statuses._key(PROBLEM_ID)), 0)
+
+    def test_apply(self):
+        runs = [{'id': 1, 'ejudge_status': EjudgeStatuses.COMPILING.value, 'ejudge_test_num': 0},
+                {'id': 2, 'ejudge_status': EjudgeStatuses.OK.value, 'ejudge_test_num': 10}]
+
+        result = self.statuses.apply(runs, {1: {'ejudge_status': EjudgeStatuses.RUNNING.value,
+                                                'ejudge_test_num': 3}})
+
+        self.assertEqual(result[0]['ejudge_status'], EjudgeStatuses.RUNNING.value)
+        self.assertEqual(result[0]['ejudge_test_num'], 3)
+        self.assertIs(result[1], runs[1])
+        # Cached runs are not mutated
+        self.assertEqual(runs[0]['ejudge_status'], EjudgeStatuses.COMPILING.value)
@@ -0,0 +1,88 @@
+import os
+import tempfile
+
+from mock import patch
+
+from rmatics.model.base import redis
+from rmatics.testutils import TestCase
+from rmatics.utils.redis.sample_tests import SampleTestsCache
+
+
+class FakeProblem:
+    def __init__(self, tests_dir, sample_tests='1,2'):
+        self.id = 1
+        self.tests_dir = tests_dir
+        self.sample_tests = sample_tests
+
+    def path(self, test, ext):
+        return os.path.join(self.tests_dir, f'{int(test):02d}{ext}')
+
+    def get_sample_tests_files(self):
+        return [(test, self.path(test, ''), self.path(test, '.a')) for test in self.sample_tests.split(',')]
+
+    def get_test(self, test_num, size=255):
+        with open(self.path(test_num, '')) as file:
+            return file.read(size)
+
+    def get_corr(self, test_num, size=255):
+        with open(self.path(test_num, '.a')) as file:
+            return file.read(size)
+
+
+class TestUtils__sample_tests_cache(TestCase):
+    def setUp(self):
+        super(TestUtils__sample_tests_cache, self).setUp()
+        self.cache = SampleTestsCache(prefix='test_sample_tests')
+        self.cache.init_app(redis, ttl=60, enabled=True)
+
+        self.dir = tempfile.TemporaryDirectory()
+        self.problem = FakeProblem(self.dir.name)
+        for test in ('1', '2'):
+            self.write(self.problem.path(test, ''), f'{test} {test}\n')
+            self.write(self.problem.path(test, '.a'), f'{int(test) * 2}\n')
+
+    def tearDown(self):
+        self.dir.cleanup()
+        super(TestUtils__sample_tests_cache, self).tearDown()
+
+    @staticmethod
+    def write(path, data):
+        with open(path, 'w') as file:
+            file.write(data)
+
+    def test_get(self):
+        self.assertEqual(self.cache.get(self.problem), {
+            '1': {'input': '1 1\n', 'correct': '2\n'},
+            '2': {'input': '2 2\n', 'correct': '4\n'},
+        })
+
+    def test_files_are_read_once(self):
+        expected = self.cache.get(self.problem)
+        with patch.object(FakeProblem, 'get_test') as get_test_mock:
+            self.assertEqual(self.cache.get(self.problem), expected)
+            get_test_mock.assert_not_called()
+
+    def test_rebuilt_when_file_is_changed(self):
+        self.cache.get(self.problem)
+
+        path = self.problem.path('2', '.a')
+        self.write(path, '5\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(self.cache.get(self.problem)['2']['correct'], '5\n')
+
+    def test_rebuilt_when_samples_are_changed(self):
+        self.cache.get(self.problem)
+        self.problem.sample_tests = '1'
+        self.assertEqual(list(self.cache.get(self.problem)), ['1'])
+
+    def test_disabled(self):
+        self.cache.init_app(redis, enabled=False)
+        self.assertEqual(self.cache.get(self.problem)['1']['input'], '1 1\n')
+        self.assertIsNone(redis.get('test_sample_tests/1'))
+
+    def test_warm(self):
+        without_samples = FakeProblem(self.dir.name, sample_tests='')
+        self.assertEqual(self.cache.warm([self.problem, without_samples]), 1)
+        self.assertIsNotNone(redis.get('test_sample_tests/1'))
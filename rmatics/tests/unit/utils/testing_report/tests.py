@@ -0,0 +1,103 @@
+import gzip
+import os
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from rmatics.utils import testing_report
+from rmatics.utils.testing_report import get_testing_report, parse_testing_report, \
+    parse_testing_report_file
+
+REPORT = '''<?xml version="1.0" encoding="utf-8"?>
+<testing-report run-id="10" judge-id="1" status="WA" scoring="ACM" archive-available="yes" run-tests="2">
+  <host>judge-1</host>
+  <compiler_output>warning: unused variable</compiler_output>
+  <tests>
+    <test num="1" status="OK" time="15" real-time="30" max-memory-used="1024">
+      <input>1 2</input>
+      <output>3</output>
+      <correct>3</correct>
+    </test>
+    <test num="2" status="WA" time="bad" real-time="40" term-signal="11" exit-code="1">
+      <checker>wrong answer</checker>
+    </test>
+  </tests>
+</testing-report>
+'''
+
+
+class TestParseTestingReport(TestCase):
+    def test_parse(self):
+        report = parse_testing_report(REPORT)
+
+        self.assertEqual(report['tests_count'], 2)
+        self.assertEqual(report['test_count'], 2)
+        self.assertEqual(report['status_string'], 'WA')
+        self.assertEqual(report['host'], 'judge-1')
+        self.assertEqual(report['compiler_output'], 'warning: unused variable')
+        self.assertEqual(report['maxtime'], 40)
+
+        self.assertEqual(report['tests']['1'], {
+            'status': 'OK',
+            'string_status': 'OK',
+            'real_time': 30,
+            'time': 15,
+            'max_memory_used': '1024',
+        })
+        self.assertEqual(report['tests']['2']['time'], 0)
+        self.assertEqual(report['judge_tests_info']['1'], {
+            'input': '1 2', 'output': '3', 'correct': '3', 'stderr': '', 'checker': '',
+        })
+        self.assertEqual(report['judge_tests_info']['2']['checker'], 'wrong answer')
+        self.assertEqual(report['judge_tests_info']['2']['term-signal'], 11)
+        self.assertEqual(report['judge_tests_info']['2']['exit-code'], 1)
+
+    def test_parse_by_small_chunks(self):
+        with patch.object(testing_report, 'FEED_CHUNK_SIZE', 7):
+            report = parse_testing_report(REPORT)
+        self.assertEqual(report, parse_testing_report(REPORT))
+
+    def test_no_testing_report(self):
+        with self.assertRaises(ValueError):
+            parse_testing_report('<a></a>')
+
+
+class TestGetTestingReport(TestCase):
+    def setUp(self):
+        testing_report._get_cached_report.cache_clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, '000010')
+        path_patcher = patch.object(testing_report, 'submit_path', return_value=self.path)
+        path_patcher.start()
+        self.addCleanup(path_patcher.stop)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, report, gzipped=False):
+        data = ('Content-type: text/xml\n\n' + report).encode('utf-8')
+        with (gzip.open if gzipped else open)(self.path + ('.gz' if gzipped else ''), 'wb') as file:
+            file.write(data)
+
+    def test_no_file(self):
+        self.assertIsNone(get_testing_report(1, 10))
+
+    def test_gzipped(self):
+        self.write(REPORT, gzipped=True)
+        self.assertEqual(parse_testing_report_file(self.path + '.gz'), parse_testing_report(REPORT))
+
+    def test_cached_until_changed(self):
+        self.write(REPORT)
+        with patch.object(testing_report, 'parse_testing_report_file',
+                          wraps=parse_testing_report_file) as parse_mock:
+            report = get_testing_report(1, 10)
+            self.assertEqual(report['status_string'], 'WA')
+            self.assertIs(get_testing_report(1, 10), report)
+            parse_mock.assert_called_once()
+
+            self.write(REPORT.replace('status="WA" scoring', 'status="OK" scoring'))
+            stat = os.stat(self.path)
+            os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertEqual(get_testing_report(1, 10)['status_string'], 'OK')
+            self.assertEqual(parse_mock.call_count, 2)
@@ -0,0 +1,36 @@
+import json
+
+from mock import patch
+
+from rmatics.plugins import sample_tests_cache
+from rmatics.testutils import TestCase
+from rmatics.view.problem.serializers.problem import ProblemSchema
+
+
+class TestProblemSchema__sample_tests_json(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_ejudge_problems()
+        self.problem = self.ejudge_problems[0]
+
+    def dump_samples(self):
+        data, _ = ProblemSchema(only=['sample_tests_json']).dump(self.problem)
+        return data['sample_tests_json']
+
+    def test_without_samples(self):
+        self.problem.sample_tests = ''
+        self.problem.sample_tests_json = None
+
+        self.assertEqual(self.dump_samples(), json.dumps(None))
+
+    def test_samples_from_files_override_saved(self):
+        self.problem.sample_tests = '1'
+        self.problem.sample_tests_json = {'1': {'input': 'old', 'correct': 'old'},
+                                          '2': {'input': '2', 'correct': '2'}}
+        cached = {'1': {'input': '1', 'correct': '1'}}
+
+        with patch.object(sample_tests_cache, 'get', return_value=cached):
+            samples = json.loads(self.dump_samples())
+
+        self.assertEqual(samples, {'1': {'input': '1', 'correct': '1'},
+                                   '2': {'input': '2', 'correct': '2'}})
@@ -10,6 +10,7 @@ from flask import url_for
 from rmatics import monitor_cacher
 from rmatics.model.base import db, mongo
 from rmatics.model.run import Run
+from rmatics.plugins import monitor_runs_cacher
 from rmatics.testutils import TestCase
 from rmatics.utils.run import EjudgeStatuses
 from rmatics.view.problem.problem import TrustedSubmitApi
@@ -247,6 +248,24 @@ class TestUpdateSubmissionFromEjudge(TestCase):
 
         self.monitor_invalidate_mock.assert_called_once()
 
+    def test_update_mongo_with_incremental_monitor_cache(self):
+        mongo.db.protocol.insert_one({'_id': PROTOCOL_ID, 'run_id': 'OLD_ID'})
+
+        request_data = {
+            'run_id': self.run.ejudge_run_id,
+            'contest_id': self.run.ejudge_contest_id,
+            'mongo_protocol_id': str(PROTOCOL_ID),
+            'status': 0,
+        }
+
+        with patch.object(monitor_runs_cacher, 'enabled', True), \
+                patch.object(monitor_runs_cacher, 'patch') as patch_mock:
+            resp = self.send_request_to_update_run(**request_data)
+
+        self.assert200(resp)
+        self.monitor_invalidate_mock.assert_not_called()
+        patch_mock.assert_called_once()
+
     def test_bad_mongo_id(self):
         run_data = {
             'run_uuid': 'uuid',
@@ -359,3 +378,166 @@ class TestGetRunProtocol(TestCase):
 
         resp = self.send_request(run_id=self.run2.id, data=data)
         self.assert404(resp)
+
+    def insert_judged_protocol(self, run_id, tests_count=3):
+        mongo.db.protocol.insert_one({
+            'run_id': run_id,
+            'compiler_output': 'ok',
+            'tests': {
+                str(test_num): {'status': 'OK', 'time': 10, 'output': 'x' * 100}
+                for test_num in range(1, tests_count + 1)
+            },
+        })
+
+    def test_summary_view(self):
+        self.insert_judged_protocol(self.run1.id)
+        data = {'is_admin': True, 'view': 'summary'}
+
+        resp = self.send_request(run_id=self.run1.id, data=data)
+        self.assert200(resp)
+        self.assertEqual(resp.json['data']['compiler_output'], 'ok')
+        self.assertEqual(resp.json['data']['tests']['2']['status'], 'OK')
+        self.assertNotIn('output', resp.json['data']['tests']['2'])
+
+    def test_compiler_view(self):
+        self.insert_judged_protocol(self.run1.id)
+        data = {'is_admin': True, 'view': 'compiler'}
+
+        resp = self.send_request(run_id=self.run1.id, data=data)
+        self.assert200(resp)
+        self.assertEqual(resp.json['data'], {'run_id': self.run1.id, 'compiler_output': 'ok'})
+
+    def test_single_test(self):
+        self.insert_judged_protocol(self.run1.id)
+        data = {'is_admin': True, 'test': 2}
+
+        resp = self.send_request(run_id=self.run1.id, data=data)
+        self.assert200(resp)
+        self.assertEqual(list(resp.json['data']['tests']), ['2'])
+        self.assertEqual(resp.json['data']['tests']['2']['output'], 'x' * 100)
+
+    def test_tests_range(self):
+        self.insert_judged_protocol(self.run1.id, tests_count=5)
+        data = {'is_admin': True, 'tests_from': 2, 'tests_to': 4}
+
+        resp = self.send_request(run_id=self.run1.id, data=data)
+        self.assert200(resp)
+        self.assertEqual(sorted(resp.json['data']['tests']), ['2', '3', '4'])
+
+    def test_tests_view_requires_range(self):
+        self.insert_judged_protocol(self.run1.id)
+        data = {'is_admin': True, 'view': 'tests'}
+
+        resp = self.send_request(run_id=self.run1.id, data=data)
+        self.assert400(resp)
+
+
+class TestBulkUpdateRunsFromEjudge(TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.create_users()
+        self.create_ejudge_problems()
+
+        self.runs = [
+            Run(
+                user_id=self.users[i].id,
+                problem_id=self.ejudge_problems[0].id,
+                ejudge_contest_id=self.ejudge_problems[0].ejudge_contest_id,
+                ejudge_language_id=1,
+                ejudge_status=EjudgeStatuses.COMPILING.value,
+                ejudge_run_id=i + 1,
+            )
+            for i in range(2)
+        ]
+        db.session.add_all(self.runs)
+        db.session.commit()
+
+    def send_request(self, updates):
+        url = url_for('problem.bulk_update_from_ejudge')
+        return self.client.post(url, data=json.dumps(updates))
+
+    def test_simple(self):
+        first, second = self.runs
+        updates = [
+            {'run_id': first.ejudge_run_id, 'contest_id': first.ejudge_contest_id,
+             'status': 0, 'score': 100, 'test_num': 10},
+            {'run_id': second.ejudge_run_id, 'contest_id': second.ejudge_contest_id,
+             'status': 96},
+            {'run_id': 100500, 'contest_id': second.ejudge_contest_id, 'status': 0},
+        ]
+
+        resp = self.send_request(updates)
+        self.assert200(resp)
+        self.assertEqual(resp.json['data']['updated'], 2)
+        self.assertEqual(resp.json['data']['not_found'],
+                         [{'run_id': 100500, 'contest_id': second.ejudge_contest_id}])
+
+        db.session.refresh(first)
+        db.session.refresh(second)
+        self.assertEqual((first.ejudge_status, first.ejudge_score, first.ejudge_test_num), (0, 100, 10))
+        self.assertEqual(second.ejudge_status, 96)
+        self.assertIsNone(second.ejudge_score)
+
+    def test_lang_id(self):
+        first, second = self.runs
+        updates = [
+            {'run_id': first.ejudge_run_id, 'contest_id': first.ejudge_contest_id,
+             'status': 0, 'lang_id': 3},
+        ]
+
+        resp = self.send_request(updates)
+        self.assert200(resp)
+
+        db.session.refresh(first)
+        db.session.refresh(second)
+        self.assertEqual((first.ejudge_status, first.ejudge_language_id), (0, 3))
+        self.assertEqual(second.ejudge_language_id, 1)
+
+    def test_protocols_and_invalidation(self):
+        first, second = self.runs
+        protocol_ids = [PROTOCOL_ID, WRONG_PROTOCOL_ID]
+        for protocol_id in protocol_ids:
+            mongo.db.protocol.insert_one({'_id': protocol_id, 'run_id': 'OLD_ID'})
+
+        updates = [
+            {'run_id': run.ejudge_run_id, 'contest_id': run.ejudge_contest_id,
+             'status': 0, 'mongo_protocol_id': str(protocol_id)}
+            for run, protocol_id in zip(self.runs, protocol_ids)
+        ]
+
+        with patch('rmatics.utils.cacher.helpers.monitor_cacher') as monitor_cacher_mock:
+            resp = self.send_request(updates)
+        self.assert200(resp)
+
+        for run, protocol_id in zip(self.runs, protocol_ids):
+            self.assertEqual(mongo.db.protocol.find_one({'_id': protocol_id})['run_id'], run.id)
+
+        # Both runs are of one problem
+        monitor_cacher_mock.invalidate.assert_called_once()
+        _, kwargs = monitor_cacher_mock.invalidate.call_args
+        self.assertEqual(kwargs['all_of'], {'problem_id': first.problem_id})
+        self.assertEqual(kwargs['any_of'], {'user_ids': sorted([first.user_id, second.user_id])})
+
+    def test_protocols_with_incremental_monitor_cache(self):
+        first, _ = self.runs
+        mongo.db.protocol.insert_one({'_id': PROTOCOL_ID, 'run_id': 'OLD_ID'})
+
+        updates = [
+            {'run_id': first.ejudge_run_id, 'contest_id': first.ejudge_contest_id,
+             'status': 0, 'mongo_protocol_id': str(PROTOCOL_ID)},
+        ]
+
+        with patch('rmatics.utils.cacher.helpers.monitor_cacher') as monitor_cacher_mock, \
+                patch.object(monitor_runs_cacher, 'enabled', True), \
+                patch.object(monitor_runs_cacher, 'patch_many') as patch_many_mock:
+            resp = self.send_request(updates)
+        self.assert200(resp)
+
+        self.assertEqual(mongo.db.protocol.find_one({'_id': PROTOCOL_ID})['run_id'], first.id)
+        monitor_cacher_mock.invalidate.assert_not_called()
+        patch_many_mock.assert_called_once()
+
+    def test_not_list(self):
+        resp = self.send_request({'run_id': 1})
+        self.assert400(resp)
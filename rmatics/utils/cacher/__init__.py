@@ -1,3 +1,6 @@
 from rmatics.utils.cacher.cacher import Cacher
 from rmatics.utils.cacher.flask_cacher import FlaskCacher
+from rmatics.utils.cacher.incremental_cacher import IncrementalCacher
+from rmatics.utils.cacher.local_cache import LocalCache
+from rmatics.utils.cacher.serializers import get_serializer
 
@@ -1,6 +1,9 @@
 import datetime
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Callable, List
+from collections import OrderedDict
+from typing import Callable, List, Tuple
 
 from sqlalchemy import or_, and_
 
@@ -18,6 +21,12 @@ class ICacheInvalidator(ABC):
     def subscribe(self, label: str, period: int, key: str, func_kwargs: dict, **kwargs):
         pass
 
+    def subscribe_many(self, label: str, period: int,
+                       keys_kwargs: List[Tuple[str, dict]], **kwargs):
+        """ Subscribe several cache keys of the same label at once """
+        for key, func_kwargs in keys_kwargs:
+            self.subscribe(label, period, key, func_kwargs, **kwargs)
+
     @abstractmethod
     def invalidate(self, label: str, all_of: dict = None, any_of: dict = None) -> bool:
         pass
@@ -34,6 +43,23 @@ class MonitorCacheInvalidator(ICacheInvalidator):
         self.remove_cache_func = remove_cache_func
 
     def subscribe(self, label: str, period: int, key: str, func_kwargs: dict, **kwargs):
+        cache_meta = self._build_cache_meta(label, period, key, func_kwargs)
+        db.session.add(cache_meta)
+        if self.autocommit:
+            db.session.commit()
+        return cache_meta
+
+    def subscribe_many(self, label: str, period: int,
+                       keys_kwargs: List[Tuple[str, dict]], **kwargs):
+        cache_metas = [self._build_cache_meta(label, period, key, func_kwargs)
+                       for key, func_kwargs in keys_kwargs]
+        # Primary keys are not needed, so metas are inserted by single executemany
+        db.session.bulk_save_objects(cache_metas)
+        if self.autocommit:
+            db.session.commit()
+        return cache_metas
+
+    def _build_cache_meta(self, label: str, period: int, key: str, func_kwargs: dict) -> MonitorCacheMeta:
         func_kwargs = dict(func_kwargs) if func_kwargs else {}
         when_expire = datetime.datetime.utcnow() + datetime.timedelta(seconds=period)
 
@@ -43,16 +69,12 @@ class MonitorCacheInvalidator(ICacheInvalidator):
         invalidate_args_list = self._kwargs_to_string_list(invalidate_kwargs)
         invalidate_args = MonitorCacheMeta.get_invalidate_args(invalidate_args_list)
 
-        cache_meta = MonitorCacheMeta(prefix=self.prefix,
-                                      label=label,
-                                      key=key,
-                                      problem_id=problem_id,
-                                      invalidate_args=invalidate_args,
-                                      when_expire=when_expire)
-        db.session.add(cache_meta)
-        if self.autocommit:
-            db.session.commit()
-        return cache_meta
+        return MonitorCacheMeta(prefix=self.prefix,
+                                label=label,
+                                key=key,
+                                problem_id=problem_id,
+                                invalidate_args=invalidate_args,
+                                when_expire=when_expire)
 
     def invalidate(self, label: str, all_of: dict = None, any_of: dict = None) -> bool:
         any_of = dict(any_of) if any_of else {}
@@ -123,3 +145,121 @@ class MonitorCacheInvalidator(ICacheInvalidator):
         for item in value:
             acc.append(cls._simple_item_to_string(key, item))
         return acc
+
+
+# Collects victims of invalidation by inverted index
+# KEYS[1]: all keys of problem, KEYS[2]: keys without invalidate args,
+# KEYS[3]: temporary key, KEYS[4 .. 3 + ARGV[2]]: all_of tokens, the rest: any_of tokens
+# ARGV[1]: current timestamp, ARGV[2]: count of all_of tokens
+INVALIDATE_SCRIPT = """
+for i = 1, #KEYS do
+    redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[1])
+end
+
+local all_of = {}
+local any_of = {}
+for i = 4, #KEYS do
+    if i < 4 + tonumber(ARGV[2]) then
+        table.insert(all_of, KEYS[i])
+    else
+        table.insert(any_of, KEYS[i])
+    end
+end
+
+local victims
+if #all_of == 0 and #any_of == 0 then
+    victims = redis.call('ZRANGE', KEYS[1], 0, -1)
+else
+    if #any_of > 0 then
+        redis.call('ZUNIONSTORE', KEYS[3], #any_of, unpack(any_of))
+        table.insert(all_of, KEYS[3])
+    end
+    redis.call('ZINTERSTORE', KEYS[3], #all_of, unpack(all_of))
+    victims = redis.call('ZRANGE', KEYS[3], 0, -1)
+    redis.call('DEL', KEYS[3])
+end
+
+for _, key in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+    table.insert(victims, key)
+end
+
+for _, key in ipairs(victims) do
+    redis.call('ZREM', KEYS[1], key)
+    redis.call('ZREM', KEYS[2], key)
+end
+
+return victims
+"""
+
+
+class RedisIndexCacheInvalidator(MonitorCacheInvalidator):
+    """ Invalidator with the same semantics as MonitorCacheInvalidator,
+        but keeps inverted index (label, problem_id, arg token) -> cache keys
+        in redis sorted sets instead of MonitorCacheMeta table
+
+        Cache keys are scored by expiration time, so expired ones
+        are removed on next subscribe or invalidate of the same index entry
+        and index entry itself expires with the last key.
+        Invalidation is an intersection of all_of tokens sets
+        and union of any_of tokens sets, made by single script call.
+    """
+    ALL_TOKEN = '__all__'
+    EMPTY_TOKEN = '__empty__'
+
+    def __init__(self, prefix=None):
+        super().__init__(autocommit=False, prefix=prefix)
+        self.store = None
+        self._invalidate_script = None
+
+    def init_app(self, remove_cache_func: Callable[[str], None], store=None, period=20):
+        self.remove_cache_func = remove_cache_func
+        self.store = store
+        self._invalidate_script = store.register_script(INVALIDATE_SCRIPT)
+
+    def _index_key(self, label: str, problem_id, token: str) -> str:
+        return f'idx/{self.prefix}/{label}/{problem_id}/{token}'
+
+    def subscribe(self, label: str, period: int, key: str, func_kwargs: dict, **kwargs):
+        self.subscribe_many(label, period, [(key, func_kwargs)])
+
+    def subscribe_many(self, label: str, period: int,
+                       keys_kwargs: List[Tuple[str, dict]], **kwargs):
+        now = time.time()
+        when_expire = now + period
+
+        pipe = self.store.pipeline(transaction=False)
+        for key, func_kwargs in keys_kwargs:
+            func_kwargs = dict(func_kwargs) if func_kwargs else {}
+            problem_id = func_kwargs.pop('problem_id')
+            invalidate_kwargs = self._filter_invalidate_kwargs(func_kwargs)
+            tokens = self._kwargs_to_string_list(invalidate_kwargs) or [self.EMPTY_TOKEN]
+
+            for token in [self.ALL_TOKEN, *tokens]:
+                index_key = self._index_key(label, problem_id, token)
+                # ZADD signature differs between redis-py versions
+                pipe.execute_command('ZADD', index_key, when_expire, key)
+                pipe.zremrangebyscore(index_key, '-inf', now)
+                pipe.expire(index_key, period)
+        pipe.execute()
+
+    def invalidate(self, label: str, all_of: dict = None, any_of: dict = None) -> bool:
+        any_of = dict(any_of) if any_of else {}
+        all_of = dict(all_of) if all_of else {}
+        # Allow problem_id arg ONLY in all_of args
+        problem_id = all_of.pop('problem_id')
+        all_tokens = self._kwargs_to_string_list(self._filter_invalidate_kwargs(all_of))
+        any_tokens = self._kwargs_to_string_list(self._filter_invalidate_kwargs(any_of))
+
+        keys = [
+            self._index_key(label, problem_id, self.ALL_TOKEN),
+            self._index_key(label, problem_id, self.EMPTY_TOKEN),
+            self._index_key(label, problem_id, f'__tmp_{uuid.uuid4().hex}'),
+            *(self._index_key(label, problem_id, token) for token in all_tokens),
+            *(self._index_key(label, problem_id, token) for token in any_tokens),
+        ]
+        victims = self._invalidate_script(keys=keys, args=[time.time(), len(all_tokens)])
+
+        for key in OrderedDict.fromkeys(victims):
+            self.remove_cache_func(key.decode())
+
+        return True
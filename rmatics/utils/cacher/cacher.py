@@ -2,15 +2,24 @@ import datetime
 import functools
 import hashlib
 import json
+import math
 import pickle
-from typing import Callable, List, Optional
+from collections import OrderedDict
+from contextlib import ExitStack
+from typing import Any, Callable, List, Optional, Tuple
 
 import redis
 
 from rmatics.utils.cacher.cache_invalidators import ICacheInvalidator
+from rmatics.utils.cacher.local_cache import LocalCache
 from rmatics.utils.cacher.locker import ILocker
+from rmatics.utils.cacher.serializers import ICacheSerializer, JsonSerializer
 
 PICKLE_ASCII_PROTO = 0
+# How long fill notification lives after cache is filled
+NOTIFY_PERIOD = 10
+
+_missing = object()
 
 
 def _dump_to_ascii_str(obj) -> str:
@@ -78,10 +87,23 @@ class Cacher:
         Например, contest_ids = [1, 2, 3]; для contest_ids = {id: [3]} не сработает
     Also #4:
     ------
-        We can use locker to lock storage;
-        Before getting from cache we lock our code and then realise it
-        to avoid raise conditions and multiply function executing
-        lock is unique for each cache key (from get_cache_key)
+        Cache is read without locks. On miss only one caller (who got lock
+        for the cache key) executes function, others are blocked on
+        notification list of the key until cache is filled
+    Also #5:
+    ------
+        Entries are stored for period + stale_period. During last stale_period
+        seconds entry is stale: it is returned while one of callers refreshes it
+    Also #6:
+    ------
+        Optional local_cache keeps decoded results in process memory.
+        Keys removed by Cacher.remove (use it as remove_cache_func of invalidator)
+        are published to `{prefix}/invalidate` channel and dropped
+        from local caches of all processes
+    Also #7:
+    ------
+        Results are encoded by serializer (json by default, see serializers.py).
+        Serializer name is a part of cache key for non-json serializers
     """
     def __init__(self, store,
                  locker: ILocker,
@@ -89,12 +111,22 @@ class Cacher:
                  cache_invalidator: Optional[ICacheInvalidator] = None,
                  prefix='cache',
                  period=30*60,
+                 stale_period=0,
+                 lock_timeout=4000,
+                 fill_attempts=3,
+                 local_cache: Optional[LocalCache] = None,
+                 serializer: Optional[ICacheSerializer] = None,
                  autocommit=True):
         """Construct cache decorator based on the given redis connector."""
 
         self.store = store
         self.prefix = prefix
         self.period = period
+        self.stale_period = stale_period
+        self.lock_timeout = lock_timeout
+        self.fill_attempts = fill_attempts
+        self.local_cache = local_cache
+        self.serializer = serializer or JsonSerializer()
         self.cache_invalidator = cache_invalidator
         self.autocommit = autocommit
         self.locker = locker
@@ -111,29 +143,337 @@ class Cacher:
 
             allowed_kwargs = self._filter_invalidate_kwargs(kwargs)
 
-            key = get_cache_key(func, self.prefix, (), allowed_kwargs)
+            key = get_cache_key(func, self.key_prefix, (), allowed_kwargs)
 
-            with self.locker.take_possession(key):
-                try:
-                    result = self.store.get(key)
-                except redis.exceptions.ConnectionError:
-                    return func(*args, **kwargs)
+            local_result = self._local_get(key)
+            if local_result is not _missing:
+                return local_result
+
+            try:
+                result, is_stale = self._get(key)
+            except redis.exceptions.ConnectionError:
+                return func(*args, **kwargs)
 
-                if result:
-                    return json.loads(result)
+            if result and not is_stale:
+                result = self.serializer.loads(result)
+                self._local_set(key, result)
+                return result
 
-                func_result = func(*args, **kwargs)
-                self.store.set(key, json.dumps(func_result))
-                self.store.expire(key, self.period)
+            if result:
+                # Stale result is returned while somebody else refreshes it
+                with self.locker.try_possession(key, self.lock_timeout) as acquired:
+                    if not acquired:
+                        return self.serializer.loads(result)
+                    func_result, filled = self._fill(func, key, args, kwargs)
+            else:
+                func_result, filled = self._single_flight(func, key, args, kwargs)
 
-            if self.cache_invalidator is not None:
+            if filled and self.cache_invalidator is not None:
                 self.cache_invalidator.subscribe(func.__name__,
                                                  self.period,
                                                  key,
                                                  allowed_kwargs)
+            self._local_set(key, func_result)
             return func_result
         return wrapped
 
+    @property
+    def key_prefix(self) -> str:
+        """ Entries encoded by different serializers must not be mixed """
+        if self.serializer.name == JsonSerializer.name:
+            return self.prefix
+        return f'{self.prefix}/{self.serializer.name}'
+
+    @property
+    def invalidate_channel(self) -> str:
+        return f'{self.prefix}/invalidate'
+
+    def remove(self, key: str):
+        """ Removes cache entry from store and from local caches of all processes """
+        self.store.delete(key)
+        if self.local_cache is not None:
+            self.local_cache.pop(key)
+            self.store.publish(self.invalidate_channel, key)
+
+    def _local_get(self, key: str):
+        if self.local_cache is None:
+            return _missing
+        self.local_cache.subscribe(self.store, self.invalidate_channel)
+        return self.local_cache.get(key, _missing)
+
+    def _local_set(self, key: str, value):
+        if self.local_cache is not None:
+            self.local_cache.set(key, value)
+
+    @staticmethod
+    def _notify_key(key: str) -> str:
+        return f'{key}/notify'
+
+    def _get(self, key: str) -> Tuple[Optional[bytes], bool]:
+        """ Returns cached value and whether it is stale """
+        if not self.stale_period:
+            return self.store.get(key), False
+
+        pipe = self.store.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        result, ttl = pipe.execute()
+        # ttl is None or negative if key has no expiration
+        is_stale = ttl is not None and 0 <= ttl <= self.stale_period
+        return result, is_stale
+
+    def _fill(self, func: Callable, key: str, args: tuple, kwargs: dict) -> Tuple[Any, bool]:
+        """ Executes func and puts result to cache. Should be called under lock of the key
+            Returns result and whether cache was filled by this call
+        """
+        # Cache could be filled while we were taking lock
+        result, is_stale = self._get(key)
+        if result and not is_stale:
+            return self.serializer.loads(result), False
+
+        notify_key = self._notify_key(key)
+        # Drop notification about previous fill to not wake up waiters too early
+        self.store.delete(notify_key)
+
+        func_result = func(*args, **kwargs)
+        self.store.set(key, self.serializer.dumps(func_result), ex=self.period + self.stale_period)
+
+        pipe = self.store.pipeline(transaction=False)
+        pipe.rpush(notify_key, 1)
+        pipe.expire(notify_key, NOTIFY_PERIOD)
+        pipe.execute()
+
+        return func_result, True
+
+    def _single_flight(self, func: Callable, key: str, args: tuple, kwargs: dict) -> Tuple[Any, bool]:
+        """ Only one caller executes func on cache miss, others wait for notification """
+        notify_key = self._notify_key(key)
+        wait_timeout = max(1, math.ceil(self.lock_timeout / 1000))
+
+        for _ in range(self.fill_attempts):
+            with self.locker.try_possession(key, self.lock_timeout) as acquired:
+                if acquired:
+                    return self._fill(func, key, args, kwargs)
+
+            # Notification is popped and pushed back to the same list
+            # so every waiter is woken up in turn
+            self.store.brpoplpush(notify_key, notify_key, timeout=wait_timeout)
+
+            result, _ = self._get(key)
+            if result:
+                return self.serializer.loads(result), False
+
+        # Filler is too slow or dead, don't wait anymore
+        return func(*args, **kwargs), False
+
+    def many(self, func: Callable, batch_kwarg: str, item_kwarg: str):
+        """ Cache batched version of already cached func
+
+            Decorated function gets list of items in `batch_kwarg`
+            and returns dict item -> result, the same as func(item_kwarg=item) returns.
+            Results are stored in func's cache entries, so func and
+            its batched version share cache and invalidation.
+            Cache is read by single MGET (or pipeline with TTLs if stale_period is set)
+            and written by single pipeline. Missing and stale items are handled
+            like in __call__, but per item: items locked by this call are filled
+            by single batch_func call, others are waited for (or returned stale).
+            With raw=True results are returned as JSON strings (bytes if taken
+            from cache as is), so they can be spliced into response without decoding.
+
+            Usage:
+            ------
+                @monitor_cacher.many(get_runs, batch_kwarg='problem_ids', item_kwarg='problem_id')
+                def get_runs_many(problem_ids: list = None, user_ids: list = None) -> dict:
+                    ...
+        """
+        def decorator(batch_func):
+            @functools.wraps(batch_func)
+            def wrapped(**kwargs):
+                raw = kwargs.pop('raw', False)
+                to_be_cached = kwargs.pop('cache', True)
+                if not to_be_cached:
+                    func_result = batch_func(**kwargs)
+                    return self._dump_raw(func_result) if raw else func_result
+
+                items = kwargs.pop(batch_kwarg)
+
+                items_kwargs = OrderedDict()
+                for item in items:
+                    items_kwargs[item] = self._filter_invalidate_kwargs({**kwargs, item_kwarg: item})
+
+                keys = OrderedDict(
+                    (item, get_cache_key(func, self.key_prefix, (), item_kwargs))
+                    for item, item_kwargs in items_kwargs.items()
+                )
+
+                def fill(items_to_fill: list) -> dict:
+                    return batch_func(**{batch_kwarg: items_to_fill}, **kwargs)
+
+                result = {}
+                not_local = OrderedDict()
+                for item, key in keys.items():
+                    # Local cache keeps decoded values, it is useless for raw results
+                    local_result = _missing if raw else self._local_get(key)
+                    if local_result is _missing:
+                        not_local[item] = key
+                    else:
+                        result[item] = local_result
+
+                try:
+                    cached = self._get_many(list(not_local.values()))
+                except redis.exceptions.ConnectionError:
+                    func_result = fill(items)
+                    return self._dump_raw(func_result) if raw else func_result
+
+                fresh = {}
+                stale = {}
+                missing = []
+                for item, (value, is_stale) in zip(not_local, cached):
+                    if value and not is_stale:
+                        fresh[item] = value
+                        continue
+                    if value:
+                        stale[item] = value
+                    missing.append(item)
+
+                func_result, filled = {}, []
+                if missing:
+                    waited, func_result, filled = self._single_flight_many(fill, keys, missing, stale)
+                    fresh.update(waited)
+
+                for item, value in fresh.items():
+                    if raw:
+                        result[item] = self._cached_to_raw(value)
+                    else:
+                        result[item] = self.serializer.loads(value)
+                        # Stale values are not kept locally, they are being refreshed
+                        if item not in stale:
+                            self._local_set(keys[item], result[item])
+
+                for item, value in func_result.items():
+                    if raw:
+                        result[item] = json.dumps(value)
+                    else:
+                        result[item] = value
+                        self._local_set(keys[item], value)
+
+                if filled and self.cache_invalidator is not None:
+                    self.cache_invalidator.subscribe_many(func.__name__,
+                                                          self.period,
+                                                          [(keys[item], items_kwargs[item])
+                                                           for item in filled])
+                return OrderedDict((item, result[item]) for item in keys)
+            return wrapped
+        return decorator
+
+    def _get_many(self, keys: List[str]) -> List[Tuple[Optional[bytes], bool]]:
+        """ Returns cached values of keys and whether they are stale """
+        if not keys:
+            return []
+        if not self.stale_period:
+            return [(value, False) for value in self.store.mget(keys)]
+
+        pipe = self.store.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        values = pipe.execute()
+
+        result = []
+        for value, ttl in zip(values[::2], values[1::2]):
+            # ttl is None or negative if key has no expiration
+            is_stale = ttl is not None and 0 <= ttl <= self.stale_period
+            result.append((value, is_stale))
+        return result
+
+    def _fill_many(self, fill: Callable, keys: dict, items: list) -> Tuple[dict, dict, list]:
+        """ Batched _fill. Should be called under locks of keys of items
+            Returns cached values of items filled by somebody else,
+            results of fill and items put to cache by this call
+        """
+        # Cache could be filled while we were taking locks
+        cached = {}
+        for item, (value, is_stale) in zip(items, self._get_many([keys[item] for item in items])):
+            if value and not is_stale:
+                cached[item] = value
+        items = [item for item in items if item not in cached]
+        if not items:
+            return cached, {}, []
+
+        notify_keys = [self._notify_key(keys[item]) for item in items]
+        # Drop notifications about previous fills to not wake up waiters too early
+        self.store.delete(*notify_keys)
+
+        func_result = fill(items)
+
+        pipe = self.store.pipeline(transaction=False)
+        for item in items:
+            pipe.set(keys[item], self.serializer.dumps(func_result[item]),
+                     ex=self.period + self.stale_period)
+        for notify_key in notify_keys:
+            pipe.rpush(notify_key, 1)
+            pipe.expire(notify_key, NOTIFY_PERIOD)
+        pipe.execute()
+
+        return cached, {item: func_result[item] for item in items}, items
+
+    def _single_flight_many(self, fill: Callable, keys: dict, missing: list,
+                            stale: dict) -> Tuple[dict, dict, list]:
+        """ Batched _single_flight. Items locked by this call are filled by single fill call,
+            stale values of items locked by others are returned as is,
+            missing items locked by others are waited for.
+            Returns cached values, results of fill and items put to cache by this call
+        """
+        wait_timeout = max(1, math.ceil(self.lock_timeout / 1000))
+        cached, func_result, filled = {}, {}, []
+        waiting = list(missing)
+
+        for attempt in range(self.fill_attempts):
+            with ExitStack() as stack:
+                acquired = [
+                    item for item in waiting
+                    if stack.enter_context(self.locker.try_possession(keys[item], self.lock_timeout))
+                ]
+                if acquired:
+                    filled_cached, filled_result, filled_items = self._fill_many(fill, keys, acquired)
+                    cached.update(filled_cached)
+                    func_result.update(filled_result)
+                    filled += filled_items
+
+            # Stale result is returned while somebody else refreshes it
+            cached.update((item, stale[item]) for item in waiting
+                          if item in stale and item not in func_result and item not in cached)
+            waiting = [item for item in waiting if item not in cached and item not in func_result]
+            if not waiting:
+                break
+
+            # Filler of the first item usually fills the rest too,
+            # so only one notification is waited for per attempt
+            notify_key = self._notify_key(keys[waiting[0]])
+            self.store.brpoplpush(notify_key, notify_key, timeout=wait_timeout)
+
+            for item, (value, _) in zip(waiting, self._get_many([keys[item] for item in waiting])):
+                if value:
+                    cached[item] = value
+            waiting = [item for item in waiting if item not in cached]
+            if not waiting:
+                break
+
+        if waiting:
+            # Fillers are too slow or dead, don't wait anymore
+            func_result.update(fill(waiting))
+
+        return cached, func_result, filled
+
+    @staticmethod
+    def _dump_raw(func_result: dict) -> OrderedDict:
+        return OrderedDict((item, json.dumps(value)) for item, value in func_result.items())
+
+    def _cached_to_raw(self, value: bytes):
+        if isinstance(self.serializer, JsonSerializer):
+            return value
+        return json.dumps(self.serializer.loads(value))
+
     def _filter_invalidate_kwargs(self, kwargs: dict) -> dict:
         result_set = {}
         for arg in self.allowed_kwargs:
@@ -160,6 +500,15 @@ class Cacher:
 
         return self._invalidate(func, all_of=kwargs)
 
+    def invalidate(self, func, all_of: dict = None, any_of: dict = None) -> bool:
+        """ Invalidate all caches of func which match all of all_of keys and any of any_of keys
+            Returns True if its possible to invalidate some caches
+        """
+        if self.cache_invalidator is None:
+            return False
+
+        return self._invalidate(func, all_of=all_of, any_of=any_of)
+
     def _invalidate(self, func, all_of: dict = None, any_of: dict = None) -> bool:
         label = func.__name__
         return self.cache_invalidator.invalidate(label, all_of=all_of, any_of=any_of)
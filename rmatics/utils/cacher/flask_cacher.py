@@ -51,8 +51,8 @@ class FlaskCacher:
         locker = RedisLocker(redis_url)
         self._instance = Cacher(store, locker, *self._args, **self._kwargs)
 
-        for wrapper in self._deferred_wrappers:
-            wrapper.wrap(self._instance)
+        for wrapper, get_decorator in self._deferred_wrappers:
+            wrapper.wrap(get_decorator(self._instance))
         # We should clear DeferredWrapper's list to avoid second wrapping
         # If someone calls init_app twice
         self._deferred_wrappers.clear()
@@ -60,24 +60,41 @@ class FlaskCacher:
     def invalidate_any_of(self, func, **kwargs):
         res = self._instance.invalidate_any_of(func, **kwargs)
         if not res:
-            msg = f'Function Cacher.invalidate_any_of was called' \
-                   'for function {func.__name__} but could not invalidate cache' \
-                   'with current args.'
+            msg = f'Function Cacher.invalidate_any_of was called ' \
+                  f'for function {func.__name__} but could not invalidate cache ' \
+                  f'with current args.'
             self._app.logger.warning(msg)
 
     def invalidate_all_of(self, func, **kwargs):
         res = self._instance.invalidate_all_of(func, **kwargs)
         if not res:
-            msg = f'Function Cacher.invalidate_all_of was called' \
-                   'for function {func.__name__} but could not invalidate cache' \
-                   'with current args.'
+            msg = f'Function Cacher.invalidate_all_of was called ' \
+                  f'for function {func.__name__} but could not invalidate cache ' \
+                  f'with current args.'
+            self._app.logger.warning(msg)
+
+    def invalidate(self, func, all_of: dict = None, any_of: dict = None):
+        res = self._instance.invalidate(func, all_of=all_of, any_of=any_of)
+        if not res:
+            msg = f'Function Cacher.invalidate was called ' \
+                  f'for function {func.__name__} but could not invalidate cache ' \
+                  f'with current args.'
             self._app.logger.warning(msg)
 
     def __call__(self, f: Callable):
         # We use deferred wrapping because when decorator called
         # We did not have self._instance: we did not call init_app yet
+        return self._defer(f, lambda instance: instance)
+
+    def many(self, func: Callable, batch_kwarg: str, item_kwarg: str):
+        """ Deferred version of Cacher.many """
+        def decorator(f: Callable):
+            return self._defer(f, lambda instance: instance.many(func, batch_kwarg, item_kwarg))
+        return decorator
+
+    def _defer(self, f: Callable, get_decorator: Callable[[Cacher], Callable]):
         wrapper = functools.wraps(f)(DeferredWrapper(f))
-        self._deferred_wrappers.append(wrapper)
+        self._deferred_wrappers.append((wrapper, get_decorator))
         return wrapper
 
     def __getattr__(self, item):
@@ -1,9 +1,38 @@
+from collections import defaultdict
+from typing import Iterable
+
 from rmatics import monitor_cacher
 from rmatics.model import Run
-from rmatics.view.monitors.monitor import get_runs
+from rmatics.plugins import monitor_runs_cacher
+from rmatics.view.monitors.monitor import get_runs, dump_monitor_run
 
 
 def invalidate_monitor_cache_by_run(run: Run):
     problem_id = run.problem_id
     user_id = run.user_id
-    monitor_cacher.invalidate_all_of(get_runs, problem_id=problem_id, user_ids=user_id)
\ No newline at end of file
+    monitor_cacher.invalidate_all_of(get_runs, problem_id=problem_id, user_ids=user_id)
+
+
+def invalidate_monitor_cache_by_runs(runs: Iterable[Run]):
+    """ Invalidates caches once per problem for all users of its runs """
+    user_ids_by_problem = defaultdict(set)
+    for run in runs:
+        user_ids_by_problem[run.problem_id].add(run.user_id)
+
+    for problem_id, user_ids in user_ids_by_problem.items():
+        monitor_cacher.invalidate(get_runs,
+                                  all_of={'problem_id': problem_id},
+                                  any_of={'user_ids': sorted(user_ids)})
+
+
+def update_monitor_cache_by_run(run: Run):
+    """ Patches run in incremental monitor cache; call it after run is committed """
+    if not monitor_runs_cacher.enabled:
+        return
+    monitor_runs_cacher.patch(run.problem_id, run.id, dump_monitor_run(run))
+
+
+def update_monitor_cache_by_runs(runs: Iterable[Run]):
+    if not monitor_runs_cacher.enabled:
+        return
+    monitor_runs_cacher.patch_many((run.problem_id, run.id, dump_monitor_run(run)) for run in runs)
@@ -0,0 +1,117 @@
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+COMPLETE_FIELD = '__complete__'
+PENDING_PERIOD = 60
+
+# Patch item only if bucket is already cached;
+# otherwise remember patch for a while to apply it on fill
+PATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 0
+"""
+
+# Replace bucket with given items and apply patches
+# which were made while items were fetched from DB
+FILL_SCRIPT = """
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+local pending = redis.call('HGETALL', KEYS[2])
+for i = 1, #pending, 2 do
+    redis.call('HSET', KEYS[1], pending[i], pending[i + 1])
+end
+redis.call('HSET', KEYS[1], ARGV[2], '1')
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class IncrementalCacher:
+    """ Cache for collections which are changed item by item
+
+        Each collection (bucket) is stored as redis hash item_id -> value,
+        so changed item can be patched in place instead of dropping
+        the whole cache entry. Values are strings, encoding is up to caller.
+
+    Usage:
+    ------
+        runs_cacher = IncrementalCacher(prefix='runs')
+        runs_cacher.init_app(redis, period=60*60)
+
+        cached = runs_cacher.get_many([problem_id])
+        if cached[problem_id] is None:
+            runs_cacher.fill_many({problem_id: {run.id: dumps(run) for run in runs}})
+
+        # Somewhere else, after run is changed
+        runs_cacher.patch(problem_id, run.id, dumps(run))
+    """
+    def __init__(self, prefix='incremental', period=30*60):
+        self.prefix = prefix
+        self.period = period
+        self.store = None
+        self.enabled = False
+        self._patch_script = None
+        self._fill_script = None
+
+    def init_app(self, store, period: int = None, enabled: bool = True):
+        self.store = store
+        self.period = period or self.period
+        self.enabled = enabled
+        self._patch_script = store.register_script(PATCH_SCRIPT)
+        self._fill_script = store.register_script(FILL_SCRIPT)
+
+    def _key(self, bucket: Hashable) -> str:
+        return f'{self.prefix}/{bucket}'
+
+    def _pending_key(self, bucket: Hashable) -> str:
+        return f'{self.prefix}/{bucket}/pending'
+
+    def get_many(self, buckets: Iterable[Hashable]) -> Dict[Hashable, Optional[Dict[bytes, bytes]]]:
+        """ Returns bucket -> {item_id: value} or None if bucket is not cached """
+        buckets = list(buckets)
+        pipe = self.store.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(self._key(bucket))
+        values = pipe.execute()
+
+        result = {}
+        for bucket, items in zip(buckets, values):
+            if items.pop(COMPLETE_FIELD.encode(), None) is None:
+                result[bucket] = None
+            else:
+                result[bucket] = items
+        return result
+
+    def fill_many(self, buckets_items: Dict[Hashable, Dict[Hashable, str]]):
+        pipe = self.store.pipeline(transaction=False)
+        for bucket, items in buckets_items.items():
+            args = [self.period, COMPLETE_FIELD]
+            for item_id, value in items.items():
+                args += [item_id, value]
+            self._fill_script(keys=[self._key(bucket), self._pending_key(bucket)],
+                              args=args, client=pipe)
+        pipe.execute()
+
+    def patch(self, bucket: Hashable, item_id: Hashable, value: str) -> bool:
+        """ Returns True if cached bucket was patched """
+        patched = self._patch_script(keys=[self._key(bucket), self._pending_key(bucket)],
+                                     args=[item_id, value, PENDING_PERIOD])
+        return bool(patched)
+
+    def patch_many(self, items: Iterable[Tuple[Hashable, Hashable, str]]):
+        """ Patches (bucket, item_id, value) items by one pipeline """
+        pipe = self.store.pipeline(transaction=False)
+        for bucket, item_id, value in items:
+            self._patch_script(keys=[self._key(bucket), self._pending_key(bucket)],
+                               args=[item_id, value, PENDING_PERIOD],
+                               client=pipe)
+        pipe.execute()
+
+    def drop(self, bucket: Hashable):
+        self.store.delete(self._key(bucket), self._pending_key(bucket))
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import redis
+
+log = logging.getLogger(__name__)
+
+RECONNECT_PERIOD = 1
+
+
+class LocalCache:
+    """ In-process LRU cache with per-entry ttl
+
+        Values are stored as is, so they must not be mutated by callers.
+        Each process has its own entries, they are kept coherent
+        by invalidation messages from redis channel (see subscribe).
+
+    Usage:
+    ------
+        local_cache = LocalCache(size=256, ttl=10)
+        local_cache.subscribe(redis, 'cache/invalidate')
+
+        local_cache.set(key, value)
+        value = local_cache.get(key)
+
+        # In any process
+        redis.publish('cache/invalidate', key)
+    """
+    _missing = object()
+
+    def __init__(self, size=256, ttl=10):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def get(self, key: Hashable, default=None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, self._missing)
+            if entry is self._missing:
+                return default
+
+            expire_at, value = entry
+            if expire_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def subscribe(self, store, channel: str):
+        """ Starts listening invalidation messages (keys to drop) from channel
+
+            Listener is a daemon thread started once per process;
+            forked processes start their own one on first call
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            # Entries inherited from parent process could miss invalidations
+            self._entries.clear()
+
+        thread = threading.Thread(target=self._listen, args=(store, channel),
+                                  name=f'local-cache-{channel}', daemon=True)
+        thread.start()
+
+    def _listen(self, store, channel: str):
+        while True:
+            try:
+                pubsub = store.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.pop(self._decode_key(message['data']))
+            except redis.exceptions.ConnectionError:
+                log.warning(f'Lost connection to invalidation channel {channel}')
+                time.sleep(RECONNECT_PERIOD)
+            # Invalidations could be missed while we were disconnected
+            self.clear()
+
+    @staticmethod
+    def _decode_key(key: Optional[bytes]) -> Optional[str]:
+        if isinstance(key, bytes):
+            return key.decode()
+        return key
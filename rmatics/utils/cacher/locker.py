@@ -10,6 +10,10 @@ class ILocker(ABC):
     def _lock(self, key, timeout):
         pass
 
+    @abstractmethod
+    def _try_lock(self, key, timeout) -> bool:
+        pass
+
     @abstractmethod
     def _unlock(self, key):
         pass
@@ -21,11 +25,26 @@ class ILocker(ABC):
         yield
         self._unlock(key)
 
+    @contextmanager
+    def try_possession(self, key, timeout=4000):
+        """ Context manager for locking some resource without waiting
+            Yields True if lock was acquired
+        """
+        acquired = self._try_lock(key, timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._unlock(key)
+
 
 class FakeLocker(ILocker):
     def _lock(self, *args, **kwargs):
         pass
 
+    def _try_lock(self, *args, **kwargs):
+        return True
+
     def _unlock(self, *args, **kwargs):
         pass
 
@@ -50,6 +69,16 @@ class RedisLocker(ILocker):
 
         self._locks[lock_key] = lock
 
+    def _try_lock(self, key, timeout) -> bool:
+        """ Single attempt to acquire lock """
+        lock_key = f'lock/{key}'
+        lock = self.dlm.lock(lock_key, timeout)
+        if not lock:
+            return False
+
+        self._locks[lock_key] = lock
+        return True
+
     def _unlock(self, key):
         lock_key = f'lock/{key}'
         lock = self._locks[lock_key]
@@ -0,0 +1,178 @@
+import json
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+class ICacheSerializer(ABC):
+    """ Encodes cached function results to bytes stored in cache and back """
+    name = None
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        pass
+
+
+class JsonSerializer(ICacheSerializer):
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackSerializer(ICacheSerializer):
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError('msgpack is not installed')
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class CompressedSerializer(ICacheSerializer):
+    """ Compresses output of another serializer with zlib or lz4 """
+    COMPRESSIONS = ('zlib', 'lz4')
+
+    def __init__(self, serializer: ICacheSerializer, compression='zlib', level: Optional[int] = None):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f'Unknown compression {compression}')
+        if compression == 'lz4' and lz4_frame is None:
+            raise RuntimeError('lz4 is not installed')
+
+        self.serializer = serializer
+        self.compression = compression
+        self.level = level
+        self.name = f'{serializer.name}+{compression}'
+
+    def dumps(self, obj: Any) -> bytes:
+        data = self.serializer.dumps(obj)
+        if self.compression == 'lz4':
+            return lz4_frame.compress(data, compression_level=self.level or 0)
+        return zlib.compress(data, self.level if self.level is not None else 1)
+
+    def loads(self, data: bytes) -> Any:
+        if self.compression == 'lz4':
+            data = lz4_frame.decompress(data)
+        else:
+            data = zlib.decompress(data)
+        return self.serializer.loads(data)
+
+
+class MonitorRunsSerializer(ICacheSerializer):
+    """ Stores list of monitor runs (see monitor.get_runs) column by column
+
+        {'id': [...], 'user': [user index, ...], 'users': [[id, firstname, lastname], ...], ...}
+        Users are deduplicated, the rest of fields are parallel arrays.
+        Values of other shapes are stored as is. Columns are encoded with inner serializer.
+    """
+    RUN_FIELDS = ('id', 'problem_id', 'create_time', 'ejudge_score',
+                  'ejudge_status', 'ejudge_test_num')
+    USER_FIELDS = ('id', 'firstname', 'lastname')
+
+    def __init__(self, serializer: ICacheSerializer = None):
+        self.serializer = serializer or JsonSerializer()
+        self.name = f'runs_columns+{self.serializer.name}'
+
+    def _is_runs(self, obj: Any) -> bool:
+        keys = {*self.RUN_FIELDS, 'user'}
+        return isinstance(obj, list) and all(isinstance(run, dict) and run.keys() == keys
+                                             for run in obj)
+
+    def dumps(self, obj: Any) -> bytes:
+        if not obj or not self._is_runs(obj):
+            return self.serializer.dumps({'value': obj})
+
+        columns = {field: [] for field in self.RUN_FIELDS}
+        user_column = []
+        users = []
+        user_indexes = {}
+        for run in obj:
+            for field in self.RUN_FIELDS:
+                columns[field].append(run[field])
+
+            user = tuple(run['user'][field] for field in self.USER_FIELDS)
+            if user not in user_indexes:
+                user_indexes[user] = len(users)
+                users.append(user)
+            user_column.append(user_indexes[user])
+
+        return self.serializer.dumps({'runs': columns, 'user': user_column, 'users': users})
+
+    def loads(self, data: bytes) -> Any:
+        data = self.serializer.loads(data)
+        if 'value' in data:
+            return data['value']
+
+        users = [dict(zip(self.USER_FIELDS, user)) for user in data['users']]
+        columns = data['runs']
+        runs = []
+        for i, user_index in enumerate(data['user']):
+            run = {field: columns[field][i] for field in self.RUN_FIELDS}
+            # Each run gets its own user dict, the same as after json.loads
+            run['user'] = dict(users[user_index])
+            runs.append(run)
+        return runs
+
+
+def get_serializer(name: str = 'json', compression: Optional[str] = None) -> ICacheSerializer:
+    """ Builds serializer by config values
+
+        name: json, msgpack, runs_columns (columns encoded by msgpack if it's installed)
+        compression: None, zlib, lz4
+    """
+    if name == 'json':
+        serializer = JsonSerializer()
+    elif name == 'msgpack':
+        serializer = MsgpackSerializer()
+    elif name == 'runs_columns':
+        inner = MsgpackSerializer() if msgpack is not None else JsonSerializer()
+        serializer = MonitorRunsSerializer(inner)
+    else:
+        raise ValueError(f'Unknown cache serializer {name}')
+
+    if compression:
+        serializer = CompressedSerializer(serializer, compression)
+    return serializer
+
+
+def measure_serializer(serializer: ICacheSerializer, obj: Any, repeat=10) -> dict:
+    """ Returns encoded size in bytes and mean dumps/loads time in milliseconds """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = serializer.dumps(obj)
+    dumps_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serializer.loads(data)
+    loads_time = (time.perf_counter() - start) / repeat
+
+    return {
+        'serializer': serializer.name,
+        'size': len(data),
+        'dumps_ms': dumps_time * 1000,
+        'loads_ms': loads_time * 1000,
+    }
@@ -1,26 +1,108 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import gevent
 from flask import current_app
 from cent import Client, CentException
 
 from rmatics.model.run import Run
-from rmatics.utils.decorators import do_not_execute
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 100
+MAX_PENDING = 10000
+# Messages waiting longer than this are counted as delayed
+DELAY_THRESHOLD = 2
+
+
+class CentrifugoPublisher:
+    """ Publishes messages to centrifugo from background greenlet
+
+        Messages are kept in memory until flush, a newer message with the same
+        (channel, key) replaces the pending one. Pending messages are sent
+        by batches of batch_size with one request each flush_interval.
+        When max_pending messages are waiting new ones are dropped.
+
+        Greenlet is spawned on first publish, so messages are flushed only
+        in processes running gevent loop (submit workers).
+
+        Counters (see stats):
+            published - sent messages
+            coalesced - messages replaced by newer ones before sending
+            dropped - messages not queued because of max_pending
+            delayed - sent messages waited longer than DELAY_THRESHOLD
+            failed - messages of failed requests
+    """
+    def __init__(self, client: Client = None, flush_interval=FLUSH_INTERVAL,
+                 batch_size=BATCH_SIZE, max_pending=MAX_PENDING):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.counters = dict.fromkeys(('published', 'coalesced', 'dropped', 'delayed', 'failed'), 0)
+        self._greenlet = None
+
+    def publish(self, channel: str, key: Hashable, data: dict):
+        pending_key = (channel, key)
+        if pending_key in self.pending:
+            _, queued_at = self.pending.pop(pending_key)
+            self.counters['coalesced'] += 1
+        elif len(self.pending) >= self.max_pending:
+            self.counters['dropped'] += 1
+            return
+        else:
+            queued_at = time.time()
+        self.pending[pending_key] = (data, queued_at)
+
+        if self._greenlet is None or self._greenlet.dead:
+            self._greenlet = gevent.spawn(self._run)
+
+    def flush(self):
+        while self.pending:
+            batch = [self.pending.popitem(last=False) for _ in range(min(self.batch_size, len(self.pending)))]
+            now = time.time()
+            for (channel, _), (data, queued_at) in batch:
+                self.client.add('publish', {'channel': channel, 'data': data})
+                if now - queued_at > DELAY_THRESHOLD:
+                    self.counters['delayed'] += 1
+            try:
+                self.client.send()
+            except CentException:
+                self.counters['failed'] += len(batch)
+                log.exception('CentrifugoPublisher: can\'t send messages to centrifugo')
+            else:
+                self.counters['published'] += len(batch)
+
+    def _run(self):
+        while self.pending:
+            gevent.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                log.exception('CentrifugoPublisher: flush failed')
+
+    def stats(self) -> dict:
+        return {**self.counters, 'pending': len(self.pending)}
 
 
 class CentrifugoClient:
     client: Client = None
+    publisher: Optional[CentrifugoPublisher] = None
 
-    def init_app(self, url, api_key):
+    def init_app(self, url, api_key, enabled=False):
         self.client = Client(url, api_key=api_key, timeout=1, verify=False)
+        self.publisher = CentrifugoPublisher(self.client) if enabled else None
 
-    @do_not_execute(return_value=None, raised_exception=False)
     def send_problem_run_updates(self, problem_id: int, run: Run):
+        if self.publisher is None:
+            return
         current_app.logger.debug(f'CentrifugoClient: send update for problem {problem_id}')
         channel = f'problem.{problem_id}'
-        try:
-            self.client.publish(channel, {'run': run.serialize()})
-        except AttributeError:
-            current_app.logger.exception(f'CentrifugoClient: client is not initialized')
-        except CentException:
-            current_app.logger.exception(f'CentrifugoClient: can\'t send message to centrifugo')
+        self.publisher.publish(channel, run.id, {'run': run.serialize()})
 
 
 centrifugo_client = CentrifugoClient()
@@ -1,22 +1,33 @@
+import functools
+import mmap
+import os
 import struct
 import zlib
 
+READ_CHUNK_SIZE = 4096
+
 
 def strip_cstring(cstring):
     """cstring is c style string with ending zero, return string withoout any extra characters in the end"""
     return cstring.split("\x00")[0]
 
 
-class VersionError(object):
+class VersionError(Exception):
     """VersionError is exception class for error, when version of Ejudge Archive
     is different from current version of EjudgeArchiveReader"""
     def __init__(self, arg):
-        super (VersionError, self).__init__()
+        super(VersionError, self).__init__(arg)
         self.arg = arg
 
 
 class EjudgeArchiveReader:
-    """class implements reading ejudge archive format"""
+    """class implements reading ejudge archive format
+
+    Archive is memory-mapped (or read at once if file-like object can't be mapped),
+    index of entries is built on first access to entries.
+    Sizes of entries are taken from headers without decompression,
+    read_prefix decompresses only requested beginning of entry.
+    """
 
     EJUDGE_ARCHIVE_HEADER_FMT = "8sI4s"  # layout of ejudge archive header struct
     EJUDGE_ARCHIVE_ENTRY_HEADER_FMT = "3iI"
@@ -24,80 +35,160 @@ class EjudgeArchiveReader:
 
     @staticmethod
     def read_header(file):
-        """read ejudge_archive_header sructure from begin of file-like object file, 
+        """read ejudge_archive_header sructure from begin of file-like object file,
         return dict: field name -> value"""
+        return EjudgeArchiveReader._unpack_header(
+            file.read(struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT)), 0)
+
+    @staticmethod
+    def read_entry_header(file):
+        """read ejudge_archive_entry_header sructure from begin of file-like object file,
+        return dict: field name -> value"""
+        size = struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT)
+        data = file.read(size)
+        header_size = struct.unpack_from(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT, data)[2]
+        return EjudgeArchiveReader._unpack_entry_header(data + file.read(header_size - size), 0)
+
+    @staticmethod
+    def _unpack_header(buffer, offset):
         archive_header = dict(zip(
             ("signature", "version", "padding"),
-            struct.unpack(
-                EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT, 
-                file.read(struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT))
-                )
-            ))
+            struct.unpack_from(EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT, buffer, offset)
+        ))
         del archive_header["padding"]
         archive_header["signature"] = strip_cstring(archive_header["signature"].decode('ascii'))
         return archive_header
 
     @staticmethod
-    def read_entry_header(file):
-        """read ejudge_archive_entry_header sructure from begin of file-like object file, 
-        return dict: field name -> value"""
-        read_entry_header = dict(zip(
+    def _unpack_entry_header(buffer, offset):
+        entry_header = dict(zip(
             ("size", "row_size", "header_size", "flags"),
-            struct.unpack(
-                EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT,
-                file.read(struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_HEADER_FMT))
-                )
-            ))
+            struct.unpack_from(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT, buffer, offset)
+        ))
         # in the structure 4 + 4 + 4 + 4 bytes. There are not alignment bytes. After the structure lie name of the file.
-        read_entry_header["name"] = strip_cstring(file.read(
-            read_entry_header["header_size"] - struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT)).decode('ascii'))
-        return read_entry_header
+        name_start = offset + struct.calcsize(EjudgeArchiveReader.EJUDGE_ARCHIVE_ENTRY_HEADER_FMT)
+        name_end = offset + entry_header["header_size"]
+        entry_header["name"] = strip_cstring(bytes(buffer[name_start:name_end]).decode('ascii'))
+        return entry_header
 
     def __init__(self, path):
         """arg. path is path to ejudge archive file or file-like(need reading by bytes)
         object with ejudge archve"""
-        
+
         if type(path) == str:
-            self.file = open(path, "rb")
+            with open(path, "rb") as file:
+                self.buffer = self._map(file)
         else:
-            self.file = path
+            self.buffer = self._map(path)
 
-        if (self.file.read(7) != b'Ej. Ar.'):
+        if self.buffer[:7] != b'Ej. Ar.':
             raise ValueError("file is not ejudge archive")
 
-        self.file.seek(0, 2)
-        self.arch_size = self.file.tell()  # getting archive size
-
-        self.file.seek(0)
-        self.archive_header = self.read_header(self.file)
+        self.arch_size = len(self.buffer)
+        self.archive_header = self._unpack_header(self.buffer, 0)
 
         if self.archive_header["version"] != self.VERSION:
             raise VersionError("Ejudge Archive version is {0}, current supported version is {1}".format(self.archive_header["version"], self.VERSION))
 
-        self.entry_headers_list = list()  # list of entry_headers with sequence like in file
-        self.files_positions = dict()  # filename -> position in ejudge archive
+        self._entry_headers_list = None  # list of entry_headers with sequence like in file
+        self._files_positions = None  # filename -> (position in ejudge archive, index in entry_headers_list)
 
-        while self.file.tell() < self.arch_size:
-            self.entry_headers_list.append(self.read_entry_header(self.file))
-            self.files_positions[self.entry_headers_list[-1]["name"]] = (self.file.tell(), len(self.entry_headers_list) - 1)
-            self.file.seek(self.entry_headers_list[-1]["size"], 1)  # skip archive data
-            self.file.seek((self.file.tell() + 15) & ~15)  # alignment
+    @staticmethod
+    def _map(file):
+        try:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # File-like object without descriptor or empty file
+            file.seek(0)
+            return file.read()
+
+    def _build_index(self):
+        entry_headers_list = []
+        files_positions = {}
+        position = struct.calcsize(self.EJUDGE_ARCHIVE_HEADER_FMT)
+        while position < self.arch_size:
+            entry_header = self._unpack_entry_header(self.buffer, position)
+            position += entry_header["header_size"]
+            entry_headers_list.append(entry_header)
+            files_positions[entry_header["name"]] = (position, len(entry_headers_list) - 1)
+            position = (position + entry_header["size"] + 15) & ~15  # skip archive data and alignment
+
+        self._entry_headers_list = entry_headers_list
+        self._files_positions = files_positions
+
+    @property
+    def entry_headers_list(self):
+        if self._entry_headers_list is None:
+            self._build_index()
+        return self._entry_headers_list
+
+    @property
+    def files_positions(self):
+        if self._files_positions is None:
+            self._build_index()
+        return self._files_positions
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
 
     def namelist(self):
         """return set-like object of strings which contains names of files in archive"""
         return self.files_positions.keys()
 
-    def getfile(self, name):
-        """return bytes with data from file
-           raise KeyError if is not an file with that name in archive"""
+    def _get_entry(self, name):
         if name not in self.files_positions:
             raise KeyError("thare is not file with name {0} in archive".format(name))
+        position, index = self.files_positions[name]
+        return position, self.entry_headers_list[index]
+
+    def getsize(self, name):
+        """return size of decompressed file from its header, without decompression
+           raise KeyError if is not an file with that name in archive"""
+        _, entry_header = self._get_entry(name)
+        if entry_header['size'] == 0:
+            return 0
+        return entry_header['row_size']
 
-        if self.entry_headers_list[self.files_positions[name][1]]['size'] == 0:
+    def getfile(self, name):
+        """return bytes with data from file
+           raise KeyError if is not an file with that name in archive"""
+        position, entry_header = self._get_entry(name)
+        if entry_header['size'] == 0:
             return b''
 
-        self.file.seek(self.files_positions[name][0])
-        file_row = self.file.read(self.entry_headers_list[self.files_positions[name][1]]['size'])
-        data = zlib.decompress(file_row)
+        return zlib.decompress(self.buffer[position:position + entry_header['size']])
 
+    def read_prefix(self, name, n):
+        """return at most n first bytes of file, decompressing only them
+           raise KeyError if is not an file with that name in archive"""
+        position, entry_header = self._get_entry(name)
+        if entry_header['size'] == 0 or n <= 0:
+            return b''
+
+        decompressor = zlib.decompressobj()
+        end = position + entry_header['size']
+        data = b''
+        while position < end and len(data) < n:
+            chunk = self.buffer[position:min(position + READ_CHUNK_SIZE, end)]
+            position += len(chunk)
+            data += decompressor.decompress(chunk, n - len(data))
         return data
+
+
+@functools.lru_cache(maxsize=64)
+def _get_cached_reader(path, mtime_ns, size):
+    return EjudgeArchiveReader(path)
+
+
+def get_archive_reader(path):
+    """EjudgeArchiveReader of path, shared until file is changed
+       raise OSError if there is no file"""
+    stat = os.stat(path)
+    return _get_cached_reader(path, stat.st_mtime_ns, stat.st_size)
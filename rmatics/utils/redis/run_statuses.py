@@ -0,0 +1,181 @@
+import datetime
+import json
+import time
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from rmatics.utils.run import EjudgeStatuses
+
+NON_TERMINAL_STATUSES = frozenset({
+    EjudgeStatuses.RUNNING.value,
+    EjudgeStatuses.COMPILING.value,
+})
+
+FIELDS = ('ejudge_status', 'ejudge_test_num', 'ejudge_score')
+
+# KEYS: statuses of problem; ARGV: ttl, then run id, entry for each run.
+# Ejudge callbacks are handled concurrently, so transient status can come after
+# terminal one: it is not written if it is not newer than stored entry
+SET_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local entry = cjson.decode(ARGV[i + 1])
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    local outdated = false
+    if current then
+        current = cjson.decode(current)
+        if current['terminal'] then
+            outdated = not entry['changed_at'] or not current['changed_at']
+                or entry['changed_at'] <= current['changed_at']
+        elseif entry['changed_at'] and current['changed_at'] then
+            outdated = entry['changed_at'] < current['changed_at']
+        end
+    end
+    if not outdated then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def _timestamp(value: Optional[datetime.datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+class TransientRunStatuses:
+    """ Keeps non-terminal ejudge statuses (compiling, running, current test)
+        in redis instead of runs table
+
+        Statuses of runs of problem are stored in hash {prefix}/{problem_id}:
+        run_id -> {ejudge_status, ejudge_test_num, ejudge_score, changed_at, updated_at},
+        changed_at is ejudge last change time of run. When terminal status of run
+        is committed entry is replaced by terminal mark, so transient status which
+        comes later is written only if it is newer (e.g. run is rejudged).
+        Entries are ignored and removed after ttl. Readers merge entries over data from DB/cache.
+
+    Usage:
+    ------
+        run_statuses.init_app(redis, ttl=600, enabled=True)
+
+        if run_statuses.is_transient(status):
+            run_statuses.set(problem_id, run_id, {'ejudge_status': status, ...,
+                                              'ejudge_last_change_time': last_change_time})
+
+        # after terminal status is committed
+        run_statuses.drop_many([(problem_id, run_id, last_change_time)])
+
+        runs = run_statuses.apply(runs, run_statuses.get_by_problems([problem_id])[problem_id])
+    """
+    def __init__(self, prefix='run_statuses', ttl=10 * 60):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.store = None
+        self.enabled = False
+        self._set_script = None
+
+    def init_app(self, store, ttl: int = None, enabled=True):
+        self.store = store
+        self.ttl = ttl or self.ttl
+        self.enabled = enabled
+        self._set_script = store.register_script(SET_SCRIPT)
+
+    def _key(self, problem_id: Hashable) -> str:
+        return f'{self.prefix}/{problem_id}'
+
+    def is_transient(self, status: Optional[int]) -> bool:
+        return self.enabled and status in NON_TERMINAL_STATUSES
+
+    def _set_entries(self, entries: Iterable[Tuple[int, int, dict]]):
+        """ Writes (problem_id, run_id, entry) by one script call per problem """
+        now = time.time()
+        args_by_problem = defaultdict(list)
+        for problem_id, run_id, entry in entries:
+            args_by_problem[problem_id].extend((run_id, json.dumps({**entry, 'updated_at': now})))
+        if not args_by_problem:
+            return
+
+        pipe = self.store.pipeline(transaction=False)
+        for problem_id, args in args_by_problem.items():
+            self._set_script(keys=[self._key(problem_id)], args=[self.ttl, *args], client=pipe)
+        pipe.execute()
+
+    def set_many(self, statuses: Iterable[Tuple[int, int, dict]]):
+        """ Stores (problem_id, run_id, {field: value}) statuses,
+            ejudge_last_change_time field is used to skip outdated statuses
+        """
+        entries = []
+        for problem_id, run_id, fields in statuses:
+            entry = {field: fields[field] for field in FIELDS if fields.get(field) is not None}
+            changed_at = _timestamp(fields.get('ejudge_last_change_time'))
+            if changed_at is not None:
+                entry['changed_at'] = changed_at
+            entries.append((problem_id, run_id, entry))
+        self._set_entries(entries)
+
+    def set(self, problem_id: int, run_id: int, fields: dict):
+        self.set_many([(problem_id, run_id, fields)])
+
+    def drop_many(self, runs: Iterable[Tuple[int, int, Optional[datetime.datetime]]]):
+        """ Drops statuses of (problem_id, run_id, last_change_time) runs;
+            call it after terminal status is committed
+        """
+        entries = []
+        for problem_id, run_id, last_change_time in runs:
+            entry = {'terminal': True}
+            changed_at = _timestamp(last_change_time)
+            if changed_at is not None:
+                entry['changed_at'] = changed_at
+            entries.append((problem_id, run_id, entry))
+        self._set_entries(entries)
+
+    def get_by_problems(self, problem_ids: Iterable[int]) -> Dict[int, Dict[int, dict]]:
+        """ problem_id -> {run_id: fields} for all transient runs of problems """
+        problem_ids = list(problem_ids)
+        if not self.enabled or not problem_ids:
+            return {problem_id: {} for problem_id in problem_ids}
+
+        pipe = self.store.pipeline(transaction=False)
+        for problem_id in problem_ids:
+            pipe.hgetall(self._key(problem_id))
+
+        expired_before = time.time() - self.ttl
+        result = {}
+        expired = {}
+        for problem_id, entries in zip(problem_ids, pipe.execute()):
+            statuses = {}
+            for run_id, value in entries.items():
+                value = json.loads(value)
+                if value.pop('updated_at') < expired_before:
+                    expired.setdefault(problem_id, []).append(run_id)
+                    continue
+                value.pop('changed_at', None)
+                if not value.pop('terminal', False):
+                    statuses[int(run_id)] = value
+            result[problem_id] = statuses
+
+        # Hash of active problem doesn't expire, so forgotten entries are removed by readers
+        if expired:
+            pipe = self.store.pipeline(transaction=False)
+            for problem_id, run_ids in expired.items():
+                pipe.hdel(self._key(problem_id), *run_ids)
+            pipe.execute()
+        return result
+
+    def get_by_runs(self, runs: Iterable[Tuple[int, int]]) -> Dict[int, dict]:
+        """ run_id -> fields for transient ones of (problem_id, run_id) runs """
+        runs = list(runs)
+        by_problems = self.get_by_problems({problem_id for problem_id, _ in runs})
+        return {
+            run_id: by_problems[problem_id][run_id]
+            for problem_id, run_id in runs
+            if run_id in by_problems[problem_id]
+        }
+
+    @staticmethod
+    def apply(runs: List[dict], statuses: Dict[int, dict]) -> List[dict]:
+        """ Returns serialized runs with transient fields merged; runs are not mutated """
+        if not statuses:
+            return runs
+        return [{**run, **statuses[run['id']]} if run['id'] in statuses else run
+                for run in runs]
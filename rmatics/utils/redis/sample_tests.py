@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 4096
+
+
+class SampleTestsCache:
+    """ Keeps sample tests of problems in redis instead of reading test files on every request
+
+        Entry {prefix}/{problem_id} is JSON {version, tests: {test: {input, correct}}},
+        version is built from sample_tests of problem, paths and mtimes of test files,
+        so entry is rebuilt when tests are changed. Checking version costs
+        a stat of each file, files are read only on rebuild.
+
+    Usage:
+    ------
+        sample_tests_cache.init_app(redis, ttl=24 * 60 * 60, enabled=True)
+
+        samples = sample_tests_cache.get(problem)
+
+        # e.g. after statement is uploaded
+        sample_tests_cache.warm(problems)
+    """
+    def __init__(self, prefix='sample_tests', ttl=24 * 60 * 60):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.store = None
+        self.enabled = False
+
+    def init_app(self, store, ttl: int = None, enabled=True):
+        self.store = store
+        self.ttl = ttl or self.ttl
+        self.enabled = enabled
+
+    def _key(self, problem_id: int) -> str:
+        return f'{self.prefix}/{problem_id}'
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def version(cls, files: List[Tuple[str, str, str]]) -> str:
+        """ Version of samples by [(test, test file name, corr file name)] """
+        state = [(test, test_path, cls._mtime(test_path), corr_path, cls._mtime(corr_path))
+                 for test, test_path, corr_path in files]
+        return hashlib.md5(json.dumps(state).encode()).hexdigest()
+
+    @staticmethod
+    def build(problem) -> Dict[str, dict]:
+        """ Reads sample tests of EjudgeProblem from test files """
+        return {
+            test: {
+                'input': problem.get_test(test, SAMPLE_SIZE),
+                'correct': problem.get_corr(test, SAMPLE_SIZE),
+            }
+            for test in problem.sample_tests.split(',')
+        }
+
+    def get(self, problem) -> Dict[str, dict]:
+        """ test -> {input, correct} for sample tests of EjudgeProblem """
+        if not problem.sample_tests:
+            return {}
+        if not self.enabled:
+            return self.build(problem)
+
+        version = self.version(problem.get_sample_tests_files())
+        entry = self.store.get(self._key(problem.id))
+        if entry is not None:
+            entry = json.loads(entry)
+            if entry['version'] == version:
+                return entry['tests']
+
+        tests = self.build(problem)
+        self.store.set(self._key(problem.id), json.dumps({'version': version, 'tests': tests}),
+                       ex=self.ttl)
+        return tests
+
+    def warm(self, problems: Iterable) -> int:
+        """ Rebuilds outdated entries of problems, returns count of problems with samples """
+        count = 0
+        for problem in problems:
+            if not problem.sample_tests:
+                continue
+            try:
+                self.get(problem)
+            except Exception:
+                log.exception(f'Cannot cache sample tests of problem {problem.id}')
+                continue
+            count += 1
+        return count
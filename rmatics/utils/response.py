@@ -1,4 +1,6 @@
-from flask import jsonify as flask_jsonify
+from typing import AnyStr, Iterable, Sequence
+
+from flask import jsonify as flask_jsonify, Response, stream_with_context
 
 
 def jsonify(data, status_code=200):
@@ -13,3 +15,20 @@ def jsonify(data, status_code=200):
         response['status'] = 'error'
 
     return flask_jsonify(response), status_code
+
+
+def stream_jsonify(items: Iterable[Sequence[AnyStr]], status_code=200):
+    """ Streams the same response as jsonify(list) does
+
+        Each item of data list is given as sequence of already encoded JSON chunks,
+        so cached JSON can be put into response without decoding
+    """
+    def generate():
+        yield f'{{"status_code": {status_code}, "status": "success", "data": ['
+        for i, chunks in enumerate(items):
+            if i:
+                yield ', '
+            yield from chunks
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json'), status_code
@@ -2,6 +2,7 @@ import codecs
 import gzip
 import os
 from enum import Enum
+from typing import Optional, Tuple
 
 contest_path = '/home/judges_var/'
 protocols_path = 'var/archive/xmlreports'
@@ -36,6 +37,40 @@ class EjudgeStatuses(Enum):
     RMATICS_SUBMIT_ERROR = 520
 
 
+# ascii is covered by utf-8, windows-1251 is the same as cp1251
+SOURCE_ENCODINGS = ('utf-8', 'cp1251', 'koi8-r')
+# The most frequent russian letters. Lowercase letters of koi8-r
+# are uppercase ones in cp1251 and vice versa
+FREQUENT_CYRILLIC_LETTERS = frozenset('оеаинтсрвлкмдпу')
+
+
+def _cyrillic_score(text: str) -> int:
+    return sum(char in FREQUENT_CYRILLIC_LETTERS for char in text)
+
+
+def decode_source(blob: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """ Returns (text, encoding) of source, (None, None) if no encoding fits
+
+        Almost any bytes are valid cp1251 and koi8-r, so if source is not utf-8
+        the encoding which gives more frequent russian letters is chosen
+    """
+    try:
+        return blob.decode(SOURCE_ENCODINGS[0]), SOURCE_ENCODINGS[0]
+    except UnicodeDecodeError:
+        pass
+
+    decoded = []
+    for encoding in SOURCE_ENCODINGS[1:]:
+        try:
+            decoded.append((blob.decode(encoding), encoding))
+        except UnicodeDecodeError:
+            pass
+    if not decoded:
+        return None, None
+    # On tie the first encoding is preferred
+    return max(decoded, key=lambda text_encoding: _cyrillic_score(text_encoding[0]))
+
+
 def read_file_unknown_encoding(file_name, size=255):
     try:
         f = codecs.open(file_name, 'r', encoding='utf-8')
@@ -0,0 +1,128 @@
+import functools
+import gzip
+import os
+import xml.etree.ElementTree as ElementTree
+from typing import Iterable, Optional, Union
+
+from rmatics.utils.run import get_string_status, protocols_path, submit_path
+
+JUDGE_INFO_TAGS = ('input', 'output', 'correct', 'stderr', 'checker')
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+def _int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _parse_test(node) -> tuple:
+    status = node.get('status', '')
+    test = {
+        'status': status,
+        'string_status': get_string_status(status),
+        'real_time': _int(node.get('real-time')),
+        'time': _int(node.get('time')),
+        'max_memory_used': node.get('max-memory-used', ''),
+    }
+
+    judge_info = {}
+    for tag in JUDGE_INFO_TAGS:
+        element = node.find(f'.//{tag}')
+        judge_info[tag] = (element.text or '') if element is not None else ''
+
+    if 'term-signal' in node.attrib:
+        judge_info['term-signal'] = int(node.get('term-signal'))
+    if 'exit-code' in node.attrib:
+        judge_info['exit-code'] = int(node.get('exit-code'))
+
+    return test, judge_info
+
+
+def parse_testing_report(report: Union[str, bytes]) -> dict:
+    """ Parses ejudge testing report in one pass, each test is dropped after parsing
+
+        Returns the same data as EjudgeRun.parsetests sets:
+        {tests_count, test_count, status_string, compiler_output, host, maxtime,
+         tests: {num: test}, judge_tests_info: {num: judge_info}}
+    """
+    return _parse_chunks(report[start:start + FEED_CHUNK_SIZE]
+                         for start in range(0, len(report), FEED_CHUNK_SIZE))
+
+
+def parse_testing_report_file(path: str) -> dict:
+    """ The same as parse_testing_report for report file (may be gzipped), read by chunks """
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as file:
+        # Report starts with Content-type header and empty line
+        file.readline()
+        file.readline()
+        return _parse_chunks(iter(lambda: file.read(FEED_CHUNK_SIZE), b''))
+
+
+def _parse_chunks(chunks: Iterable[Union[str, bytes]]) -> dict:
+    result = {
+        'tests_count': None,
+        'test_count': 0,
+        'status_string': None,
+        'compiler_output': None,
+        'host': None,
+        'maxtime': None,
+        'tests': {},
+        'judge_tests_info': {},
+    }
+
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if element.tag == 'testing-report' and result['status_string'] is None:
+                    result['tests_count'] = int(element.get('run-tests'))
+                    result['status_string'] = element.get('status')
+                continue
+
+            if element.tag == 'compiler_output' and result['compiler_output'] is None:
+                result['compiler_output'] = element.text or ''
+            elif element.tag == 'host' and result['host'] is None:
+                result['host'] = element.text
+            elif element.tag == 'test':
+                test, judge_info = _parse_test(element)
+                number = element.get('num', '')
+                result['tests'][number] = test
+                result['judge_tests_info'][number] = judge_info
+                result['test_count'] += 1
+                element.clear()
+    parser.close()
+
+    if result['status_string'] is None:
+        raise ValueError('testing-report is not found')
+
+    times = [test[field] for test in result['tests'].values() for field in ('time', 'real_time')]
+    if times:
+        result['maxtime'] = max(times)
+    return result
+
+
+def _report_path(contest_id: int, run_id: int) -> Optional[str]:
+    path = submit_path(protocols_path, contest_id, run_id)
+    for candidate in (path, path + '.gz'):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def _get_cached_report(path: str, mtime_ns: int) -> dict:
+    return parse_testing_report_file(path)
+
+
+def get_testing_report(contest_id: int, run_id: int) -> Optional[dict]:
+    """ Parsed testing report of run, shared until report file is changed
+
+        Returns None if there is no report file
+    """
+    path = _report_path(contest_id, run_id)
+    if path is None:
+        return None
+    return _get_cached_report(path, os.stat(path).st_mtime_ns)
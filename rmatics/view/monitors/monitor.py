@@ -1,38 +1,34 @@
 import datetime
+import json
 from collections import namedtuple, OrderedDict
-from typing import Iterable, Tuple, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from flask import request
+from flask import request, current_app
 from marshmallow import fields
 from sqlalchemy import select
 from webargs.flaskparser import parser
 from flask.views import MethodView
 
 from rmatics import db, monitor_cacher
+from rmatics.plugins import monitor_runs_cacher, run_statuses
 from rmatics.model import SimpleUser, UserGroup, CourseModule, Statement, MonitorCourseModule
 from rmatics.model.monitor import MonitorStatement, Monitor
-from rmatics.model.run import LightWeightRun
+from rmatics.model.run import LightWeightRun, Run
 from rmatics.model.user import LightWeightUser
-from rmatics.utils.response import jsonify
+from rmatics.utils.response import jsonify, stream_jsonify
 from rmatics.view import get_problems_by_statement_id
 from rmatics.view.monitors.serializers.monitor import ContestBasedMonitorSchema, \
-    ProblemBasedMonitorSchema
+    ProblemBasedMonitorSchema, ProblemSchema
 
 ContestBasedMonitorData = namedtuple('ContestBasedMonitorData', ('contest_id', 'problem', 'runs'))
 ProblemBasedMonitorData = namedtuple('ProblemBasedMonitorData', ('problem_id', 'runs'))
 
 
-@monitor_cacher
-def get_runs(problem_id: int = None, user_ids: Iterable = None,
-             time_after: int = None, time_before: int = None):
-    """ We are using SQLAlchemy Сore to speedup multiply object fetching and serializing """
-
+def _build_runs_query(user_ids: Iterable = None,
+                      time_after: int = None, time_before: int = None):
     query = select([LightWeightRun, LightWeightUser]) \
         .select_from(LightWeightRun.join(LightWeightUser, LightWeightRun.c.user_id == LightWeightUser.c.id))
 
-    if problem_id is not None:
-        query = query.where(LightWeightRun.c.problem_id == problem_id)
-
     if user_ids is not None:
         query = query.where(LightWeightRun.c.user_id.in_(user_ids))
 
@@ -43,30 +39,164 @@ def get_runs(problem_id: int = None, user_ids: Iterable = None,
         time_before = datetime.datetime.fromtimestamp(time_before)
         query = query.where(LightWeightRun.c.create_time < time_before)
 
-    query = query.order_by(LightWeightRun.c.id)
+    return query.order_by(LightWeightRun.c.id)
+
+
+def _serialize_run(run_id: int, user_id: int, firstname: str, lastname: str,
+                   problem_id: int, create_time: datetime.datetime,
+                   score: int, status: int, test_num: int) -> dict:
+    return {
+        'id': run_id,
+        'user': {
+            'id': user_id,
+            'firstname': firstname,
+            'lastname': lastname
+        },
+        'problem_id': problem_id,
+        'create_time': create_time.astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'ejudge_score': score,
+        'ejudge_status': status,
+        'ejudge_test_num': test_num,
+    }
+
+
+def _serialize_run_row(run) -> dict:
+    return _serialize_run(run[0], run[7], run[8], run[9], run[2],
+                          run[3], run[4], run[5], run[6])
+
+
+def dump_monitor_run(run: Run) -> str:
+    """ Encodes Run for incremental monitor cache: [create timestamp, serialized run] """
+    user = run.user
+    data = _serialize_run(run.id, user.id, user.firstname, user.lastname, run.problem_id,
+                          run.create_time, run.ejudge_score, run.ejudge_status,
+                          run.ejudge_test_num)
+    return json.dumps([run.create_time.timestamp(), data])
+
+
+@monitor_cacher
+def get_runs(problem_id: int = None, user_ids: Iterable = None,
+             time_after: int = None, time_before: int = None):
+    """ We are using SQLAlchemy Сore to speedup multiply object fetching and serializing """
+
+    query = _build_runs_query(user_ids, time_after, time_before)
+
+    if problem_id is not None:
+        query = query.where(LightWeightRun.c.problem_id == problem_id)
 
     conn = db.engine.connect()
     result = conn.execute(query)
 
-    data = [
-        {
-            'id': run[0],
-            'user': {
-                'id': run[7],
-                'firstname': run[8],
-                'lastname': run[9]
-            },
-            'problem_id': run[2],
-            'create_time': run[3].astimezone().strftime('%Y-%m-%dT%H:%M:%S%z'),
-            'ejudge_score': run[4],
-            'ejudge_status': run[5],
-            'ejudge_test_num': run[6],
-        }
-        for run in result]
+    data = [_serialize_run_row(run) for run in result]
 
     return data
 
 
+@monitor_cacher.many(get_runs, batch_kwarg='problem_ids', item_kwarg='problem_id')
+def get_runs_many(problem_ids: List[int] = None, user_ids: Iterable = None,
+                  time_after: int = None, time_before: int = None) -> Dict[int, list]:
+    """ Batched get_runs: problem_id -> runs for all problem_ids by single query
+
+        Shares cache entries with get_runs, so per-problem invalidation works for both
+    """
+    data = OrderedDict((problem_id, []) for problem_id in problem_ids)
+    if not data:
+        return data
+
+    query = _build_runs_query(user_ids, time_after, time_before) \
+        .where(LightWeightRun.c.problem_id.in_(list(data.keys())))
+
+    conn = db.engine.connect()
+    result = conn.execute(query)
+
+    for run in result:
+        data[run[2]].append(_serialize_run_row(run))
+
+    return data
+
+
+def get_runs_incremental(problem_ids: List[int], user_ids: Iterable = None,
+                         time_after: int = None, time_before: int = None) -> Dict[int, list]:
+    """ Same as get_runs_many, but uses incremental cache
+
+        All runs of problem are cached as single entry, which is patched
+        on every run update (see update_monitor_cache_by_run),
+        so users and time window are filtered here
+    """
+    problems_runs = OrderedDict((problem_id, []) for problem_id in problem_ids)
+    cached = monitor_runs_cacher.get_many(problems_runs.keys())
+
+    for problem_id, runs in cached.items():
+        if runs is not None:
+            problems_runs[problem_id] = [json.loads(run) for run in runs.values()]
+
+    missing = [problem_id for problem_id, runs in cached.items() if runs is None]
+    if missing:
+        query = _build_runs_query().where(LightWeightRun.c.problem_id.in_(missing))
+        conn = db.engine.connect()
+        result = conn.execute(query)
+
+        for run in result:
+            problems_runs[run[2]].append([run[3].timestamp(), _serialize_run_row(run)])
+
+        monitor_runs_cacher.fill_many({
+            problem_id: {run['id']: json.dumps([timestamp, run])
+                         for timestamp, run in problems_runs[problem_id]}
+            for problem_id in missing
+        })
+
+    if user_ids is not None:
+        user_ids = set(user_ids)
+
+    data = OrderedDict()
+    for problem_id, runs in problems_runs.items():
+        data[problem_id] = [
+            run for timestamp, run in sorted(runs, key=lambda r: r[1]['id'])
+            if (user_ids is None or run['user']['id'] in user_ids)
+            and (time_after is None or timestamp > time_after)
+            and (time_before is None or timestamp < time_before)
+        ]
+
+    return data
+
+
+def _get_problems_runs(problem_ids: List[int], user_ids: Iterable = None,
+                       time_after: int = None, time_before: int = None,
+                       raw: bool = False) -> Dict[int, list]:
+    """ raw: return runs of each problem as JSON string instead of list """
+    if monitor_runs_cacher.enabled:
+        problems_runs = get_runs_incremental(problem_ids=problem_ids, user_ids=user_ids,
+                                             time_before=time_before, time_after=time_after)
+        problems_runs = _apply_run_statuses(problems_runs)
+        if raw:
+            return OrderedDict((problem_id, json.dumps(runs))
+                               for problem_id, runs in problems_runs.items())
+        return problems_runs
+    problems_runs = get_runs_many(problem_ids=problem_ids, user_ids=user_ids,
+                                  time_before=time_before, time_after=time_after, raw=raw)
+    return _apply_run_statuses(problems_runs, raw=raw)
+
+
+def _apply_run_statuses(problems_runs: Dict[int, list], raw: bool = False) -> Dict[int, list]:
+    """ Merges compiling/running statuses kept in redis over cached runs
+
+        Raw JSON is decoded only for problems having such runs
+    """
+    if not run_statuses.enabled:
+        return problems_runs
+
+    statuses = run_statuses.get_by_problems(problems_runs.keys())
+    for problem_id, problem_statuses in statuses.items():
+        if not problem_statuses:
+            continue
+        runs = problems_runs[problem_id]
+        if raw:
+            problems_runs[problem_id] = json.dumps(run_statuses.apply(json.loads(runs), problem_statuses))
+        else:
+            problems_runs[problem_id] = run_statuses.apply(runs, problem_statuses)
+    return problems_runs
+
+
 contest_based_get_args = {
     'group_id': fields.Integer(missing=None),
     'contest_id': fields.List(fields.Integer(), required=True),
@@ -102,14 +232,25 @@ class ContestBasedMonitorAPIView(MethodView):
         for contest_id in contest_ids:
             contest_problems[contest_id] = get_problems_by_statement_id(contest_id)
 
+        problem_ids = list(OrderedDict.fromkeys(
+            problem.id
+            for problems in contest_problems.values()
+            for problem in problems
+        ))
+        streaming = current_app.config.get('MONITOR_STREAMING_RESPONSE', False)
+        problems_runs = _get_problems_runs(problem_ids=problem_ids,
+                                           user_ids=user_ids,
+                                           time_before=time_before,
+                                           time_after=time_after,
+                                           raw=streaming)
+
+        if streaming:
+            return self._stream(contest_problems, problems_runs)
+
         contest_problems_runs = []
         for contest_id, problems in contest_problems.items():
             for problem in problems:
-                runs = get_runs(problem_id=problem.id,
-                                user_ids=user_ids,
-                                time_before=time_before,
-                                time_after=time_after)
-                monitor_data = ContestBasedMonitorData(contest_id, problem, runs)
+                monitor_data = ContestBasedMonitorData(contest_id, problem, problems_runs[problem.id])
                 contest_problems_runs.append(monitor_data)
 
         schema = ContestBasedMonitorSchema(many=True)
@@ -121,6 +262,29 @@ class ContestBasedMonitorAPIView(MethodView):
 
         return jsonify(response.data)
 
+    @staticmethod
+    def _stream(contest_problems: Dict[int, list], problems_runs: Dict[int, str]):
+        """ Same response as ContestBasedMonitorSchema gives, made of runs JSON as is """
+        # Problems are dumped before commit, which expires them
+        problem_schema = ProblemSchema()
+        problems_data = {
+            problem.id: json.dumps(problem_schema.dump(problem).data)
+            for problems in contest_problems.values()
+            for problem in problems
+        }
+
+        # We have to commit session because we may created cache_meta
+        db.session.commit()
+
+        items = (
+            (f'{{"contest_id": {contest_id}, "problem": {problems_data[problem.id]}, "runs": ',
+             problems_runs[problem.id],
+             '}')
+            for contest_id, problems in contest_problems.items()
+            for problem in problems
+        )
+        return stream_jsonify(items)
+
     @classmethod
     def _get_contests(cls, course_module_id: int) -> Tuple[Optional[int], list]:
         """
@@ -173,13 +337,24 @@ class ProblemBasedMonitorAPIView(MethodView):
         time_before = args['time_before']
         time_after = args['time_after']
 
-        problem_runs = []
-        for problem_id in problem_ids:
-            runs = get_runs(problem_id=problem_id,
-                            user_ids=user_ids,
-                            time_before=time_before,
-                            time_after=time_after)
-            problem_runs.append(ProblemBasedMonitorData(problem_id, runs))
+        streaming = current_app.config.get('MONITOR_STREAMING_RESPONSE', False)
+        problems_runs = _get_problems_runs(problem_ids=list(OrderedDict.fromkeys(problem_ids)),
+                                           user_ids=user_ids,
+                                           time_before=time_before,
+                                           time_after=time_after,
+                                           raw=streaming)
+
+        if streaming:
+            # We have to commit session because we may created cache_meta
+            db.session.commit()
+            items = (
+                (f'{{"problem_id": {problem_id}, "runs": ', problems_runs[problem_id], '}')
+                for problem_id in problem_ids
+            )
+            return stream_jsonify(items)
+
+        problem_runs = [ProblemBasedMonitorData(problem_id, problems_runs[problem_id])
+                        for problem_id in problem_ids]
 
         schema = ProblemBasedMonitorSchema(many=True)
         problem_runs = schema.dump(problem_runs)
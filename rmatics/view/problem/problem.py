@@ -12,7 +12,8 @@ from rmatics.ejudge.submit_queue import (
     get_last_get_id,
     queue_submit,
 )
-from sqlalchemy import desc
+from rmatics.ejudge.submit_queue.lanes import get_submit_lane
+from sqlalchemy import desc, func
 from webargs.flaskparser import parser
 from marshmallow import fields
 
@@ -22,6 +23,7 @@ from rmatics.model.group import UserGroup
 from rmatics.model.problem import Problem, EjudgeProblem
 from rmatics.model.run import Run
 from rmatics.model.user import SimpleUser
+from rmatics.plugins import run_statuses, submissions_count_cacher
 from rmatics.utils.response import jsonify
 from rmatics.view import get_problems_by_statement_id
 from rmatics.view.problem.serializers.run import RunSchema
@@ -105,7 +107,8 @@ class TrustedSubmitApi(MethodView):
         # Коммит должен быть до отправки в очередь иначе это гонка
         db.session.commit()
 
-        queue_submit(run_id, ejudge_url)
+        queue_submit(run_id, ejudge_url, problem.ejudge_contest_id,
+                     lane=get_submit_lane(statement_id))
         return jsonify({
             'run_id': run_id
         })
@@ -132,11 +135,22 @@ get_args = {
     'lang_id': fields.Integer(),
     'status_id': fields.Integer(missing=-1, default=-1),
     'count': fields.Integer(default=10, missing=10),
-    'page': fields.Integer(required=True),
+    # Without page runs are fetched by keyset: older than before_id or newer than after_id
+    'page': fields.Integer(missing=None),
+    'before_id': fields.Integer(missing=None),
+    'after_id': fields.Integer(missing=None),
+    'statement_id': fields.Integer(missing=None),
     'from_timestamp': fields.Integer(),  # Может быть -1, тогда не фильтруем
     'to_timestamp': fields.Integer(),  # Может быть -1, тогда не фильтруем
 }
 
+count_get_args = {
+    key: value for key, value in get_args.items()
+    if key not in ('count', 'page', 'before_id', 'after_id')
+}
+
+MAX_PER_PAGE = 100
+
 
 # TODO: only teacher
 class ProblemSubmissionsFilterApi(MethodView):
@@ -152,11 +166,20 @@ class ProblemSubmissionsFilterApi(MethodView):
         status_id: int
         statement_id: int
 
+        Pagination
+        ----------------
+        page: int, runs are fetched by OFFSET and counted
+        or
+        before_id | after_id: int, runs with lesser | greater id
+        are fetched without counting (see ProblemSubmissionsCountApi)
+
         Returns
         --------
         'result': success | error
         'data': [Run]
-        'metadata': {count: int, page_count: int}
+        'metadata': {count: int, page_count: int} if page is passed
+                    {before_id: int | None, after_id: int | None} otherwise,
+                    cursors for fetching older and newer runs
 
         Also:
         --------
@@ -171,14 +194,22 @@ class ProblemSubmissionsFilterApi(MethodView):
 
         per_page_count = args.get('count')
         page = args.get('page')
-        result = query.paginate(page=page, per_page=per_page_count,
-                                error_out=False, max_per_page=100)
+        if page is not None:
+            result = query.paginate(page=page, per_page=per_page_count,
+                                    error_out=False, max_per_page=MAX_PER_PAGE)
+            rows = result.items
+            metadata = {
+                'count': result.total,
+                'page_count': result.pages
+            }
+        else:
+            rows, metadata = self._get_keyset_page(query, args)
 
         runs = []
 
         problem_ids = set()
 
-        for run, user in result.items:
+        for run, user in rows:
             problem_ids.add(run.problem_id)
 
         problems_result = db.session.query(Problem).filter(Problem.id.in_(problem_ids)).options(Load(Problem).load_only('id', 'name'))
@@ -187,26 +218,53 @@ class ProblemSubmissionsFilterApi(MethodView):
         for problem in problems_result:
             problems[problem.id] = problem
 
-        for run, user in result.items:
+        for run, user in rows:
             run.user = user
             run.problem = problems[run.problem_id]
             runs.append(run)
 
-        metadata = {
-            'count': result.total,
-            'page_count': result.pages
-        }
-
         schema = RunSchema(many=True)
         data = schema.dump(runs)
+        statuses = run_statuses.get_by_runs((run.problem_id, run.id) for run in runs)
 
         return flask_jsonify(
             {
                 'result': 'success',
-                'data': data.data,
+                'data': run_statuses.apply(data.data, statuses),
                 'metadata': metadata
             })
 
+    @classmethod
+    def _get_keyset_page(cls, query, args) -> tuple:
+        """ WHERE id < before_id ORDER BY id DESC LIMIT count
+            or the same with after_id in reversed order
+        """
+        per_page_count = min(args.get('count'), MAX_PER_PAGE)
+        before_id = args.get('before_id')
+        after_id = args.get('after_id')
+
+        if after_id is not None:
+            query = query.filter(Run.id > after_id).order_by(None).order_by(Run.id)
+        elif before_id is not None:
+            query = query.filter(Run.id < before_id)
+
+        # One extra row tells whether there is the next page
+        rows = query.limit(per_page_count + 1).all()
+        has_more = len(rows) > per_page_count
+        rows = rows[:per_page_count]
+
+        if after_id is not None:
+            rows.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = before_id is not None, has_more
+
+        metadata = {
+            'before_id': rows[-1][0].id if rows and has_older else None,
+            'after_id': rows[0][0].id if rows and has_newer else None,
+        }
+        return rows, metadata
+
     @classmethod
     def _build_query_by_args(cls, args, problem_id):
         user_id = args.get('user_id')
@@ -215,7 +273,7 @@ class ProblemSubmissionsFilterApi(MethodView):
         status_id = args.get('status_id')
         # Волшебные костыли, если problem_id == 0,
         # то statement_id - это CourseModule.id, а не Statement.id
-        statement_id = request.args.get('statement_id', type=int, default=None)
+        statement_id = args.get('statement_id')
         from_timestamp = args.get('from_timestamp')
         to_timestamp = args.get('to_timestamp')
 
@@ -269,3 +327,20 @@ class ProblemSubmissionsFilterApi(MethodView):
             query = query.filter(problem_id_filter_smt)
 
         return query
+
+
+@submissions_count_cacher
+def get_submissions_count(problem_id: int, **args) -> int:
+    query = ProblemSubmissionsFilterApi._build_query_by_args(args, problem_id)
+    return query.order_by(None).with_entities(func.count(Run.id)).scalar()
+
+
+class ProblemSubmissionsCountApi(MethodView):
+    """ Count of problem submissions with the same filters as ProblemSubmissionsFilterApi has
+
+        Count is cached for a short time and is not invalidated
+    """
+    def get(self, problem_id: int):
+        args = parser.parse(count_get_args, request)
+        count = get_submissions_count(problem_id=problem_id, **args)
+        return jsonify({'count': count})
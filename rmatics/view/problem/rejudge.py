@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from typing import Iterator, List
+
+from flask import current_app, request
+from flask.views import MethodView
+from marshmallow import fields
+from sqlalchemy import func
+from webargs.flaskparser import parser
+from werkzeug.exceptions import BadRequest, NotFound
+
+from rmatics.ejudge.submit_queue import queue_submit_many
+from rmatics.ejudge.submit_queue.lanes import REJUDGE_LANE
+from rmatics.model.base import db, redis
+from rmatics.model.rejudge import Rejudge
+from rmatics.model.run import Run
+from rmatics.utils.response import jsonify
+from rmatics.view.problem.problem import count_get_args, ProblemSubmissionsFilterApi
+
+BULK_REJUDGE_CHUNK_SIZE = 1000
+BULK_REJUDGE_PROGRESS_TTL = 24 * 60 * 60
+
+
+def bulk_rejudge_progress_key(job_id: str) -> str:
+    return f'bulk_rejudge:{job_id}'
+
+
+def set_bulk_rejudge_progress(job_id: str, **progress):
+    key = bulk_rejudge_progress_key(job_id)
+    pipe = redis.pipeline(transaction=False)
+    pipe.hmset(key, progress)
+    pipe.expire(key, BULK_REJUDGE_PROGRESS_TTL)
+    pipe.execute()
+
+
+def rejudge_runs(runs: List[tuple]):
+    """ Rejudges (run_id, ejudge_contest_id, ejudge_url) runs
+        the same way as RunAPI.post does, with one query/request of each kind
+    """
+    default_ejudge_url = current_app.config['EJUDGE_NEW_CLIENT_URL']
+
+    # If ejudge_url is None submission failed by error inside workers
+    # And we shouldn't really rejudge the solution
+    failed_run_ids = [run_id for run_id, _, ejudge_url in runs if ejudge_url is None]
+    judged_runs = [run for run in runs if run[2] is not None]
+
+    if failed_run_ids:
+        db.session.query(Run) \
+            .filter(Run.id.in_(failed_run_ids)) \
+            .update({Run.ejudge_url: default_ejudge_url}, synchronize_session=False)
+
+    if judged_runs:
+        rejudges = [
+            Rejudge(run_id=run_id, ejudge_contest_id=ejudge_contest_id, ejudge_url=ejudge_url)
+            for run_id, ejudge_contest_id, ejudge_url in judged_runs
+        ]
+        db.session.add_all(rejudges)
+        # Ids of inserted rejudges are known after flush
+        db.session.flush()
+        Run.move_protocols_to_rejudge_collection({rejudge.run_id: rejudge.id for rejudge in rejudges})
+
+    # Коммит должен быть до отправки в очередь иначе это гонка
+    db.session.commit()
+
+    queue_submit_many(
+        [(run_id, ejudge_url or default_ejudge_url, ejudge_contest_id)
+         for run_id, ejudge_contest_id, ejudge_url in runs],
+        lane=REJUDGE_LANE,
+    )
+
+
+def iter_runs_chunks(query, max_run_id: int, chunk_size: int) -> Iterator[List[tuple]]:
+    """ Iterates (run_id, ejudge_contest_id, ejudge_url) of runs found by query
+        by chunks ordered by id, runs with id greater than max_run_id are skipped
+    """
+    query = query.order_by(None) \
+        .order_by(Run.id) \
+        .filter(Run.id <= max_run_id) \
+        .with_entities(Run.id, Run.ejudge_contest_id, Run.ejudge_url)
+
+    last_run_id = 0
+    while True:
+        runs = query.filter(Run.id > last_run_id).limit(chunk_size).all()
+        if not runs:
+            return
+        yield runs
+        last_run_id = runs[-1][0]
+
+
+def run_bulk_rejudge(app, job_id: str, args: dict, max_run_id: int):
+    """ Rejudges runs found by BulkRejudgeApi args, progress is stored in redis """
+    with app.app_context():
+        queued = 0
+        try:
+            query = BulkRejudgeApi.build_query(args)
+            for runs in iter_runs_chunks(query, max_run_id, BULK_REJUDGE_CHUNK_SIZE):
+                rejudge_runs(runs)
+                queued += len(runs)
+                set_bulk_rejudge_progress(job_id, queued=queued)
+        except Exception:
+            db.session.rollback()
+            set_bulk_rejudge_progress(job_id, status='failed', finished_at=time.time())
+            app.logger.exception(f'Bulk rejudge {job_id} failed')
+            return
+
+        set_bulk_rejudge_progress(job_id, status='done', finished_at=time.time())
+        app.logger.info(f'Bulk rejudge {job_id}: {queued} runs queued')
+
+
+class BulkRejudgeApi(MethodView):
+    """ Rejudges all runs of problem, ejudge contest or runs found by
+        the same filters as ProblemSubmissionsFilterApi has
+
+        Runs are counted by request and rejudged by chunks in background thread;
+        progress is stored in redis and can be read by GET with job_id.
+        Runs sent after request are not rejudged.
+
+        Returns
+        --------
+        'job_id': str
+        'total': int, count of found runs
+        'queued': int, count of queued runs
+    """
+    post_args = {
+        **count_get_args,
+        'problem_id': fields.Integer(missing=0),
+        'ejudge_contest_id': fields.Integer(missing=None),
+        'job_id': fields.String(missing=None),
+    }
+
+    @staticmethod
+    def build_query(args: dict):
+        query = ProblemSubmissionsFilterApi._build_query_by_args(args, args['problem_id'])
+        if args['ejudge_contest_id'] is not None:
+            query = query.filter(Run.ejudge_contest_id == args['ejudge_contest_id'])
+        return query
+
+    def post(self):
+        args = parser.parse(self.post_args, request)
+        job_id = args['job_id'] or uuid.uuid4().hex
+
+        if not (args['problem_id'] or args['ejudge_contest_id'] or args.get('statement_id')):
+            raise BadRequest('One of problem_id, ejudge_contest_id or statement_id is required')
+
+        total, max_run_id = self.build_query(args) \
+            .order_by(None) \
+            .with_entities(func.count(Run.id), func.max(Run.id)) \
+            .one()
+
+        set_bulk_rejudge_progress(job_id, status='running', total=total, queued=0,
+                                  started_at=time.time())
+        thread = threading.Thread(target=run_bulk_rejudge,
+                                  args=(current_app._get_current_object(), job_id, args, max_run_id or 0),
+                                  name=f'bulk_rejudge:{job_id}', daemon=True)
+        thread.start()
+
+        return jsonify({
+            'job_id': job_id,
+            'total': total,
+            'queued': 0,
+        })
+
+
+class BulkRejudgeProgressApi(MethodView):
+    def get(self, job_id: str):
+        progress = redis.hgetall(bulk_rejudge_progress_key(job_id))
+        if not progress:
+            raise NotFound(f'Bulk rejudge {job_id} is not found')
+
+        progress = {field.decode(): value.decode() for field, value in progress.items()}
+        return jsonify({
+            'job_id': job_id,
+            'status': progress['status'],
+            'total': int(progress['total']),
+            'queued': int(progress['queued']),
+            'started_at': float(progress['started_at']),
+            'finished_at': float(progress['finished_at']) if 'finished_at' in progress else None,
+        })
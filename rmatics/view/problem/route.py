@@ -1,7 +1,10 @@
 from flask import Blueprint
 
-from rmatics.view.problem.problem import TrustedSubmitApi, ProblemApi, ProblemSubmissionsFilterApi
-from rmatics.view.problem.run import SourceApi, UpdateRunFromEjudgeAPI, ProtocolApi, RunAPI
+from rmatics.view.problem.problem import TrustedSubmitApi, ProblemApi, ProblemSubmissionsFilterApi, \
+    ProblemSubmissionsCountApi
+from rmatics.view.problem.rejudge import BulkRejudgeApi, BulkRejudgeProgressApi
+from rmatics.view.problem.run import SourceApi, UpdateRunFromEjudgeAPI, ProtocolApi, RunAPI, \
+    BulkUpdateRunsFromEjudgeAPI
 
 problem_blueprint = Blueprint('problem', __name__, url_prefix='/problem')
 
@@ -14,6 +17,9 @@ problem_blueprint.add_url_rule('/<int:problem_id>', methods=('GET', ),
 problem_blueprint.add_url_rule('/<int:problem_id>/submissions/', methods=('GET', ),
                                view_func=ProblemSubmissionsFilterApi.as_view('problem_submissions'))
 
+problem_blueprint.add_url_rule('/<int:problem_id>/submissions/count', methods=('GET', ),
+                               view_func=ProblemSubmissionsCountApi.as_view('problem_submissions_count'))
+
 problem_blueprint.add_url_rule('/run/<int:run_id>', methods=('PUT', ),
                                view_func=RunAPI.as_view('run'))
 
@@ -26,5 +32,14 @@ problem_blueprint.add_url_rule('/run/<int:run_id>/protocol', methods=('GET', ),
 problem_blueprint.add_url_rule('/run/action/update_from_ejudge', methods=('POST', ),
                                view_func=UpdateRunFromEjudgeAPI.as_view('update_from_ejudge'))
 
+problem_blueprint.add_url_rule('/run/action/bulk_update_from_ejudge', methods=('POST', ),
+                               view_func=BulkUpdateRunsFromEjudgeAPI.as_view('bulk_update_from_ejudge'))
+
 problem_blueprint.add_url_rule('/run/<int:run_id>/action/rejudge', methods=('POST', ),
-                               view_func=RunAPI.as_view('rejudge_run'))
\ No newline at end of file
+                               view_func=RunAPI.as_view('rejudge_run'))
+
+problem_blueprint.add_url_rule('/run/action/bulk_rejudge', methods=('POST', ),
+                               view_func=BulkRejudgeApi.as_view('bulk_rejudge'))
+
+problem_blueprint.add_url_rule('/run/action/bulk_rejudge/<job_id>', methods=('GET', ),
+                               view_func=BulkRejudgeProgressApi.as_view('bulk_rejudge_progress'))
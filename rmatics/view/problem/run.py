@@ -1,24 +1,34 @@
 from bson import ObjectId
 from flask import request, current_app
 from flask.views import MethodView
-from marshmallow import fields, Schema, post_load
-from pymongo.errors import PyMongoError, DuplicateKeyError
+from marshmallow import fields, Schema, post_load, validate
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, DuplicateKeyError
+from sqlalchemy import case, tuple_
+from sqlalchemy.orm import joinedload
 from webargs.flaskparser import parser
 from werkzeug.exceptions import NotFound, BadRequest, InternalServerError
 
 from rmatics.ejudge.submit_queue import queue_submit
+from rmatics.ejudge.submit_queue.lanes import REJUDGE_LANE
 from rmatics.model.base import db, mongo
 from rmatics.model.rejudge import Rejudge
-from rmatics.model.run import Run
-from rmatics.utils.cacher.helpers import invalidate_monitor_cache_by_run
+from rmatics.model.run import PROTOCOL_FULL, PROTOCOL_TESTS, PROTOCOL_VIEWS, Run
+from rmatics.plugins import monitor_runs_cacher, run_statuses
+from rmatics.utils.cacher.helpers import (
+    invalidate_monitor_cache_by_run,
+    invalidate_monitor_cache_by_runs,
+    update_monitor_cache_by_run,
+    update_monitor_cache_by_runs,
+)
 from rmatics.utils.response import jsonify
 from rmatics.view.problem.serializers.run import RunSchema
 
 
-POSSIBLE_SOURCE_ENCODINGS = ['utf-8', 'cp1251', 'windows-1251', 'ascii', 'koi8-r']
+DUPLICATE_KEY_ERROR = 11000
 
 
-class FromEjudgeRunSchema(Schema):
+class EjudgeRunUpdateSchema(Schema):
     score = fields.Integer()
     status = fields.Integer()
     lang_id = fields.Integer()
@@ -26,6 +36,8 @@ class FromEjudgeRunSchema(Schema):
     create_time = fields.DateTime()
     last_change_time = fields.DateTime()
 
+
+class FromEjudgeRunSchema(EjudgeRunUpdateSchema):
     @post_load
     def load_ejudge_update(self, data: dict):
         run = self.context.get('instance')
@@ -61,6 +73,8 @@ class RunAPI(MethodView):
         db.session.add(run)
         db.session.commit()
 
+        update_monitor_cache_by_run(run)
+
         return jsonify(data)
 
     def post(self, run_id: int):
@@ -83,7 +97,7 @@ class RunAPI(MethodView):
 
             run.move_protocol_to_rejudge_collection(rejudge.id)
 
-        queue_submit(run.id, run.ejudge_url)
+        queue_submit(run.id, run.ejudge_url, run.ejudge_contest_id, lane=REJUDGE_LANE)
         db.session.commit()
 
         return jsonify({})
@@ -112,28 +126,37 @@ class SourceApi(MethodView):
 
         language_id = run.ejudge_language_id
 
-        source = run.source or b''
-        for encoding in POSSIBLE_SOURCE_ENCODINGS:
-            try:
-                source = source.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                pass
+        source = run.source_text or ''
 
         return jsonify({'source': source, 'language_id': language_id})
 
 
 class ProtocolApi(MethodView):
+    """ Protocol of run
+
+        Parts of protocol
+        ----------------
+        view: full | summary | compiler | tests, see Run.get_protocol
+        test: int, the only test (implies view=tests)
+        tests_from, tests_to: int, inclusive range of tests (implies view=tests),
+        at most MAX_TESTS_PAGE tests
+    """
+    MAX_TESTS_PAGE = 100
 
     get_args = {
         'is_admin': fields.Boolean(default=False, missing=False),
         'user_id': fields.Integer(),
+        'view': fields.String(missing=PROTOCOL_FULL, validate=validate.OneOf(PROTOCOL_VIEWS)),
+        'test': fields.Integer(missing=None),
+        'tests_from': fields.Integer(missing=None),
+        'tests_to': fields.Integer(missing=None),
     }
 
     def get(self, run_id: int):
         args = parser.parse(self.get_args, request)
         is_admin = args.get('is_admin')
         user_id = args.get('user_id')
+        view, tests = self._get_view(args)
 
         run_q = db.session.query(Run)
         if not is_admin:
@@ -144,12 +167,36 @@ class ProtocolApi(MethodView):
         if run is None:
             raise NotFound(f'Run with id #{run_id} is not found')
 
-        protocol = run.protocol
+        protocol = Run.get_protocol(run.id, view=view, tests=tests)
         if not protocol:
             raise NotFound(f'Protocol for run_id: {run_id} not found')
 
         return jsonify(protocol)
 
+    @classmethod
+    def _get_view(cls, args) -> tuple:
+        if args['test'] is not None:
+            return PROTOCOL_TESTS, range(args['test'], args['test'] + 1)
+
+        tests_from, tests_to = args['tests_from'], args['tests_to']
+        if tests_from is None and tests_to is None:
+            if args['view'] == PROTOCOL_TESTS:
+                raise BadRequest('test or tests_from/tests_to are required for tests view')
+            return args['view'], None
+
+        tests_from = tests_from if tests_from is not None else 1
+        tests_to = tests_to if tests_to is not None else tests_from + cls.MAX_TESTS_PAGE - 1
+        if tests_to < tests_from:
+            raise BadRequest('tests_to is less than tests_from')
+        tests_to = min(tests_to, tests_from + cls.MAX_TESTS_PAGE - 1)
+        return PROTOCOL_TESTS, range(tests_from, tests_to + 1)
+
+
+class BulkEjudgeRunUpdateSchema(EjudgeRunUpdateSchema):
+    run_id = fields.Integer(required=True)
+    contest_id = fields.Integer(required=True)
+    mongo_protocol_id = fields.String(missing=None)
+
 
 class UpdateRunFromEjudgeAPI(MethodView):
 
@@ -175,10 +222,18 @@ class UpdateRunFromEjudgeAPI(MethodView):
         if errors:
             raise BadRequest(errors)
 
+        if not mongo_protocol_id and run_statuses.is_transient(received_run.ejudge_status):
+            # Compiling/running statuses are not written to DB, terminal one will come soon
+            run_statuses.set(received_run.problem_id, received_run.id,
+                             self._transient_fields(received_run, data))
+            db.session.rollback()
+            return jsonify({}, 200)
+
         if mongo_protocol_id:
-            # If it is we should invalidate cache
-            invalidate_monitor_cache_by_run(run)
-            current_app.logger.debug('Cache invalidated')
+            if not monitor_runs_cacher.enabled:
+                # Incremental monitor cache is patched after commit, otherwise invalidate cache
+                invalidate_monitor_cache_by_run(run)
+                current_app.logger.debug('Cache invalidated')
             try:
                 result = mongo.db.protocol.update_one({'_id': ObjectId(mongo_protocol_id)},
                                                       {'$set': {'run_id': received_run.id}})
@@ -189,9 +244,142 @@ class UpdateRunFromEjudgeAPI(MethodView):
 
             except PyMongoError:
                 current_app.logger.exception('Looks like mongo is shutdown')
-                raise InternalServerError(f'Looks like mongo is shutdown')
+                raise InternalServerError('Looks like mongo is shutdown')
 
         db.session.add(received_run)
         db.session.commit()
 
+        if run_statuses.enabled:
+            run_statuses.drop_many([(received_run.problem_id, received_run.id,
+                                     received_run.ejudge_last_change_time)])
+
+        update_monitor_cache_by_run(received_run)
+
         return jsonify({}, 200)
+
+    @staticmethod
+    def _transient_fields(run: Run, data: dict) -> dict:
+        return {
+            'ejudge_status': run.ejudge_status,
+            'ejudge_test_num': run.ejudge_test_num,
+            'ejudge_score': run.ejudge_score,
+            # Change time stored in DB is not the time of this update
+            'ejudge_last_change_time': run.ejudge_last_change_time if 'last_change_time' in data else None,
+        }
+
+
+class BulkUpdateRunsFromEjudgeAPI(MethodView):
+    """ The same as UpdateRunFromEjudgeAPI for list of updates
+
+        Runs are found by one query and updated by one UPDATE,
+        protocols are bound to runs by one mongo bulk_write,
+        monitor caches are invalidated once per problem.
+
+        Returns
+        --------
+        'updated': int, count of updated runs
+        'not_found': [{run_id, contest_id}], updates without run
+    """
+    # Field of BulkEjudgeRunUpdateSchema -> column of Run
+    UPDATE_COLUMNS = {
+        'score': Run.ejudge_score,
+        'status': Run.ejudge_status,
+        'lang_id': Run.ejudge_language_id,
+        'test_num': Run.ejudge_test_num,
+        'create_time': Run.ejudge_create_time,
+        'last_change_time': Run.ejudge_last_change_time,
+    }
+
+    def post(self):
+        data = request.get_json(force=True)
+        if not isinstance(data, list):
+            raise BadRequest('List of updates is expected')
+
+        updates, errors = BulkEjudgeRunUpdateSchema(many=True).load(data)
+        if errors:
+            raise BadRequest(errors)
+
+        # The last update of run wins
+        updates_by_key = {(update['run_id'], update['contest_id']): update for update in updates}
+        if not updates_by_key:
+            return jsonify({'updated': 0, 'not_found': []})
+
+        runs = db.session.query(Run.id, Run.ejudge_run_id, Run.ejudge_contest_id,
+                                Run.problem_id, Run.user_id) \
+            .filter(tuple_(Run.ejudge_run_id, Run.ejudge_contest_id).in_(list(updates_by_key))) \
+            .all()
+        run_ids = {(run.ejudge_run_id, run.ejudge_contest_id): run.id for run in runs}
+        not_found = [{'run_id': run_id, 'contest_id': contest_id}
+                     for run_id, contest_id in updates_by_key if (run_id, contest_id) not in run_ids]
+        updates = {run_ids[key]: update for key, update in updates_by_key.items() if key in run_ids}
+
+        problem_ids = {run.id: run.problem_id for run in runs}
+        transient = {run_id: update for run_id, update in updates.items()
+                     if not update['mongo_protocol_id'] and run_statuses.is_transient(update.get('status'))}
+        if transient:
+            # Compiling/running statuses are not written to DB, terminal ones will come soon
+            run_statuses.set_many(
+                (problem_ids[run_id], run_id, {'ejudge_status': update.get('status'),
+                                               'ejudge_test_num': update.get('test_num'),
+                                               'ejudge_score': update.get('score'),
+                                               'ejudge_last_change_time': update.get('last_change_time')})
+                for run_id, update in transient.items()
+            )
+            updates = {run_id: update for run_id, update in updates.items() if run_id not in transient}
+
+        protocol_ids = {run_id: update['mongo_protocol_id']
+                        for run_id, update in updates.items() if update['mongo_protocol_id']}
+        if protocol_ids:
+            if not monitor_runs_cacher.enabled:
+                # Incremental monitor cache is patched after commit, otherwise invalidate cache
+                invalidate_monitor_cache_by_runs(run for run in runs if run.id in protocol_ids)
+            self._bind_protocols(protocol_ids)
+
+        values = self._build_update_values(updates)
+        if values:
+            db.session.query(Run) \
+                .filter(Run.id.in_(list(updates))) \
+                .update(values, synchronize_session=False)
+        db.session.commit()
+
+        if run_statuses.enabled and updates:
+            run_statuses.drop_many((problem_ids[run_id], run_id, update.get('last_change_time'))
+                                   for run_id, update in updates.items())
+
+        if monitor_runs_cacher.enabled and updates:
+            updated_runs = db.session.query(Run) \
+                .options(joinedload(Run.user)) \
+                .filter(Run.id.in_(list(updates))) \
+                .all()
+            update_monitor_cache_by_runs(updated_runs)
+
+        return jsonify({'updated': len(updates) + len(transient), 'not_found': not_found})
+
+    @classmethod
+    def _build_update_values(cls, updates: dict) -> dict:
+        """ {Run.ejudge_status: CASE Run.id WHEN 1 THEN 0 ... ELSE Run.ejudge_status END, ...} """
+        fields = {field for update in updates.values() for field in update}
+        values = {}
+        for field, column in cls.UPDATE_COLUMNS.items():
+            if field not in fields:
+                continue
+            whens = {run_id: update[field] for run_id, update in updates.items() if field in update}
+            values[column] = case(whens, value=Run.id, else_=column)
+        return values
+
+    @staticmethod
+    def _bind_protocols(protocol_ids: dict):
+        operations = [UpdateOne({'_id': ObjectId(protocol_id)}, {'$set': {'run_id': run_id}})
+                      for run_id, protocol_id in protocol_ids.items()]
+        try:
+            result = mongo.db.protocol.bulk_write(operations, ordered=False)
+            if result.modified_count < len(operations):
+                current_app.logger.warning(f'Only {result.modified_count} of {len(operations)} '
+                                           f'protocols were found')
+        except BulkWriteError as e:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+                raise InternalServerError('Cannot bind protocols to runs')
+            current_app.logger.exception('Found duplicate key for run_id')
+        except PyMongoError:
+            current_app.logger.exception('Looks like mongo is shutdown')
+            raise InternalServerError('Looks like mongo is shutdown')
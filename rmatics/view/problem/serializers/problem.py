@@ -1,6 +1,7 @@
 import json
 from marshmallow import Schema, fields
 from rmatics.model.problem import EjudgeProblem
+from rmatics.plugins import sample_tests_cache
 
 
 class ProblemSchema(Schema):
@@ -14,5 +15,8 @@ class ProblemSchema(Schema):
     output_only = fields.Boolean()
 
     def serialize_samples(self, obj: EjudgeProblem):
-        obj.generateSamplesJson(force_update=True)
-        return json.dumps(obj.sample_tests_json)
+        samples = sample_tests_cache.get(obj)
+        if not samples:
+            return json.dumps(obj.sample_tests_json)
+        # Samples from test files override ones saved in DB, as generateSamplesJson(force_update=True) does
+        return json.dumps({**(obj.sample_tests_json or {}), **samples})